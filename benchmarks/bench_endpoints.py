@@ -0,0 +1,391 @@
+"""Latency of the designer endpoints on layouts and networks of growing size.
+
+All requests go through the Flask test client. The editing endpoints run on
+layouts of increasing size that are half filled with random signal chains,
+the physical design algorithms and exports on synthetic networks with an
+increasing number of gates. Latency distributions and scaling tables are
+printed; ``--output`` saves them as JSON and ``--compare`` sets a previous run
+side by side. The algorithms run in ``MNT_DESIGNER_WORKERS`` worker processes
+(default: 1). Run with::
+
+    python benchmarks/bench_endpoints.py --output results.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+# The app reads its configuration from the environment on import
+os.environ.setdefault("MNT_DESIGNER_WORKERS", "1")
+
+from synthetic import random_layout_items, synthetic_verilog
+
+from mnt.designer import app as designer_app
+
+# Largest network sizes the exact and GOLD algorithms are applied to
+EXACT_MAX_SIZE = 30
+GOLD_MAX_SIZE = 150
+
+
+class Recorder:
+    """Collects the latencies of requests by endpoint and size."""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.failures = defaultdict(int)
+
+    def request(self, endpoint, size, send):
+        start = time.perf_counter()
+        data = check(send())
+        self.samples[(endpoint, size)].append(time.perf_counter() - start)
+        return data
+
+    def job(self, endpoint, size, test_client, send):
+        # Algorithms run as jobs; their latency lasts until the result is ready.
+        # Runs that find no layout are counted, but do not end the benchmark
+        start = time.perf_counter()
+        job_id = check(send())["job_id"]
+        while True:
+            status = check(test_client.get(f"/job_status/{job_id}"))["status"]
+            if status not in ("queued", "running"):
+                break
+            time.sleep(0.002)
+        data = test_client.get(f"/job_result/{job_id}").get_json()
+        self.samples[(endpoint, size)].append(time.perf_counter() - start)
+        if not data["success"]:
+            self.failures[(endpoint, size)] += 1
+        return data
+
+    def summary(self):
+        return [
+            {
+                "endpoint": endpoint,
+                "size": size,
+                "failures": self.failures[(endpoint, size)],
+                **distribution(samples),
+            }
+            for (endpoint, size), samples in self.samples.items()
+        ]
+
+
+def check(response):
+    # Exports answer with the file itself unless they fail
+    if response.status_code != 200:
+        msg = f"{response.request.path}: {response.status}"
+        raise RuntimeError(msg)
+    if not response.is_json:
+        return response
+    data = response.get_json()
+    if not data.get("success", True):
+        raise RuntimeError(data.get("error"))
+    return data
+
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, round(q * (len(ordered) - 1)))]
+
+
+def distribution(samples):
+    ordered = sorted(samples)
+    return {
+        "samples": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": percentile(ordered, 0.5) * 1000,
+        "p90_ms": percentile(ordered, 0.9) * 1000,
+        "p99_ms": percentile(ordered, 0.99) * 1000,
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def client(app, session_id):
+    test_client = app.test_client()
+    with test_client.session_transaction() as flask_session:
+        flask_session["session_id"] = session_id
+    return test_client
+
+
+def editing_workload(app, recorder, size, *, cells, density, seed):
+    # Every cell of 5x4 tiles in the empty lower half of the layout sees two
+    # PIs with a buffer each; the buffers are moved away and connected again,
+    # once to an adjacent tile and once via a routed path
+    test_client = client(app, f"bench-edit-{size}")
+    check(test_client.post("/create_layout", json={"x": size, "y": size}))
+    items = random_layout_items(size, size, density, seed, rows=range(size // 2))
+    recorder.request(
+        "place_gates",
+        size,
+        lambda: test_client.post("/place_gates", json={"items": items}),
+    )
+
+    def post(endpoint, body, name=None):
+        return recorder.request(
+            name or endpoint, size, lambda: test_client.post(f"/{endpoint}", json=body)
+        )
+
+    def place(x, y, gate_type, source=None):
+        params = {}
+        if source is not None:
+            position = {"x": source[0], "y": source[1]}
+            params["first"] = {"position": position, "gate_type": source[2]}
+        post("place_gate", {"x": x, "y": y, "gate_type": gate_type, "params": params})
+
+    def move(source, target):
+        body = {
+            "source_x": source[0],
+            "source_y": source[1],
+            "source_gate_type": "buf",
+            "target_x": target[0],
+            "target_y": target[1],
+        }
+        post("move_gate", body)
+
+    def connect(source, target, find_path):
+        body = {
+            "source_x": source[0],
+            "source_y": source[1],
+            "source_gate_type": "pi",
+            "target_x": target[0],
+            "target_y": target[1],
+            "target_gate_type": "buf",
+            "find_path": find_path,
+        }
+        name = "connect_gates (find_path)" if find_path else "connect_gates"
+        return post("connect_gates", body, name)["path"]
+
+    origins = [
+        (x, y) for y in range(size // 2, size - 3, 4) for x in range(0, size - 4, 5)
+    ][:cells]
+    for x, y in origins:
+        place(x, y, "pi")
+        place(x + 1, y, "buf", (x, y, "pi"))
+        move((x + 1, y), (x, y + 1))
+        connect((x, y), (x, y + 1), False)
+
+        place(x + 2, y, "pi")
+        place(x + 3, y, "buf", (x + 2, y, "pi"))
+        move((x + 3, y), (x + 4, y + 3))
+        path = connect((x + 2, y), (x + 4, y + 3), True)
+
+        recorder.request("get_layout", size, lambda: test_client.get("/get_layout"))
+        recorder.request(
+            "check_design_rules",
+            size,
+            lambda: test_client.post("/check_design_rules"),
+        )
+
+        for tile in [tuple(t) for t in reversed(path)] + [(x, y + 1), (x, y)]:
+            post("delete_gate", {"x": tile[0], "y": tile[1]})
+
+
+def algorithm_workload(
+    app, recorder, num_gates, *, repeats, timeout, designer, exact_available
+):
+    test_client = client(app, f"bench-algorithms-{num_gates}")
+    check(test_client.post("/create_layout", json={"x": 10, "y": 10}))
+    verilog = synthetic_verilog(num_gates, seed=num_gates)
+    network_size = designer.parse_verilog(verilog).size()
+
+    for _ in range(repeats):
+        recorder.request(
+            "save_verilog_code",
+            num_gates,
+            lambda: test_client.post("/save_verilog_code", json={"code": verilog}),
+        )
+
+        # Exports are cached per revision, so every repeat starts from a fresh
+        # orthogonal layout
+        recorder.request(
+            "apply_orthogonal",
+            num_gates,
+            lambda: test_client.post("/apply_orthogonal", json={}),
+        )
+        for endpoint in (
+            "get_layout",
+            "export_layout",
+            "export_dot_layout",
+            "export_qca_layout",
+            "export_sidb_layout",
+        ):
+            recorder.request(
+                endpoint,
+                num_gates,
+                lambda endpoint=endpoint: test_client.get(f"/{endpoint}"),
+            )
+        recorder.request(
+            "check_design_rules",
+            num_gates,
+            lambda: test_client.post("/check_design_rules"),
+        )
+        recorder.job(
+            "apply_optimization",
+            num_gates,
+            test_client,
+            lambda: test_client.post(
+                "/apply_optimization",
+                json={
+                    "optimize_pos_only": False,
+                    "planar_optimization": False,
+                    "timeout": timeout,
+                },
+            ),
+        )
+
+        if network_size <= GOLD_MAX_SIZE:
+            recorder.job(
+                "apply_gold",
+                num_gates,
+                test_client,
+                lambda: test_client.post(
+                    "/apply_gold",
+                    json={
+                        "mode": "HIGH_EFFICIENCY",
+                        "cost": "AREA",
+                        "timeout": timeout,
+                    },
+                ),
+            )
+        if exact_available and network_size <= EXACT_MAX_SIZE:
+            recorder.job(
+                "apply_exact",
+                num_gates,
+                test_client,
+                lambda: test_client.post(
+                    "/apply_exact",
+                    json={
+                        "upper_bound_x": 100,
+                        "upper_bound_y": 100,
+                        "timeout": timeout,
+                    },
+                ),
+            )
+
+
+def print_tables(title, results, key="p50_ms"):
+    sizes = sorted({result["size"] for result in results})
+    endpoints = list(dict.fromkeys(result["endpoint"] for result in results))
+    by_key = {(r["endpoint"], r["size"]): r for r in results}
+
+    print(f"\n{title}: {key.replace('_ms', '')} latency [ms] by size")
+    print(f"{'endpoint':28}" + "".join(f"{size:>10}" for size in sizes))
+    for endpoint in endpoints:
+        cells = [by_key.get((endpoint, size)) for size in sizes]
+        print(
+            f"{endpoint:28}"
+            + "".join(f"{c[key]:10.2f}" if c else f"{'-':>10}" for c in cells)
+        )
+
+    print(f"\n{title}: latency distributions [ms]")
+    print(
+        f"{'endpoint':28}{'size':>6}{'n':>6}{'failed':>7}"
+        + "".join(f"{q:>10}" for q in ("mean", "p50", "p90", "p99", "max"))
+    )
+    for endpoint in endpoints:
+        for size in sizes:
+            r = by_key.get((endpoint, size))
+            if r:
+                print(
+                    f"{endpoint:28}{size:6}{r['samples']:6}{r['failures']:7}"
+                    + "".join(
+                        f"{r[q + '_ms']:10.2f}"
+                        for q in ("mean", "p50", "p90", "p99", "max")
+                    )
+                )
+
+
+def print_comparison(results, baseline, key="p50_ms"):
+    previous = {
+        (r["workload"], r["endpoint"], r["size"]): r for r in baseline["results"]
+    }
+    print(f"\nComparison with {baseline['meta']['created']}: {key} (ratio)")
+    for r in results:
+        old = previous.get((r["workload"], r["endpoint"], r["size"]))
+        if old:
+            ratio = r[key] / old[key] if old[key] else float("inf")
+            print(
+                f"{r['workload']:10} {r['endpoint']:28}{r['size']:6}"
+                f"{old[key]:10.2f}{r[key]:10.2f}{ratio:8.2f}x"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--layout-sizes", type=int, nargs="+", default=[16, 32, 64, 128]
+    )
+    parser.add_argument(
+        "--network-sizes", type=int, nargs="+", default=[5, 20, 50, 100, 200]
+    )
+    parser.add_argument("--cells", type=int, default=20)
+    parser.add_argument("--density", type=float, default=0.5)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument(
+        "--timeout",
+        type=int,
+        default=10000,
+        help="timeout of the algorithms in milliseconds (default: 10000)",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--cached",
+        action="store_true",
+        help="keep the result cache of the algorithms enabled",
+    )
+    parser.add_argument("--output", help="save the results to this JSON file")
+    parser.add_argument("--compare", help="JSON file of a previous run")
+    args = parser.parse_args()
+
+    if not args.cached:
+        designer_app.designer.result_cache = None
+    app = designer_app.app
+    exact_available = designer_app.exact_params is not None
+
+    editing, algorithms = Recorder(), Recorder()
+    for size in args.layout_sizes:
+        editing_workload(
+            app,
+            editing,
+            size,
+            cells=args.cells,
+            density=args.density,
+            seed=args.seed,
+        )
+    for num_gates in args.network_sizes:
+        algorithm_workload(
+            app,
+            algorithms,
+            num_gates,
+            repeats=args.repeats,
+            timeout=args.timeout,
+            designer=designer_app.designer,
+            exact_available=exact_available,
+        )
+
+    results = [{"workload": "editing", **r} for r in editing.summary()] + [
+        {"workload": "algorithms", **r} for r in algorithms.summary()
+    ]
+    print_tables("Editing (layout size)", editing.summary())
+    print_tables("Algorithms (gates)", algorithms.summary())
+
+    if args.compare:
+        with Path(args.compare).open(encoding="utf-8") as f:
+            print_comparison(results, json.load(f))
+
+    if args.output:
+        meta = {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "args": vars(args),
+        }
+        with Path(args.output).open("w", encoding="utf-8") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
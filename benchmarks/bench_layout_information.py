@@ -0,0 +1,95 @@
+"""Benchmark ``get_layout_information`` on sparse and dense layouts.
+
+Compares the occupancy-driven traversal against a scan of every tile of the
+layout. Run with::
+
+    python benchmarks/bench_layout_information.py
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from mnt.pyfiction import cartesian_gate_layout, cartesian_obstruction_layout
+
+from mnt.designer.service import get_gate_information, get_layout_information
+
+
+def random_layout(width, height, occupancy, seed=0):
+    # Occupied tiles become buffers or AND gates fed from their western and
+    # northern neighbours where possible, PIs otherwise
+    rng = random.Random(seed)
+    layout = cartesian_obstruction_layout(
+        cartesian_gate_layout((width - 1, height - 1, 1), "2DDWave", "Layout")
+    )
+    tiles = sorted(
+        rng.sample(
+            [(x, y) for x in range(width) for y in range(height)],
+            int(width * height * occupancy),
+        )
+    )
+    occupied = set(tiles)
+    for x, y in tiles:
+        sources = [
+            tile
+            for tile in ((x - 1, y), (x, y - 1))
+            if tile in occupied
+            and not layout.is_empty_tile(tile)
+            and not layout.is_po(layout.get_node(tile))
+            and layout.fanout_size(layout.get_node(tile)) == 0
+        ]
+        signals = [layout.make_signal(layout.get_node(tile)) for tile in sources]
+        if len(signals) == 2:
+            layout.create_and(signals[0], signals[1], (x, y))
+        elif len(signals) == 1:
+            layout.create_buf(signals[0], (x, y))
+        else:
+            layout.create_pi("", (x, y))
+    return layout
+
+
+def full_grid_scan(layout):
+    gates = []
+    for x in range(layout.x() + 1):
+        for y in range(layout.y() + 1):
+            if layout.get_node((x, y)):
+                gates.append(get_gate_information(layout, x, y))
+    return gates
+
+
+def measure(func, layout, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(layout)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--occupancy", type=float, nargs="+", default=[0.01, 0.3])
+    args = parser.parse_args()
+
+    print(
+        f"{'layout':>10} {'occupancy':>10} {'gates':>7} {'scan [ms]':>10} "
+        f"{'sparse [ms]':>12} {'speedup':>8}"
+    )
+    for occupancy in args.occupancy:
+        layout = random_layout(args.size, args.size, occupancy)
+        _, gates = get_layout_information(layout)
+        assert gates == full_grid_scan(layout)
+
+        scan = measure(full_grid_scan, layout, args.repeat)
+        sparse = measure(get_layout_information, layout, args.repeat)
+        print(
+            f"{args.size:>4}x{args.size:<5} {occupancy:>10.0%} {len(gates):>7} "
+            f"{scan * 1e3:>10.1f} {sparse * 1e3:>12.1f} {scan / sparse:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Synthetic inputs for the benchmarks.
+
+``synthetic_verilog`` produces random combinational networks of a given size,
+``random_layout_items`` random but valid gate-level layouts in the form of
+``/place_gates`` items. Both are deterministic for a given seed.
+"""
+
+import random
+
+BINARY_OPERATORS = {"and": "&", "or": "|", "xor": "^"}
+
+
+def synthetic_verilog(num_gates, num_inputs=None, seed=0, operators=("and", "or")):
+    # Random DAG of NOT gates and the given binary gates whose sinks become
+    # the outputs; XOR is left out by default since the QCA ONE library cannot
+    # realize it. pyfiction only reads the module named "top"
+    rng = random.Random(seed)
+    num_inputs = num_inputs or max(2, num_gates // 4)
+    inputs = [f"x{i}" for i in range(num_inputs)]
+    signals = list(inputs)
+    unused = set(inputs)
+    assignments = []
+
+    for i in range(num_gates):
+        wire = f"n{i}"
+        # Prefer signals without fanout so that little logic is left dangling
+        candidates = (
+            sorted(unused) if len(unused) >= 2 and rng.random() < 0.7 else signals
+        )
+        if rng.random() < 0.15:
+            a = rng.choice(candidates)
+            expression = f"~{a}"
+            operands = (a,)
+        else:
+            a, b = rng.sample(candidates, 2)
+            operator = BINARY_OPERATORS[rng.choice(operators)]
+            expression = f"{a} {operator} {b}"
+            operands = (a, b)
+        unused.difference_update(operands)
+        unused.add(wire)
+        signals.append(wire)
+        assignments.append((wire, expression))
+
+    sinks = sorted(s for s in unused if s.startswith("n")) or [signals[-1]]
+    outputs = [f"y{i}" for i in range(len(sinks))]
+    wires = [wire for wire, _ in assignments]
+
+    lines = [
+        f"module top( {' , '.join(inputs + outputs)} );",
+        f"  input {' , '.join(inputs)} ;",
+        f"  output {' , '.join(outputs)} ;",
+        f"  wire {' , '.join(wires)} ;",
+    ]
+    lines.extend(
+        f"  assign {wire} = {expression} ;" for wire, expression in assignments
+    )
+    lines.extend(f"  assign {o} = {s} ;" for o, s in zip(outputs, sinks))
+    lines.append("endmodule")
+    return "\n".join(lines) + "\n"
+
+
+def random_layout_items(width, height, density, seed=0, rows=None):
+    """Items for ``/place_gates`` that fill a layout with random signal chains.
+
+    Every chain starts with a PI, continues with buffers and inverters to the
+    east and ends in a PO, so the resulting layout passes the design rule
+    checks. About ``density`` of the tiles in the given ``rows`` (all by
+    default) are occupied.
+    """
+    rng = random.Random(seed)
+    items = []
+    for y in rows if rows is not None else range(height):
+        x = 0
+        while x < width - 2:
+            if rng.random() >= density:
+                x += 1
+                continue
+            length = rng.randint(3, max(3, min(width - x, 12)))
+            items.append({"x": x, "y": y, "gate_type": "pi", "params": {}})
+            for i in range(1, length):
+                gate_type = "po" if i == length - 1 else rng.choice(("buf", "inv"))
+                source_type = "pi" if i == 1 else items[-1]["gate_type"]
+                items.append(
+                    {
+                        "x": x + i,
+                        "y": y,
+                        "gate_type": gate_type,
+                        "params": {
+                            "first": {
+                                "position": {"x": x + i - 1, "y": y},
+                                "gate_type": source_type,
+                            }
+                        },
+                    }
+                )
+            x += length + 1
+    return items
@@ -1,79 +1,357 @@
-import os, io, re, sys
-import tempfile
-import uuid
-from contextlib import redirect_stdout
+import atexit
+import functools
+import gzip
+import io
+import json
 import logging
+import os
+import time
+import uuid
 import webbrowser
-
-from flask import Flask, jsonify, render_template, request, send_file, session, cli
-
+from pathlib import Path
+
+from flask import (
+    Flask,
+    Response,
+    cli,
+    g,
+    jsonify,
+    render_template,
+    request,
+    send_file,
+    session,
+)
 from mnt.pyfiction import (
+    apply_bestagon_library,
+    apply_qca_one_library,
     cartesian_gate_layout,
     cartesian_obstruction_layout,
-    gate_level_drvs,
-    read_cartesian_fgl_layout,
-    route_path,
-    write_fgl_layout,
+    color_mode,
+    read_hexagonal_fgl_layout,
     write_dot_layout,
-    read_technology_network,
-    orthogonal,
-    graph_oriented_layout_design,
-    graph_oriented_layout_design_params,
-    gold_effort_mode,
-    gold_cost_objective,
-    equivalence_checking,
-    equivalence_checking_stats,
-    eq_type,
-    post_layout_optimization,
-    post_layout_optimization_params,
-    apply_qca_one_library,
-    apply_bestagon_library,
     write_qca_layout_svg,
-    write_sqd_layout,
     write_qca_layout_svg_params,
-    hexagonalization,
-    a_star,
-    write_sidb_layout_svg_params,
     write_sidb_layout_svg,
-    color_mode,
+    write_sidb_layout_svg_params,
+)
+
+from mnt.designer.caches import (
+    ArtifactCache,
+    LRUCache,
+    ResultCache,
+)
+from mnt.designer.drc import DesignRuleChecker, count_violations, format_report
+from mnt.designer.drc import dead_nodes as layout_dead_nodes
+from mnt.designer.jobs import DONE, QUEUED, RUNNING, JobError, JobManager
+from mnt.designer.locks import SessionLocks
+from mnt.designer.metrics import (
+    CONTENT_TYPE,
+    Counter,
+    Gauge,
+    Histogram,
+    registry,
+    timed,
+)
+from mnt.designer.persistence import (
+    SnapshotWriter,
+    SpillDirectory,
+    SQLiteBackend,
+    SQLiteJobRegistry,
+    open_backend,
+    restore_session,
+    snapshot_session,
+)
+from mnt.designer.portfolio import (
+    OBJECTIVES,
+    layout_metrics,
+    pareto_front,
+    preference,
+    run_portfolio,
+)
+from mnt.designer.profiler import RequestProfiler
+from mnt.designer.revisions import RevisionLog
+from mnt.designer.service import (
+    NETWORK_LIMITS,
+    Designer,
+    check_network,
+    check_optimizable,
+    connect_gates_function,
+    delete_gate_function,
+    exact_parameters,
+    get_gate_information,
+    get_layout_information,
+    gold_parameters,
+    move_gate_function,
+    optimization_parameters,
+    place_gate_function,
+    placement_tiles,
+)
+from mnt.designer.sessions import SessionStore
+from mnt.designer.sweep import gold_configurations, sweep_gold
+from mnt.designer.workers import (
+    WORKER_GRACE_PERIOD,
+    WorkerPool,
+    copy_layout,
+    layout_from_fgl,
+    layout_to_dict,
+    layout_to_fgl,
+    write_to_memory,
 )
 
 try:
-    from mnt.pyfiction import exact_params, exact_cartesian
+    from mnt.pyfiction import exact_params
 except ImportError:
-    # The module doesn't exist
+    # Pyfiction was built without Z3
     exact_params = None
-    exact_cartesian = None
-except AttributeError:
-    # The module exists but one or both functions are missing
-    try:
-        from mnt.pyfiction import exact_params
-    except ImportError:
-        exact_params = None
-    try:
-        from mnt.pyfiction import exact_cartesian
-    except ImportError:
-        exact_cartesian = None
 
 
 # Determine the absolute path to the directory containing this script
-current_dir = os.path.dirname(os.path.abspath(__file__))
+current_dir = Path(__file__).resolve().parent
 
 # Set the path to the static folder
-static_dir = os.path.join(current_dir, "./static")
+static_dir = current_dir / "static"
 
 app = Flask(__name__, static_folder=static_dir)
 
 app.secret_key = "your_secret_key"  # Replace with a secure secret key
 
-# In-memory storage for user layouts
-layouts = {}
 
-# In-memory storage for user networks
-networks = {}
+def env_number(name, convert=int):
+    return convert(os.environ[name]) if name in os.environ else None
+
+
+# Parsed networks are shared by all sessions and looked up by a hash of their
+# Verilog code, since sessions often load the same benchmark circuits
+network_cache = LRUCache(env_number("MNT_DESIGNER_NETWORK_CACHE_SIZE") or 64)
+
+
+# Results of the physical design algorithms for the same input and parameters,
+# optionally kept on disk as well
+result_cache = ResultCache(
+    env_number("MNT_DESIGNER_RESULT_CACHE_SIZE") or 128,
+    os.environ.get("MNT_DESIGNER_RESULT_CACHE_DIR"),
+)
+
+
+# Outcomes of parameter sweep runs, i.e., runtimes and layout metrics
+sweep_cache = LRUCache(1024)
+
+# Maximum number of runs in a single parameter sweep
+SWEEP_MAX_RUNS = 256
+
+# Worker processes running the pyfiction physical design algorithms; the pool
+# size and the hard time limit (in seconds) per run are configurable via the
+# environment
+worker_pool = WorkerPool(
+    processes=env_number("MNT_DESIGNER_WORKERS"),
+    timeout=env_number("MNT_DESIGNER_WORKER_TIMEOUT", float),
+)
+
+# Design operations behind the routes
+designer = Designer(worker_pool, network_cache, result_cache, WORKER_GRACE_PERIOD)
+
+
+# Optional persistent storage (a SQLite database file or a directory) that
+# survives server restarts; sessions are written to it shortly after every
+# change and read back lazily on their first access
+snapshot_backend = (
+    open_backend(os.environ["MNT_DESIGNER_STORE"])
+    if "MNT_DESIGNER_STORE" in os.environ
+    else None
+)
+
+# Several server processes (e.g., gunicorn workers) can share their sessions
+# and jobs through a SQLite store. Changes are then written synchronously and
+# every process keeps its sessions in memory only as long as their stored
+# revision does not change.
+shared_state = os.environ.get("MNT_DESIGNER_SHARED_STATE", "") not in ("", "0")
+if shared_state and not isinstance(snapshot_backend, SQLiteBackend):
+    msg = "MNT_DESIGNER_SHARED_STATE requires a SQLite store."
+    raise RuntimeError(msg)
+
+
+class ConcurrentModificationError(Exception):
+    pass
+
+
+# Without a persistent store, evicted sessions can still be spilled to a
+# directory instead of being dropped
+spill_directory = (
+    SpillDirectory(os.environ["MNT_DESIGNER_SPILL_DIR"])
+    if "MNT_DESIGNER_SPILL_DIR" in os.environ and snapshot_backend is None
+    else None
+)
+
+
+def spill_session(session_id, values):
+    # In shared mode, every change has already been written
+    if snapshot_writer is not None and not shared_state:
+        snapshot_writer.write(session_id, snapshot_session(values))
+    elif spill_directory is not None:
+        spill_directory.save(session_id, snapshot_session(values))
+
+
+def load_session(session_id):
+    snapshot = (snapshot_backend or spill_directory).load(session_id)
+    if snapshot is None:
+        return None
+    values = restore_session(snapshot, designer.parse_verilog)
+    values["stored_revision"] = snapshot["revision"]
+    return values
+
+
+def session_is_stale(session_id, values):
+    return snapshot_backend.revision(session_id) != values.get("stored_revision")
+
+
+# Requests of the same session may be handled concurrently; layouts and
+# networks are guarded by a reader/writer lock per session
+session_locks = SessionLocks()
+
+# In-memory storage for all user sessions; idle sessions expire after a TTL
+# (in seconds) and the least recently used ones are evicted once there are too
+# many of them or they take up too much memory (in megabytes). Evicted
+# sessions are only dropped from memory, not from the persistent storage or
+# the spill directory.
+max_session_mb = env_number("MNT_DESIGNER_MAX_SESSION_MB", float)
+sessions = SessionStore(
+    max_sessions=env_number("MNT_DESIGNER_MAX_SESSIONS"),
+    max_bytes=None if max_session_mb is None else int(max_session_mb * 1024**2),
+    ttl=env_number("MNT_DESIGNER_SESSION_TTL", float),
+    on_evict=spill_session,
+    on_miss=load_session if snapshot_backend or spill_directory else None,
+    is_stale=session_is_stale if shared_state else None,
+    session_lock=session_locks.get,
+)
+
+
+def take_snapshot(session_id):
+    with session_locks.read(session_id):
+        values = sessions.peek(session_id)
+        # Evicted sessions were already written when they left memory
+        return snapshot_session(values) if values is not None else None
+
+
+snapshot_writer = (
+    SnapshotWriter(snapshot_backend, take_snapshot)
+    if snapshot_backend and not shared_state
+    else None
+)
+if snapshot_writer is not None:
+    atexit.register(snapshot_writer.close)
+
+# Storage for user layouts
+layouts = sessions.view("layout")
+
+# Storage for user networks
+networks = sessions.view("network")
+
+# Storage for user verilog
+verilogs = sessions.view("verilog")
+
+# Storage for the revision history of user layouts
+revisions = sessions.view("revisions")
+
+# Storage for exports and intermediate products of user layouts
+artifacts = sessions.view("artifacts")
+
+# Storage for the incremental design rule checks of user layouts
+drc_checkers = sessions.view("drc")
+
+# Default wall-clock budget (in seconds) of an algorithm portfolio
+PORTFOLIO_BUDGET = 10
+
+# Background execution of long-running physical design algorithms
+job_manager = JobManager(
+    max_workers=max(worker_pool.processes, 1),
+    registry=SQLiteJobRegistry(snapshot_backend.path) if shared_state else None,
+)
+
+
+def with_session_lock(mode):
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            session_id = session.get("session_id")
+            if session_id is None:
+                return view(*args, **kwargs)
+            with getattr(session_locks, mode)(session_id):
+                return view(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+# Metrics exposed on /metrics in addition to the timings of pyfiction calls
+request_seconds = registry.register(
+    Histogram(
+        "mnt_designer_request_duration_seconds",
+        "Duration of requests by route.",
+        ("route", "method"),
+    )
+)
+requests_total = registry.register(
+    Counter(
+        "mnt_designer_requests_total",
+        "Number of requests by route and status code.",
+        ("route", "method", "status"),
+    )
+)
+registry.register(
+    Gauge(
+        "mnt_designer_sessions",
+        "Number of sessions in memory.",
+        lambda: sessions.stats()["sessions"],
+    )
+)
+registry.register(
+    Gauge(
+        "mnt_designer_session_bytes",
+        "Estimated memory used by the sessions in memory.",
+        lambda: sessions.stats()["resident_bytes"],
+    )
+)
+registry.register(
+    Gauge(
+        "mnt_designer_jobs_in_flight",
+        "Number of queued and running jobs.",
+        job_manager.in_flight,
+    )
+)
+
+
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
 
-# In-memory storage for user verilog
-verilogs = {}
+@app.after_request
+def record_request(response):
+    if "request_start" in g:
+        route = request.url_rule.rule if request.url_rule else "<unmatched>"
+        elapsed = time.perf_counter() - g.request_start
+        request_seconds.observe(elapsed, route, request.method)
+        requests_total.inc(route, request.method, str(response.status_code))
+    return response
+
+
+# Opt-in profiling for development instances: with a dump directory, requests
+# carrying an X-MNT-Profile header (or all of them) are profiled, keeping at
+# most the given number of megabytes of dumps
+if "MNT_DESIGNER_PROFILE_DIR" in os.environ:
+    RequestProfiler(
+        os.environ["MNT_DESIGNER_PROFILE_DIR"],
+        max_bytes=int(
+            (env_number("MNT_DESIGNER_PROFILE_MAX_MB", float) or 100) * 1024**2
+        ),
+        always=os.environ.get("MNT_DESIGNER_PROFILE_ALL", "") not in ("", "0"),
+    ).init_app(app)
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return Response(registry.render(), mimetype=None, content_type=CONTENT_TYPE)
 
 
 @app.route("/")
@@ -85,6 +363,7 @@ def index():
 
 
 @app.route("/create_layout", methods=["POST"])
+@with_session_lock("write")
 def create_layout():
     try:
         data = request.json
@@ -104,12 +383,14 @@ def create_layout():
 
         # Resize the existing layout
         layout.resize((x, y, z))
+        record_reset(session_id)
         return jsonify({"success": True})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
 
 
 @app.route("/reset_layout", methods=["POST"])
+@with_session_lock("write")
 def reset_layout():
     try:
         data = request.json
@@ -122,6 +403,7 @@ def reset_layout():
 
         session_id = session["session_id"]
         layouts[session_id] = layout
+        record_reset(session_id)
 
         return jsonify({"success": True})
     except Exception as e:
@@ -129,6 +411,7 @@ def reset_layout():
 
 
 @app.route("/reset_editor", methods=["POST"])
+@with_session_lock("write")
 def reset_editor():
     try:
         session_id = session.get("session_id")
@@ -141,6 +424,7 @@ def reset_editor():
         # Reset the editor's code to the default
         verilogs[session_id] = default_verilog_code
         networks[session_id] = None
+        record_edit(session_id, ())
 
         return jsonify({"success": True, "code": default_verilog_code}), 200
 
@@ -149,6 +433,7 @@ def reset_editor():
 
 
 @app.route("/place_gate", methods=["POST"])
+@with_session_lock("write")
 def place_gate():
     try:
         data = request.json
@@ -156,436 +441,18 @@ def place_gate():
         y = int(data["y"])
         gate_type = data["gate_type"]
         params = data["params"]
-        update_first = False
-        update_second = False
 
         session_id = session["session_id"]
         layout = layouts.get(session_id)
         if not layout:
             return jsonify({"success": False, "error": "Layout not found."})
 
-        node = layout.get_node((x, y))
-        if node != 0:
-            return jsonify({"success": False, "error": "Tile already has a gate."})
-
-        if gate_type in ["bufc", "bufk"] and layout.z() == 0:
-            layout.resize((layout.x(), layout.y(), 1))
-
-        # Enforce incoming signal constraints
-        if gate_type == "pi":
-            if params:
-                return jsonify(
-                    {"success": False, "error": "PI gate cannot have inputs."}
-                )
-            layout.create_pi("", (x, y))
-        elif gate_type in ["buf", "inv", "po"]:
-            if "first" not in params or "second" in params:
-                return jsonify(
-                    {
-                        "success": False,
-                        "error": f"{gate_type.upper()} gate requires exactly one input.",
-                    }
-                )
-            source_x = int(params["first"]["position"]["x"])
-            source_y = int(params["first"]["position"]["y"])
-            source_z = 0
-            source_gate_type = params["first"]["gate_type"]
-
-            if source_gate_type == "bufc":
-                if source_x < x:
-                    if layout.has_southern_outgoing_signal((source_x, source_y, 0)):
-                        source_z = 1
-                    elif layout.has_southern_outgoing_signal((source_x, source_y, 1)):
-                        source_z = 0
-                    else:
-                        if layout.has_northern_incoming_signal((source_x, source_y, 0)):
-                            source_z = 1
-                        elif layout.has_northern_incoming_signal(
-                            (source_x, source_y, 1)
-                        ):
-                            source_z = 0
-                        else:
-                            return jsonify(
-                                {"success": False, "error": "Something went wrong."}
-                            )
-                elif source_y < y:
-                    if layout.has_eastern_outgoing_signal((source_x, source_y, 0)):
-                        source_z = 1
-                    elif layout.has_eastern_outgoing_signal((source_x, source_y, 1)):
-                        source_z = 0
-                    else:
-                        if layout.has_northern_incoming_signal((source_x, source_y, 0)):
-                            source_z = 0
-                        elif layout.has_northern_incoming_signal(
-                            (source_x, source_y, 1)
-                        ):
-                            source_z = 1
-                        else:
-                            return jsonify(
-                                {"success": False, "error": "Something went wrong."}
-                            )
-                else:
-                    return jsonify({"success": False, "error": "Something went wrong."})
-
-            if source_gate_type == "bufk":
-                if source_x < x:
-                    if layout.has_southern_outgoing_signal((source_x, source_y, 0)):
-                        source_z = 1
-                    elif layout.has_southern_outgoing_signal((source_x, source_y, 1)):
-                        source_z = 0
-                    else:
-                        if layout.has_northern_incoming_signal((source_x, source_y, 0)):
-                            source_z = 0
-                        elif layout.has_northern_incoming_signal(
-                            (source_x, source_y, 1)
-                        ):
-                            source_z = 1
-                        else:
-                            return jsonify(
-                                {"success": False, "error": "Something went wrong."}
-                            )
-                elif source_y < y:
-                    if layout.has_eastern_outgoing_signal((source_x, source_y, 0)):
-                        source_z = 1
-                    elif layout.has_eastern_outgoing_signal((source_x, source_y, 1)):
-                        source_z = 0
-                    else:
-                        if layout.has_northern_incoming_signal((source_x, source_y, 0)):
-                            source_z = 1
-                        elif layout.has_northern_incoming_signal(
-                            (source_x, source_y, 1)
-                        ):
-                            source_z = 0
-                        else:
-                            return jsonify(
-                                {"success": False, "error": "Something went wrong."}
-                            )
-                else:
-                    return jsonify({"success": False, "error": "Something went wrong."})
-
-            source_node = layout.get_node((source_x, source_y, source_z))
-            if not source_node:
-                return jsonify({"success": False, "error": "Source gate not found."})
-
-            # Check if the gate already has inputs
-            existing_fanins = layout.fanins((x, y))
-            if existing_fanins:
-                return jsonify(
-                    {
-                        "success": False,
-                        "error": f"Gate at ({x}, {y}) cannot have more than 1 input.",
-                    }
-                )
-
-            # Determine allowed number of fanouts
-            existing_fanouts = layout.fanouts((source_x, source_y, source_z))
-            num_fanouts = len(existing_fanouts)
-
-            if layout.is_po(source_node):
-                max_fanouts = 0
-            elif layout.is_wire(source_node) and not source_z == 1:
-                max_fanouts = 2
-            else:
-                max_fanouts = 1
-
-            if num_fanouts >= max_fanouts:
-                return jsonify(
-                    {
-                        "success": False,
-                        "error": f"Gate at ({source_x}, {source_y}, {source_z}) cannot have more than {max_fanouts} outgoing connections.",
-                    }
-                )
-
-            if gate_type == "po":
-                layout.create_po(layout.make_signal(source_node), "", (x, y))
-            elif gate_type == "inv":
-                layout.create_not(layout.make_signal(source_node), (x, y))
-            elif gate_type == "buf":
-                layout.create_buf(layout.make_signal(source_node), (x, y))
-            if layout.fanout_size(source_node) == 2:
-                update_first = True
-        elif gate_type in ["and", "or", "nor", "xor", "xnor", "bufc", "bufk"]:
-            if "first" not in params or "second" not in params:
-                return jsonify(
-                    {
-                        "success": False,
-                        "error": f"{gate_type.upper()} gate requires exactly two inputs.",
-                    }
-                )
-            first_x = int(params["first"]["position"]["x"])
-            first_y = int(params["first"]["position"]["y"])
-            first_z = 0
-            first_source_gate_type = params["first"]["gate_type"]
-            if first_source_gate_type == "bufc":
-                if first_x < x:
-                    if layout.has_southern_outgoing_signal((first_x, first_y, 0)):
-                        first_z = 1
-                    elif layout.has_southern_outgoing_signal((first_x, first_y, 1)):
-                        first_z = 0
-                    else:
-                        if layout.has_northern_incoming_signal((first_x, first_y, 0)):
-                            first_z = 1
-                        elif layout.has_northern_incoming_signal((first_x, first_y, 1)):
-                            first_z = 0
-                        else:
-                            return jsonify(
-                                {"success": False, "error": "Something went wrong."}
-                            )
-                elif first_y < y:
-                    if layout.has_eastern_outgoing_signal((first_x, first_y, 0)):
-                        first_z = 1
-                    elif layout.has_eastern_outgoing_signal((first_x, first_y, 1)):
-                        first_z = 0
-                    else:
-                        if layout.has_northern_incoming_signal((first_x, first_y, 0)):
-                            first_z = 0
-                        elif layout.has_northern_incoming_signal((first_x, first_y, 1)):
-                            first_z = 1
-                        else:
-                            return jsonify(
-                                {"success": False, "error": "Something went wrong."}
-                            )
-                else:
-                    return jsonify({"success": False, "error": "Something went wrong."})
-
-            if first_source_gate_type == "bufk":
-                if first_x < x:
-                    if layout.has_southern_outgoing_signal((first_x, first_y, 0)):
-                        first_z = 1
-                    elif layout.has_southern_outgoing_signal((first_x, first_y, 1)):
-                        first_z = 0
-                    else:
-                        if layout.has_northern_incoming_signal((first_x, first_y, 0)):
-                            first_z = 0
-                        elif layout.has_northern_incoming_signal((first_x, first_y, 1)):
-                            first_z = 1
-                        else:
-                            return jsonify(
-                                {"success": False, "error": "Something went wrong."}
-                            )
-                elif first_y < y:
-                    if layout.has_eastern_outgoing_signal((first_x, first_y, 0)):
-                        first_z = 1
-                    elif layout.has_eastern_outgoing_signal((first_x, first_y, 1)):
-                        first_z = 0
-                    else:
-                        if layout.has_northern_incoming_signal((first_x, first_y, 0)):
-                            first_z = 1
-                        elif layout.has_northern_incoming_signal((first_x, first_y, 1)):
-                            first_z = 0
-                        else:
-                            return jsonify(
-                                {"success": False, "error": "Something went wrong."}
-                            )
-                else:
-                    return jsonify({"success": False, "error": "Something went wrong."})
-            second_x = int(params["second"]["position"]["x"])
-            second_y = int(params["second"]["position"]["y"])
-            second_z = 0
-            second_source_gate_type = params["second"]["gate_type"]
-            if second_source_gate_type == "bufc":
-                if second_x < x:
-                    if layout.has_southern_outgoing_signal((second_x, second_y, 0)):
-                        second_z = 1
-                    elif layout.has_southern_outgoing_signal((second_x, second_y, 1)):
-                        second_z = 0
-                    else:
-                        if layout.has_northern_incoming_signal((second_x, second_y, 0)):
-                            second_z = 1
-                        elif layout.has_northern_incoming_signal(
-                            (second_x, second_y, 1)
-                        ):
-                            second_z = 0
-                        else:
-                            return jsonify(
-                                {"success": False, "error": "Something went wrong."}
-                            )
-                elif second_y < y:
-                    if layout.has_eastern_outgoing_signal((second_x, second_y, 0)):
-                        second_z = 1
-                    elif layout.has_eastern_outgoing_signal((second_x, second_y, 1)):
-                        second_z = 0
-                    else:
-                        if layout.has_northern_incoming_signal((second_x, second_y, 0)):
-                            second_z = 0
-                        elif layout.has_northern_incoming_signal(
-                            (second_x, second_y, 1)
-                        ):
-                            second_z = 1
-                        else:
-                            return jsonify(
-                                {"success": False, "error": "Something went wrong."}
-                            )
-                else:
-                    return jsonify({"success": False, "error": "Something went wrong."})
-
-            if first_source_gate_type == "bufk":
-                if second_x < x:
-                    if layout.has_southern_outgoing_signal((second_x, second_y, 0)):
-                        second_z = 1
-                    elif layout.has_southern_outgoing_signal((second_x, second_y, 1)):
-                        second_z = 0
-                    else:
-                        if layout.has_northern_incoming_signal((second_x, second_y, 0)):
-                            second_z = 0
-                        elif layout.has_northern_incoming_signal(
-                            (second_x, second_y, 1)
-                        ):
-                            second_z = 1
-                        else:
-                            return jsonify(
-                                {"success": False, "error": "Something went wrong."}
-                            )
-                elif second_y < y:
-                    if layout.has_eastern_outgoing_signal((second_x, second_y, 0)):
-                        second_z = 1
-                    elif layout.has_eastern_outgoing_signal((second_x, second_y, 1)):
-                        second_z = 0
-                    else:
-                        if layout.has_northern_incoming_signal((second_x, second_y, 0)):
-                            second_z = 1
-                        elif layout.has_northern_incoming_signal(
-                            (second_x, second_y, 1)
-                        ):
-                            second_z = 0
-                        else:
-                            return jsonify(
-                                {"success": False, "error": "Something went wrong."}
-                            )
-                else:
-                    return jsonify({"success": False, "error": "Something went wrong."})
-            first_node = layout.get_node((first_x, first_y, first_z))
-            second_node = layout.get_node((second_x, second_y, second_z))
-            if not first_node or not second_node:
-                return jsonify(
-                    {"success": False, "error": "One or both source gates not found."}
-                )
-
-            # Check if the gate already has inputs
-            existing_fanins = layout.fanins((x, y))
-            if len(existing_fanins) >= 2:
-                return jsonify(
-                    {
-                        "success": False,
-                        "error": f"Gate at ({x}, {y}) cannot have more than 2 inputs.",
-                    }
-                )
-
-            for existing_fanin in existing_fanins:
-                # Determine allowed number of fanouts
-                existing_fanouts = layout.fanouts(existing_fanin)
-                num_fanouts = len(existing_fanouts)
-
-                if layout.is_po(existing_fanin):
-                    max_fanouts = 0
-                elif layout.is_wire(existing_fanin) and not existing_fanin.z == 1:
-                    max_fanouts = 2
-                else:
-                    max_fanouts = 1
-
-                if num_fanouts >= max_fanouts:
-                    return jsonify(
-                        {
-                            "success": False,
-                            "error": f"Gate at {existing_fanin} cannot have more than {max_fanouts} outgoing connections.",
-                        }
-                    )
-
-            # Determine allowed number of fanouts
-            existing_fanouts_first_node = layout.fanouts((first_x, first_y, first_z))
-            num_fanouts_first_node = len(existing_fanouts_first_node)
-
-            if layout.is_po(first_node):
-                max_fanouts_first_node = 0
-            elif layout.is_wire(first_node) and not first_z == 1:
-                max_fanouts_first_node = 2
-            else:
-                max_fanouts_first_node = 1
-
-            if num_fanouts_first_node >= max_fanouts_first_node:
-                return jsonify(
-                    {
-                        "success": False,
-                        "error": f"Gate at ({first_x}, {first_y}, {first_z}) cannot have more than {max_fanouts_first_node} outgoing connections.",
-                    }
-                )
-
-                # Determine allowed number of fanouts
-            existing_fanouts_second_node = layout.fanouts(
-                (second_x, second_y, second_z)
-            )
-            num_fanouts_second_node = len(existing_fanouts_second_node)
-
-            if layout.is_po(second_node):
-                max_fanouts_second_node = 0
-            elif layout.is_wire(second_node) and not second_z == 1:
-                max_fanouts_second_node = 2
-            else:
-                max_fanouts_second_node = 1
-
-            if num_fanouts_second_node >= max_fanouts_second_node:
-                return jsonify(
-                    {
-                        "success": False,
-                        "error": f"Gate at ({second_x}, {second_y}, {second_z}) cannot have more than {max_fanouts_second_node} outgoing connections.",
-                    }
-                )
-
-            if gate_type == "and":
-                layout.create_and(
-                    layout.make_signal(first_node),
-                    layout.make_signal(second_node),
-                    (x, y),
-                )
-            elif gate_type == "or":
-                layout.create_or(
-                    layout.make_signal(first_node),
-                    layout.make_signal(second_node),
-                    (x, y),
-                )
-            elif gate_type == "nor":
-                layout.create_nor(
-                    layout.make_signal(first_node),
-                    layout.make_signal(second_node),
-                    (x, y),
-                )
-            elif gate_type == "xor":
-                layout.create_xor(
-                    layout.make_signal(first_node),
-                    layout.make_signal(second_node),
-                    (x, y),
-                )
-            elif gate_type == "xnor":
-                layout.create_xnor(
-                    layout.make_signal(first_node),
-                    layout.make_signal(second_node),
-                    (x, y),
-                )
-            elif gate_type in ["bufc", "bufk"]:
-                layout.create_buf(layout.make_signal(first_node), (x, y, 0))
-                layout.create_buf(layout.make_signal(second_node), (x, y, 1))
-                layout.obstruct_coordinate((x, y, 1))
-            if layout.fanout_size(first_node) == 2:
-                update_first = True
-            if layout.fanout_size(second_node) == 2:
-                update_second = True
-        else:
-            return jsonify(
-                {"success": False, "error": f"Unsupported gate type: {gate_type}"}
-            )
-
-        layout.obstruct_coordinate((x, y, 0))
+        result = place_gate_function(layout, x, y, gate_type, params)
+        if not result["success"]:
+            return jsonify(result)
 
-        return (
-            jsonify(
-                {
-                    "success": True,
-                    "updateFirstBufToFanout": update_first,
-                    "updateSecondBufToFanout": update_second,
-                }
-            ),
-            200,
-        )
+        result["revision"] = record_edit(session_id, placement_tiles(x, y, params))
+        return jsonify(result), 200
 
     except Exception as e:
         print(f"Error in place_gate: {e}")
@@ -593,6 +460,7 @@ def place_gate():
 
 
 @app.route("/delete_gate", methods=["POST"])
+@with_session_lock("write")
 def delete_gate():
     try:
         data = request.json
@@ -604,57 +472,21 @@ def delete_gate():
         if not layout:
             return jsonify({"success": False, "error": "Layout not found."})
 
-        if not layout.is_empty_tile((x, y, 1)):
-            node = layout.get_node((x, y, 1))
-            if node:
-                # Find all gates that use this node as an input signal
-                outgoing_tiles = layout.fanouts((x, y, 1))
-                layout.clear_tile((x, y, 1))
-                layout.clear_obstructed_coordinate((x, y, 1))
-
-                # Update signals for dependent nodes
-                for outgoing_tile in outgoing_tiles:
-                    # Get the other input signals, if any
-                    incoming_tiles = layout.fanins(outgoing_tile)
-                    incoming_signals = [
-                        layout.make_signal(layout.get_node(inp))
-                        for inp in incoming_tiles
-                        if inp != (x, y, 1)
-                    ]
-                    layout.move_node(
-                        layout.get_node(outgoing_tile), outgoing_tile, incoming_signals
-                    )
-        # Remove the gate from the layout
-        node = layout.get_node((x, y))
-        if node:
-            # Find all gates that use this node as an input signal
-            outgoing_tiles = layout.fanouts((x, y))
-            layout.clear_tile((x, y))
-            layout.clear_obstructed_coordinate((x, y))
-
-            # Update signals for dependent nodes
-            for outgoing_tile in outgoing_tiles:
-                # Get the other input signals, if any
-                incoming_tiles = layout.fanins(outgoing_tile)
-                incoming_signals = [
-                    layout.make_signal(layout.get_node(inp))
-                    for inp in incoming_tiles
-                    if inp != (x, y)
-                ]
-                layout.move_node(
-                    layout.get_node(outgoing_tile), outgoing_tile, incoming_signals
-                )
+        result = delete_gate_function(layout, x, y)
+        tiles = result.pop("tiles")
+        if not result["success"]:
+            if tiles:
+                record_edit(session_id, tiles)
+            return jsonify(result)
 
-            return jsonify({"success": True})
-        else:
-            return jsonify(
-                {"success": False, "error": "Gate not found at the specified position."}
-            )
+        result["revision"] = record_edit(session_id, tiles)
+        return jsonify(result)
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
 
 
 @app.route("/connect_gates", methods=["POST"])
+@with_session_lock("write")
 def connect_gates():
     try:
         data = request.json
@@ -663,256 +495,64 @@ def connect_gates():
         if not layout:
             return jsonify({"success": False, "error": "Layout not found."})
 
-        source_x = int(data["source_x"])
-        source_y = int(data["source_y"])
-        source_z = 0
-        source_gate_type = data["source_gate_type"]
-        target_x = int(data["target_x"])
-        target_y = int(data["target_y"])
-        target_z = 0
-        target_gate_type = data["target_gate_type"]
-        find_path = data["find_path"]
-
-        if source_gate_type == "bufc":
-            if find_path:
-                return jsonify(
-                    {
-                        "success": False,
-                        "error": "Source gate is a crossing and the outgoing direction cannot be specified, create a connected buffer first.",
-                    }
-                )
-            if source_x < target_x:
-                if layout.has_southern_outgoing_signal((source_x, source_y, 0)):
-                    source_z = 1
-                elif layout.has_southern_outgoing_signal((source_x, source_y, 1)):
-                    source_z = 0
-                else:
-                    if layout.has_northern_incoming_signal((source_x, source_y, 0)):
-                        source_z = 1
-                    elif layout.has_northern_incoming_signal((source_x, source_y, 1)):
-                        source_z = 0
-                    else:
-                        source_z = 0
-            elif source_y < target_y:
-                if layout.has_eastern_outgoing_signal((source_x, source_y, 0)):
-                    source_z = 1
-                elif layout.has_eastern_outgoing_signal((source_x, source_y, 1)):
-                    source_z = 0
-                else:
-                    if layout.has_northern_incoming_signal((source_x, source_y, 0)):
-                        source_z = 0
-                    elif layout.has_northern_incoming_signal((source_x, source_y, 1)):
-                        source_z = 1
-                    else:
-                        source_z = 0
-            else:
-                return jsonify({"success": False, "error": "Something went wrong."})
-
-        if source_gate_type == "bufk":
-            if find_path:
-                return jsonify(
-                    {
-                        "success": False,
-                        "error": "Source gate is a crossing and the outgoing direction cannot be specified, create a connected buffer first.",
-                    }
-                )
-            if source_x < target_x:
-                if layout.has_southern_outgoing_signal((source_x, source_y, 0)):
-                    source_z = 1
-                elif layout.has_southern_outgoing_signal((source_x, source_y, 1)):
-                    source_z = 0
-                else:
-                    if layout.has_northern_incoming_signal((source_x, source_y, 0)):
-                        source_z = 0
-                    elif layout.has_northern_incoming_signal((source_x, source_y, 1)):
-                        source_z = 1
-                    else:
-                        source_z = 0
-            elif source_y < target_y:
-                if layout.has_eastern_outgoing_signal((source_x, source_y, 0)):
-                    source_z = 1
-                elif layout.has_eastern_outgoing_signal((source_x, source_y, 1)):
-                    source_z = 0
-                else:
-                    if layout.has_northern_incoming_signal((source_x, source_y, 0)):
-                        source_z = 1
-                    elif layout.has_northern_incoming_signal((source_x, source_y, 1)):
-                        source_z = 0
-                    else:
-                        source_z = 0
-            else:
-                return jsonify({"success": False, "error": "Something went wrong."})
-
-        if target_gate_type == "bufc":
-            if find_path:
-                return jsonify(
-                    {
-                        "success": False,
-                        "error": "Target gate is a crossing and the incoming direction cannot be specified, create a connected buffer first.",
-                    }
-                )
-            if source_x < target_x:
-                if layout.has_southern_outgoing_signal((target_x, target_y, 0)):
-                    target_z = 1
-                elif layout.has_southern_outgoing_signal((target_x, target_y, 1)):
-                    target_z = 0
-                else:
-                    if layout.has_northern_incoming_signal((target_x, target_y, 0)):
-                        target_z = 1
-                    elif layout.has_northern_incoming_signal((target_x, target_y, 1)):
-                        target_z = 0
-                    else:
-                        target_z = 0
-            elif source_y < target_y:
-                if layout.has_eastern_outgoing_signal((target_x, target_y, 0)):
-                    target_z = 1
-                elif layout.has_eastern_outgoing_signal((target_x, target_y, 1)):
-                    target_z = 0
-                else:
-                    if layout.has_western_incoming_signal((target_x, target_y, 0)):
-                        target_z = 1
-                    elif layout.has_western_incoming_signal((target_x, target_y, 1)):
-                        target_z = 0
-                    else:
-                        target_z = 0
-            else:
-                return jsonify({"success": False, "error": "Something went wrong."})
-
-        if target_gate_type == "bufk":
-            if find_path:
-                return jsonify(
-                    {
-                        "success": False,
-                        "error": "Target gate is a crossing and the incoming direction cannot be specified, create a connected buffer first.",
-                    }
-                )
-            if source_x < target_x:
-                if layout.has_southern_outgoing_signal((target_x, target_y, 0)):
-                    target_z = 0
-                elif layout.has_southern_outgoing_signal((target_x, target_y, 1)):
-                    target_z = 1
-                else:
-                    if layout.has_northern_incoming_signal((target_x, target_y, 0)):
-                        target_z = 1
-                    elif layout.has_northern_incoming_signal((target_x, target_y, 1)):
-                        target_z = 0
-                    else:
-                        target_z = 0
-            elif source_y < target_y:
-                if layout.has_eastern_outgoing_signal((target_x, target_y, 0)):
-                    target_z = 0
-                elif layout.has_eastern_outgoing_signal((target_x, target_y, 1)):
-                    target_z = 1
-                else:
-                    if layout.has_western_incoming_signal((target_x, target_y, 0)):
-                        target_z = 1
-                    elif layout.has_western_incoming_signal((target_x, target_y, 1)):
-                        target_z = 0
-                    else:
-                        target_z = 0
-            else:
-                return jsonify({"success": False, "error": "Something went wrong."})
-
-        source_node = layout.get_node((source_x, source_y, source_z))
-        target_node = layout.get_node((target_x, target_y, target_z))
-
-        if not source_node:
-            return jsonify({"success": False, "error": "Source gate not found."})
-        if not target_node:
-            return jsonify({"success": False, "error": "Target gate not found."})
-
-        # Determine allowed number of fanouts
-        existing_fanouts = layout.fanouts((source_x, source_y, source_z))
-        num_fanouts = len(existing_fanouts)
-
-        if layout.is_po(source_node):
-            max_fanouts = 0
-        elif layout.is_wire(source_node) and not source_z == 1:
-            max_fanouts = 2
-        else:
-            max_fanouts = 1
-
-        if num_fanouts >= max_fanouts:
-            return jsonify(
-                {
-                    "success": False,
-                    "error": f"Gate at ({source_x}, {source_y}, {source_z}) cannot have more than {max_fanouts} outgoing connections.",
-                }
-            )
-
-        # Determine allowed number of fanins
-        existing_fanins = layout.fanins((target_x, target_y, target_z))
-        num_fanins = len(existing_fanins)
-
-        if layout.is_pi(target_node):
-            max_fanins = 0
-        elif layout.is_wire(target_node) or layout.is_inv(target_node):
-            max_fanins = 1
-        else:
-            max_fanins = 2
+        result = connect_gates_function(
+            layout,
+            int(data["source_x"]),
+            int(data["source_y"]),
+            data["source_gate_type"],
+            int(data["target_x"]),
+            int(data["target_y"]),
+            data["target_gate_type"],
+            data["find_path"],
+        )
+        if not result["success"]:
+            return jsonify(result)
 
-        if num_fanins >= max_fanins:
-            return jsonify(
-                {
-                    "success": False,
-                    "error": f"Gate at ({target_x}, {target_y}, {target_z}) cannot have more than {max_fanins} incoming connections.",
-                }
-            )
+        result["revision"] = record_edit(session_id, result["path"])
+        return jsonify(result), 200
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)})
 
-        if (source_x, source_y, source_z) in existing_fanins:
-            return jsonify(
-                {
-                    "success": False,
-                    "error": f"Gate at ({target_x}, {target_y}, {target_z}) is already connected to ({source_x}, {source_y}, {source_z}.",
-                }
-            )
-        else:
-            if not find_path:
-                existing_fanins.append((source_x, source_y, source_z))
 
-        incoming_signals = []
-        for fanin in existing_fanins:
-            incoming_signals.append(layout.make_signal(layout.get_node(fanin)))
+@app.route("/place_gates", methods=["POST"])
+@with_session_lock("write")
+def place_gates():
+    try:
+        data = request.json
+        items = data.get("items")
+        if not isinstance(items, list) or not items:
+            return jsonify({"success": False, "error": "No items provided."})
 
-        if find_path:
-            path = a_star(
-                layout, (source_x, source_y, source_z), (target_x, target_y, target_z)
-            )
+        session_id = session["session_id"]
+        layout = layouts.get(session_id)
+        if not layout:
+            return jsonify({"success": False, "error": "Layout not found."})
 
-            if not path:
-                return jsonify(
-                    {
-                        "success": False,
-                        "error": "No (crossing-free) path found between the selected gates.",
-                    }
-                )
-        else:
-            path = [(source_x, source_y, source_z), (target_x, target_y, target_z)]
-
-        if find_path:
-            route_path(layout, path)
-        else:
-            layout.move_node(
-                target_node, (target_x, target_y, target_z), incoming_signals
-            )
+        # Try all items on a copy first, so that the session layout is only
+        # changed if every single one of them succeeds. The copy keeps dead
+        # nodes and their connections, but loses connections that pyfiction
+        # does not list, so the items are then applied to the session layout
+        # itself.
+        failure = apply_batch(copy_layout(layout, layout_dead_nodes(layout)), items)[3]
+        if failure is not None:
+            return jsonify(failure)
 
-        if layout.fanout_size(source_node) == 2:
-            update = True
-        else:
-            update = False
+        results, touched, fanout_updates, failure = apply_batch(layout, items)
+        if failure is not None:
+            # The items before the failed one may have changed the layout
+            if failure["failedIndex"] > 0:
+                failure["revision"] = record_edit(session_id, touched)
+            return jsonify(failure)
 
-        if find_path:
-            for coord in path:
-                layout.obstruct_coordinate(coord)
+        revision = record_edit(session_id, touched)
 
         return (
             jsonify(
                 {
                     "success": True,
-                    "updateBufToFanout": update,
-                    "path": [(coord.x, coord.y) for coord in path]
-                    if data["find_path"]
-                    else [(source_x, source_y), (target_x, target_y)],
+                    "results": results,
+                    "fanoutUpdates": fanout_updates,
+                    "revision": revision,
                 }
             ),
             200,
@@ -921,7 +561,75 @@ def connect_gates():
         return jsonify({"success": False, "error": str(e)})
 
 
+def apply_batch(layout, items):
+    # Applies items up to the first one that fails, and returns that failure
+    results = []
+    touched = set()
+    fanout_updates = []
+    for index, item in enumerate(items):
+        try:
+            result = apply_batch_item(layout, item, touched, fanout_updates)
+        except Exception as e:
+            result = {"success": False, "error": str(e)}
+        results.append(result)
+
+        if not result["success"]:
+            failure = {
+                "success": False,
+                "error": f"Item {index}: {result['error']}",
+                "failedIndex": index,
+                "results": results,
+            }
+            return results, touched, fanout_updates, failure
+    return results, touched, fanout_updates, None
+
+
+def apply_batch_item(layout, item, touched, fanout_updates):
+    action = item.get("action", "place_gate")
+    if action == "place_gate":
+        x = int(item["x"])
+        y = int(item["y"])
+        params = item.get("params") or {}
+        result = place_gate_function(layout, x, y, item["gate_type"], params)
+        if result["success"]:
+            touched.update(placement_tiles(x, y, params))
+            for key, flag in (
+                ("first", "updateFirstBufToFanout"),
+                ("second", "updateSecondBufToFanout"),
+            ):
+                if result[flag]:
+                    fanout_updates.append(
+                        {
+                            "x": int(params[key]["position"]["x"]),
+                            "y": int(params[key]["position"]["y"]),
+                        }
+                    )
+        return result
+
+    if action == "connect_gates":
+        source_x = int(item["source_x"])
+        source_y = int(item["source_y"])
+        result = connect_gates_function(
+            layout,
+            source_x,
+            source_y,
+            item["source_gate_type"],
+            int(item["target_x"]),
+            int(item["target_y"]),
+            item["target_gate_type"],
+            item.get("find_path", False),
+        )
+        if result["success"]:
+            touched.update(tuple(tile) for tile in result["path"])
+            if result["updateBufToFanout"]:
+                fanout_updates.append({"x": source_x, "y": source_y})
+        return result
+
+    return {"success": False, "error": f"Unknown action: {action}."}
+
+
 @app.route("/move_gate", methods=["POST"])
+@with_session_lock("write")
 def move_gate():
     try:
         data = request.json
@@ -930,81 +638,19 @@ def move_gate():
         if not layout:
             return jsonify({"success": False, "error": "Layout not found."})
 
-        source_x = int(data["source_x"])
-        source_y = int(data["source_y"])
-        source_gate_type = data["source_gate_type"]
-        source_z = 0 if source_gate_type not in ("bufc", "bufk") else 1
-        source = (source_x, source_y, source_z)
-        target_x = int(data["target_x"])
-        target_y = int(data["target_y"])
-        target_z = 0
-        target = (target_x, target_y, target_z)
-
-        source_node = layout.get_node(source)
-
-        if not source_node:
-            return jsonify({"success": False, "error": "Source gate not found."})
-
-        # Find all gates that use this node as an input signal
-        outgoing_tiles = layout.fanouts(source)
-
-        layout.move_node(source_node, target, [])
-        layout.clear_obstructed_coordinate(source)
-        layout.obstruct_coordinate(target)
-
-        # Update signals for dependent nodes
-        for outgoing_tile in outgoing_tiles:
-            # Get the other input signals, if any
-            incoming_tiles = layout.fanins(outgoing_tile)
-            incoming_signals = [
-                layout.make_signal(layout.get_node(inp))
-                for inp in incoming_tiles
-                if inp != source
-            ]
-            layout.move_node(
-                layout.get_node(outgoing_tile), outgoing_tile, incoming_signals
-            )
-
-        if source_gate_type in ("bufc", "bufk"):
-            source_z = 0
-            source = (source_x, source_y, source_z)
-            target_z = 1
-            target = (target_x, target_y, target_z)
-
-            source_node = layout.get_node(source)
-
-            if not source_node:
-                return jsonify({"success": False, "error": "Source gate not found."})
-
-            # Find all gates that use this node as an input signal
-            outgoing_tiles = layout.fanouts(source)
-            layout.move_node(source_node, target, [])
-            layout.clear_tile(source)
-            layout.clear_obstructed_coordinate(source)
-            layout.obstruct_coordinate(target)
-
-            # Update signals for dependent nodes
-            for outgoing_tile in outgoing_tiles:
-                # Get the other input signals, if any
-                incoming_tiles = layout.fanins(outgoing_tile)
-                incoming_signals = [
-                    layout.make_signal(layout.get_node(inp))
-                    for inp in incoming_tiles
-                    if inp != source
-                ]
-                layout.move_node(
-                    layout.get_node(outgoing_tile), outgoing_tile, incoming_signals
-                )
-
-        return (
-            jsonify(
-                {
-                    "success": True,
-                    "updateGateType": source_gate_type == "fanout",
-                }
-            ),
-            200,
+        result = move_gate_function(
+            layout,
+            int(data["source_x"]),
+            int(data["source_y"]),
+            data["source_gate_type"],
+            int(data["target_x"]),
+            int(data["target_y"]),
         )
+        if not result["success"]:
+            return jsonify(result)
+
+        result["revision"] = record_edit(session_id, result.pop("tiles"))
+        return jsonify(result), 200
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
 
@@ -1013,19 +659,45 @@ def move_gate():
 def check_design_rules():
     try:
         session_id = session["session_id"]
-        layout = layouts.get(session_id)
-        if not layout:
-            return jsonify({"success": False, "error": "Layout not found."})
+        with session_locks.read(session_id):
+            layout = layouts.get(session_id)
+            if not layout:
+                return jsonify({"success": False, "error": "Layout not found."})
+
+            violations = session_design_rules(session_id, layout)
+
+        warnings, errors = count_violations(violations)
+        result = {
+            "success": True,
+            "errors": errors,
+            "warnings": warnings,
+            "violations": [violation.to_dict() for violation in violations],
+        }
+        # Clients that only need the records can skip the text report
+        if request.args.get("report", "true").lower() == "true":
+            result["report"] = format_report(violations)
+        return jsonify(result), 200
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)})
+
+
+@app.route("/dead_nodes", methods=["GET"])
+def dead_nodes():
+    try:
+        session_id = session["session_id"]
+        with session_locks.read(session_id):
+            layout = layouts.get(session_id)
+            if not layout:
+                return jsonify({"success": False, "error": "Layout not found."})
 
-        warnings, errors, report = check_design_rules_function(layout)
+            # Walks the nodes of the layout rather than its tiles
+            tiles = layout_dead_nodes(layout)
 
         return (
             jsonify(
                 {
                     "success": True,
-                    "errors": errors,
-                    "warnings": warnings,
-                    "report": report,
+                    "dead_nodes": [{"x": x, "y": y, "z": z} for x, y, z in tiles],
                 }
             ),
             200,
@@ -1034,39 +706,6 @@ def check_design_rules():
         return jsonify({"success": False, "error": str(e)})
 
 
-def strip_ansi_codes(text):
-    ansi_escape = re.compile(r"\x1B\[[0-?]*[ -/]*[@-~]")
-    return ansi_escape.sub("", text)
-
-
-def format_output(text):
-    # Split the text based on the [i] marker
-    sections = text.split("[i]")
-
-    # Reconstruct the output with proper line breaks
-    formatted = ""
-    for section in sections:
-        stripped = section.strip()
-        if stripped:
-            formatted += f"[i] {stripped}\n"
-    return formatted
-
-
-def check_design_rules_function(layout):
-    # Create a StringIO object to capture the output
-    captured_output = io.StringIO()
-
-    # Redirect stdout to the StringIO object
-    with redirect_stdout(captured_output):
-        warnings, errors = gate_level_drvs(layout, print_report=True)
-
-    # Retrieve the captured output
-    raw_output = captured_output.getvalue()
-    clean_output = strip_ansi_codes(raw_output)
-    output = format_output(clean_output)
-    return warnings, errors, output
-
-
 @app.route("/check_equivalence", methods=["POST"])
 def check_equivalence():
     try:
@@ -1074,16 +713,19 @@ def check_equivalence():
         if not session_id:
             return jsonify({"success": False, "error": "Session not found."}), 400
 
-        layout = layouts.get(session_id)
-        if not layout:
-            return jsonify({"success": False, "error": "Layout not found."}), 404
+        with session_locks.read(session_id):
+            layout = layouts.get(session_id)
+            if not layout:
+                return jsonify({"success": False, "error": "Layout not found."}), 404
 
-        network = networks.get(session_id)
-        if not network:
-            return jsonify({"success": False, "error": "Network not found."}), 404
+            network = networks.get(session_id)
+            if not network:
+                return jsonify({"success": False, "error": "Network not found."}), 404
+
+            description = layout_to_dict(layout)
+            verilog = verilogs[session_id]
 
-        # Call your design rule checking function
-        equivalence, counter_example = check_equivalence_function(layout, network)
+        equivalence, counter_example = designer.check_equivalence(description, verilog)
 
         return (
             jsonify(
@@ -1100,25 +742,8 @@ def check_equivalence():
         return jsonify({"success": False, "error": str(e)}), 500
 
 
-def check_equivalence_function(layout, network):
-    stats = equivalence_checking_stats()
-    eq = equivalence_checking(layout, network, stats)
-
-    if eq == eq_type.STRONG:
-        equivalence = "STRONG"
-        counter_example = None  # No counter example needed
-    elif eq == eq_type.WEAK:
-        equivalence = "WEAK"
-        counter_example = None  # No counter example needed
-    else:
-        equivalence = "NO"
-        counter_example = stats.counter_example
-        print(counter_example)
-
-    return equivalence, counter_example
-
-
 @app.route("/export_layout", methods=["GET"])
+@with_session_lock("read")
 def export_layout():
     try:
         session_id = session.get("session_id")
@@ -1127,29 +752,18 @@ def export_layout():
         if not layout:
             return jsonify({"success": False, "error": "Layout not found."})
 
-        # Serialize the layout to fgl file
-        output_dir = os.path.join(os.getcwd(), "exported_layouts")
-        os.makedirs(output_dir, exist_ok=True)
-        file_path = os.path.join(output_dir, "layout.fgl")
-        write_fgl_layout(layout, file_path)
+        # Serialize the layout to fgl
+        data = layout_to_fgl(layout).encode("utf-8")
 
         # Send the fgl file as an attachment
-        return send_file(
-            file_path,
-            as_attachment=True,
-            mimetype="application/fgl",
-            download_name="layout.fgl",
-        )
+        return export_response(data, "application/fgl", "layout.fgl")
 
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
-    finally:
-        # Clean up the file if it exists
-        if os.path.exists(file_path):
-            os.remove(file_path)
 
 
 @app.route("/export_dot_layout", methods=["GET"])
+@with_session_lock("read")
 def export_dot_layout():
     try:
         session_id = session.get("session_id")
@@ -1158,98 +772,136 @@ def export_dot_layout():
         if not layout:
             return jsonify({"success": False, "error": "Layout not found."})
 
-        # Serialize the layout to dot file
-        output_dir = os.path.join(os.getcwd(), "exported_layouts")
-        os.makedirs(output_dir, exist_ok=True)
-        file_path = os.path.join(output_dir, "layout.dot")
-        write_dot_layout(layout, file_path)
+        # Serialize the layout to dot
+        data = write_to_memory(
+            lambda path: timed(write_dot_layout)(layout, path), ".dot"
+        )
 
         # Send the dot file as an attachment
-        return send_file(
-            file_path,
-            as_attachment=True,
-            mimetype="application/dot",
-            download_name="layout.dot",
-        )
+        return export_response(data, "application/dot", "layout.dot")
 
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
-    finally:
-        # Clean up the file if it exists
-        if os.path.exists(file_path):
-            os.remove(file_path)
 
 
 @app.route("/export_qca_layout", methods=["GET"])
 def export_qca_layout():
     try:
         session_id = session.get("session_id")
-        layout = layouts.get(session_id)
+        cache, revision, layout = layout_artifacts(session_id)
+
+        if not layout:
+            return jsonify({"success": False, "error": "Layout not found."})
+
+        simple = request.args.get("simple", "false").lower() == "true"
+
+        def render():
+            cell_level_layout = cache.get(
+                revision, "qca_cells", lambda: timed(apply_qca_one_library)(layout)
+            )
+            params = write_qca_layout_svg_params()
+            params.simple = simple
+            return write_to_memory(
+                lambda path: timed(write_qca_layout_svg)(
+                    cell_level_layout, path, params
+                ),
+                ".svg",
+            )
+
+        data = cache.get(revision, ("qca_svg", simple), render)
+        return export_response(data, "application/svg", "layout_qca.svg")
+
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)})
+
+
+@app.route("/export_sidb_layout", methods=["GET"])
+def export_sidb_layout():
+    try:
+        session_id = session.get("session_id")
+        cache, revision, layout = layout_artifacts(session_id)
 
         if not layout:
             return jsonify({"success": False, "error": "Layout not found."})
 
-        output_dir = os.path.join(os.getcwd(), "exported_layouts")
-        os.makedirs(output_dir, exist_ok=True)
-        file_path = os.path.join(output_dir, "layout_qca.svg")
-
-        cell_level_layout = apply_qca_one_library(layout)
-        params = write_qca_layout_svg_params()
-        write_qca_layout_svg(cell_level_layout, file_path, params)
+        color = request.args.get("color", "dark").upper()
+        if color not in ("DARK", "LIGHT"):
+            return jsonify({"success": False, "error": f"Unknown color: {color}."})
+
+        def render():
+            cell_level_layout = sidb_cell_level_layout(cache, revision, layout)
+            params = write_sidb_layout_svg_params()
+            params.color_background = getattr(color_mode, color)
+            return write_to_memory(
+                lambda path: timed(write_sidb_layout_svg)(
+                    cell_level_layout, path, params
+                ),
+                ".svg",
+            )
 
-        return send_file(
-            file_path,
-            as_attachment=True,
-            mimetype="application/svg",
-            download_name="layout_qca.svg",
-        )
+        data = cache.get(revision, ("sidb_svg", color), render)
+        return export_response(data, "application/svg", "layout_sidb.svg")
 
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
-    finally:
-        # Clean up the file if it exists
-        if os.path.exists(file_path):
-            os.remove(file_path)
 
 
-@app.route("/export_sidb_layout", methods=["GET"])
-def export_sidb_layout():
-    try:
-        session_id = session.get("session_id")
-        layout = layouts.get(session_id)
+def get_artifacts(session_id):
+    session_artifacts = artifacts.get(session_id)
+    if session_artifacts is None:
+        session_artifacts = artifacts[session_id] = ArtifactCache()
+    return session_artifacts
 
+
+def layout_artifacts(session_id):
+    # Artifacts derive from a copy of the layout at its current revision, so
+    # that building them neither blocks nor races with edits
+    with session_locks.read(session_id):
+        layout = layouts.get(session_id)
         if not layout:
-            return jsonify({"success": False, "error": "Layout not found."})
+            return None, None, None
+        revision = get_revision_log(session_id).revision
+        cache = get_artifacts(session_id)
+        snapshot = cache.get(revision, "layout", lambda: copy_layout(layout))
+    return cache, revision, snapshot
+
 
-        hex_layout = hexagonalization(layout)
-        cell_level_layout = apply_bestagon_library(hex_layout)
+def sidb_cell_level_layout(cache, revision, layout):
+    def hexagonalize():
+        fgl = worker_pool.run("hexagonalization", {"layout": layout_to_dict(layout)})
+        return layout_from_fgl(fgl, read_hexagonal_fgl_layout)
 
-        output_dir = os.path.join(os.getcwd(), "exported_layouts")
-        os.makedirs(output_dir, exist_ok=True)
-        file_path = os.path.join(output_dir, "layout_sidb.svg")
+    hex_layout = cache.get(revision, "hexagonal", hexagonalize)
+    return cache.get(
+        revision, "sidb_cells", lambda: timed(apply_bestagon_library)(hex_layout)
+    )
 
-        write_sqd_layout(cell_level_layout, file_path)
 
-        params = write_sidb_layout_svg_params()
-        params.color_background = color_mode.DARK
-        write_sidb_layout_svg(cell_level_layout, file_path, params)
+# Exports of at least this many bytes are sent gzip-compressed to clients that
+# accept it
+EXPORT_GZIP_THRESHOLD = 16 * 1024
 
-        return send_file(
-            file_path,
-            as_attachment=True,
-            mimetype="application/svg",
-            download_name="layout_sidb.svg",
-        )
 
-    except Exception as e:
-        return jsonify({"success": False, "error": str(e)})
-    finally:
-        # Clean up the file if it exists
-        if os.path.exists(file_path):
-            os.remove(file_path)
+def export_response(data, mimetype, download_name):
+    compress = len(data) >= EXPORT_GZIP_THRESHOLD and "gzip" in request.accept_encodings
+    if compress:
+        data = gzip.compress(data, compresslevel=6)
+
+    response = send_file(
+        io.BytesIO(data),
+        as_attachment=True,
+        mimetype=mimetype,
+        download_name=download_name,
+    )
+    response.content_length = len(data)
+    if compress:
+        response.headers["Content-Encoding"] = "gzip"
+        response.vary.add("Accept-Encoding")
+    return response
 
 
 @app.route("/import_layout", methods=["POST"])
+@with_session_lock("write")
 def import_layout():
     try:
         # Get the uploaded file with the key 'file'
@@ -1257,20 +909,12 @@ def import_layout():
         if not file:
             return jsonify({"success": False, "error": "No file provided."})
 
-        # Create a temporary file to save the uploaded fgl file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".fgl") as temp_file:
-            file.save(temp_file.name)  # Save the uploaded file to the temporary file
-
-        # Call the function with the temporary file's name (path)
-        try:
-            layout = read_cartesian_fgl_layout(temp_file.name)
-        finally:
-            # Clean up: delete the temporary file after processing
-            os.remove(temp_file.name)
+        layout = layout_from_fgl(file.read().decode("utf-8"))
 
         # Override the current layout with the imported layout
         session_id = session["session_id"]
         layouts[session_id] = cartesian_obstruction_layout(layout)
+        record_reset(session_id)
 
         return jsonify({"success": True})
 
@@ -1279,6 +923,7 @@ def import_layout():
 
 
 @app.route("/get_layout", methods=["GET"])
+@with_session_lock("read")
 def get_layout():
     try:
         session_id = session["session_id"]
@@ -1289,13 +934,72 @@ def get_layout():
         # Extract layout data
         layout_dimensions, gates = get_layout_information(layout)
         return jsonify(
-            {"success": True, "layoutDimensions": layout_dimensions, "gates": gates}
+            {
+                "success": True,
+                "layoutDimensions": layout_dimensions,
+                "gates": gates,
+                "revision": get_revision_log(session_id).revision,
+            }
+        )
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)})
+
+
+@app.route("/get_layout_delta", methods=["GET"])
+@with_session_lock("read")
+def get_layout_delta():
+    try:
+        session_id = session["session_id"]
+        layout = layouts.get(session_id)
+        if not layout:
+            return jsonify({"success": False, "error": "Layout not found."})
+
+        revision = request.args.get("revision", type=int)
+        if revision is None:
+            return jsonify({"success": False, "error": "Revision not specified."})
+
+        revision_log = get_revision_log(session_id)
+        layout_dimensions = {"x": layout.x() + 1, "y": layout.y() + 1}
+        tiles = revision_log.changes_since(revision)
+        if tiles is None:
+            # The history has been trimmed; fall back to a full snapshot
+            layout_dimensions, gates = get_layout_information(layout)
+            return jsonify(
+                {
+                    "success": True,
+                    "full": True,
+                    "layoutDimensions": layout_dimensions,
+                    "gates": gates,
+                    "revision": revision_log.revision,
+                }
+            )
+
+        gates = []
+        removed = []
+        for x, y in sorted(tiles):
+            if x > layout.x() or y > layout.y():
+                continue
+            if layout.is_empty_tile((x, y)):
+                removed.append({"x": x, "y": y})
+            else:
+                gates.append(get_gate_information(layout, x, y))
+
+        return jsonify(
+            {
+                "success": True,
+                "full": False,
+                "layoutDimensions": layout_dimensions,
+                "gates": gates,
+                "removed": removed,
+                "revision": revision_log.revision,
+            }
         )
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
 
 
 @app.route("/get_bounding_box", methods=["GET"])
+@with_session_lock("read")
 def get_bounding_box():
     try:
         session_id = session["session_id"]
@@ -1311,6 +1015,7 @@ def get_bounding_box():
 
 
 @app.route("/get_verilog_code", methods=["GET"])
+@with_session_lock("read")
 def get_verilog_code():
     try:
         # Ensure the user has a session_id
@@ -1334,28 +1039,21 @@ def get_verilog_code():
 
 
 @app.route("/save_verilog_code", methods=["POST"])
+@with_session_lock("write")
 def save_verilog_code():
     try:
         data = request.json
         code = data.get("code", "")
 
-        # Create a temporary file to save the uploaded Verilog code
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".v") as temp_file:
-            temp_file.write(code.encode("utf-8"))
-            temp_file.flush()  # Ensure all data is written to disk
-
-        # Call the function with the temporary file's name (path)
         try:
-            network = read_technology_network(temp_file.name)
+            network = designer.parse_verilog(code)
         except Exception as e:
             return jsonify({"success": False, "error": str(e)})
-        finally:
-            # Clean up: delete the temporary file after processing
-            os.remove(temp_file.name)
 
         session_id = session["session_id"]
         networks[session_id] = network
         verilogs[session_id] = code
+        record_edit(session_id, ())
 
         return jsonify({"success": True})
     except Exception as e:
@@ -1363,6 +1061,7 @@ def save_verilog_code():
 
 
 @app.route("/import_verilog_code", methods=["POST"])
+@with_session_lock("write")
 def import_verilog_code():
     try:
         # Get the uploaded file with the key 'file'
@@ -1373,22 +1072,13 @@ def import_verilog_code():
         # Read the file content
         code = uploaded_file.read().decode("utf-8")
 
-        # Create a temporary file to save the uploaded Verilog code
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".v") as temp_file:
-            temp_file.write(code.encode("utf-8"))
-            temp_file.flush()  # Ensure all data is written to disk
-
-        # Call the function with the temporary file's name (path)
-        try:
-            network = read_technology_network(temp_file.name)
-        finally:
-            # Clean up: delete the temporary file after processing
-            os.remove(temp_file.name)
+        network = designer.parse_verilog(code)
 
         # Store the network in the session
         session_id = session["session_id"]
         networks[session_id] = network
         verilogs[session_id] = code
+        record_edit(session_id, ())
 
         # Return the code to be displayed in the editor
         return jsonify({"success": True, "code": code})
@@ -1398,252 +1088,79 @@ def import_verilog_code():
 
 
 @app.route("/apply_orthogonal", methods=["POST"])
+@with_session_lock("write")
 def apply_orthogonal():
     try:
         session_id = session["session_id"]
-        network = networks.get(session_id)
-        if not network:
-            return jsonify(
-                {
-                    "success": False,
-                    "error": "Network not found. Please save or import Verilog code first.",
-                }
-            )
-
-        if network.size() < 3:
-            return jsonify(
-                {
-                    "success": False,
-                    "error": "Network size is less than 3, indicating that not gates are present.",
-                }
-            )
-
-        if network.size() > 500:
-            return jsonify(
-                {
-                    "success": False,
-                    "error": "Network size exceeds 500 nodes and the resulting layout can not be rendered.",
-                }
-            )
-
-        for po in network.pos():
-            for fanin in network.fanins(po):
-                if fanin in (0, 1):
-                    return jsonify(
-                        {
-                            "success": False,
-                            "error": f"Network has an unconnected PO: {network.get_output_name(network.po_index(po))}.",
-                        }
-                    )
-
-        try:
-            # Apply the orthogonal function
-            layout = orthogonal(network)
-        except Exception as e:
-            return jsonify({"success": False, "error": str(e)})
+        check_network(networks.get(session_id), "orthogonal")
 
+        layout = designer.orthogonal(verilogs[session_id])
         layouts[session_id] = cartesian_obstruction_layout(
             layout
         )  # Update the layout in the session
+        revision = record_reset(session_id)
 
         layout_dimensions, gates = get_layout_information(layout)
 
         return jsonify(
-            {"success": True, "layoutDimensions": layout_dimensions, "gates": gates}
+            {
+                "success": True,
+                "layoutDimensions": layout_dimensions,
+                "gates": gates,
+                "revision": revision,
+            }
         )
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
 
 
 @app.route("/apply_iosdn", methods=["POST"])
+@with_session_lock("write")
 def apply_iosdn():
     try:
         session_id = session["session_id"]
-        network = networks.get(session_id)
-        if not network:
-            return jsonify(
-                {
-                    "success": False,
-                    "error": "Network not found. Please save or import Verilog code first.",
-                }
-            )
-
-        if network.size() < 3:
-            return jsonify(
-                {
-                    "success": False,
-                    "error": "Network size is less than 3, indicating that not gates are present.",
-                }
-            )
-
-        if network.size() > 500:
-            return jsonify(
-                {
-                    "success": False,
-                    "error": "Network size exceeds 500 nodes and the resulting layout can not be rendered.",
-                }
-            )
-
-        for po in network.pos():
-            for fanin in network.fanins(po):
-                if fanin in (0, 1):
-                    return jsonify(
-                        {
-                            "success": False,
-                            "error": f"Network has an unconnected PO: {network.get_output_name(network.po_index(po))}.",
-                        }
-                    )
-
-        try:
-            # Apply the iosdn function
-            # layout =
-            return jsonify(
-                {
-                    "success": False,
-                    "error": "Input-ordering SDN not available in pyfiction yet.",
-                }
-            )
-        except Exception as e:
-            return jsonify({"success": False, "error": str(e)})
-
-        layouts[session_id] = cartesian_obstruction_layout(
-            layout
-        )  # Update the layout in the session
-
-        layout_dimensions, gates = get_layout_information(layout)
+        check_network(networks.get(session_id), "iosdn")
 
         return jsonify(
-            {"success": True, "layoutDimensions": layout_dimensions, "gates": gates}
+            {
+                "success": False,
+                "error": "Input-ordering SDN not available in pyfiction yet.",
+            }
         )
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
 
 
 @app.route("/apply_gold", methods=["POST"])
+@with_session_lock("read")
 def apply_gold():
     try:
         session_id = session["session_id"]
-        network = networks.get(session_id)
-        if not network:
-            return jsonify(
-                {
-                    "success": False,
-                    "error": "Network not found. Please save or import Verilog code first.",
-                }
-            )
-
-        if network.size() < 3:
-            return jsonify(
-                {
-                    "success": False,
-                    "error": "Network is empty.",
-                }
-            )
+        check_network(networks.get(session_id), "gold")
 
-        if network.size() > 150:
-            return jsonify(
-                {"success": False, "error": "Network size exceeds 200 nodes."}
-            )
-
-        for po in network.pos():
-            for fanin in network.fanins(po):
-                if fanin in (0, 1):
-                    return jsonify(
-                        {
-                            "success": False,
-                            "error": f"Network has an unconnected PO: {network.get_output_name(network.po_index(po))}.",
-                        }
-                    )
+        params = gold_parameters(request.json)
+        verilog = verilogs[session_id]
 
-        # Parameters
-        data = request.json
-        params = graph_oriented_layout_design_params()
-        params.return_first = bool(data.get("return_first"))
-
-        mode = data.get("mode")
-        if mode == "HIGH_EFFICIENCY":
-            params.mode = gold_effort_mode.HIGH_EFFICIENCY
-        elif mode == "HIGH_EFFORT":
-            params.mode = gold_effort_mode.HIGH_EFFORT
-        elif mode == "HIGHEST_EFFORT":
-            params.mode = gold_effort_mode.HIGHEST_EFFORT
-        else:
-            return jsonify({"success": False, "error": f"Unknown mode: {mode}."})
-
-        params.timeout = int(data.get("timeout"))
-        params.num_vertex_expansions = int(data.get("num_vertex_expansions"))
-        params.planar = bool(data.get("planar"))
-
-        cost = data.get("cost")
-        if cost == "AREA":
-            params.cost = gold_cost_objective.AREA
-        elif cost == "WIRES":
-            params.cost = gold_cost_objective.WIRES
-        elif cost == "CROSSINGS":
-            params.cost = gold_cost_objective.CROSSINGS
-        elif cost == "ACP":
-            params.cost = gold_cost_objective.ACP
-        else:
-            return jsonify(
-                {"success": False, "error": f"Unknown cost objective: {cost}."}
+        def run(job):
+            return designer.gold(
+                verilog,
+                params,
+                job.cancel_event,
+                functools.partial(job_manager.enter_stage, job),
             )
 
-        layout = graph_oriented_layout_design(network, params)
-        if layout:
-            layouts[session_id] = cartesian_obstruction_layout(
-                layout
-            )  # Update the layout in the session
-            layout_dimensions, gates = get_layout_information(layout)
-
-            return jsonify(
-                {"success": True, "layoutDimensions": layout_dimensions, "gates": gates}
-            )
-        else:
-            return jsonify(
-                {
-                    "success": False,
-                    "error": "No layout found with the specified parameters.",
-                }
-            )
+        job = job_manager.submit(session_id, "gold", run, install_layout_result)
+        return jsonify({"success": True, "job_id": job.id, "status": job.status})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
 
 
 @app.route("/apply_exact", methods=["POST"])
+@with_session_lock("read")
 def apply_exact():
     try:
         session_id = session["session_id"]
-        network = networks.get(session_id)
-        if not network:
-            return jsonify(
-                {
-                    "success": False,
-                    "error": "Network not found. Please save or import Verilog code first.",
-                }
-            )
-
-        if network.size() < 3:
-            return jsonify(
-                {
-                    "success": False,
-                    "error": "Network is empty.",
-                }
-            )
-
-        if network.size() > 30:
-            return jsonify(
-                {"success": False, "error": "Network size exceeds 30 nodes."}
-            )
-
-        for po in network.pos():
-            for fanin in network.fanins(po):
-                if fanin in (0, 1):
-                    return jsonify(
-                        {
-                            "success": False,
-                            "error": f"Network has an unconnected PO: {network.get_output_name(network.po_index(po))}.",
-                        }
-                    )
+        check_network(networks.get(session_id), "exact")
 
         if not exact_params:
             return jsonify(
@@ -1652,178 +1169,384 @@ def apply_exact():
                     "error": "Pyfiction was installed without Z3 enabled.",
                 }
             )
-        # Parameters
-        data = request.json
-        params = exact_params()
-        params.scheme = "2DDWave"
-        params.upper_bound_x = int(data.get("upper_bound_x", sys.maxsize))
-        params.upper_bound_y = int(data.get("upper_bound_y", sys.maxsize))
-        params.fixed_size = bool(data.get("fixed_size", False))
-        params.num_threads = int(data.get("num_threads", 1))
-        params.crossings = bool(data.get("crossings", True))
-        params.border_io = bool(data.get("border_io", True))
-        params.straight_inverters = bool(data.get("straight_inverters", False))
-        params.desynchronize = bool(data.get("desynchronize", True))
-        params.minimize_wires = bool(data.get("minimize_wires", False))
-        params.minimize_crossings = bool(data.get("minimize_crossings", False))
-        params.timeout = int(data.get("timeout", 4294967))
-        # Now run the exact algorithm
-        layout = exact_cartesian(network, params)
-        if layout:
-            layouts[session_id] = cartesian_obstruction_layout(layout)
-            layout_dimensions, gates = get_layout_information(layout)
 
-            return jsonify(
-                {"success": True, "layoutDimensions": layout_dimensions, "gates": gates}
-            )
-        else:
-            return jsonify(
-                {
-                    "success": False,
-                    "error": "No layout found with the specified parameters.",
-                }
+        params = exact_parameters(request.json)
+        verilog = verilogs[session_id]
+
+        def run(job):
+            return designer.exact(
+                verilog,
+                params,
+                job.cancel_event,
+                functools.partial(job_manager.enter_stage, job),
             )
+
+        job = job_manager.submit(session_id, "exact", run, install_layout_result)
+        return jsonify({"success": True, "job_id": job.id, "status": job.status})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
 
 
 @app.route("/apply_optimization", methods=["POST"])
+@with_session_lock("read")
 def apply_optimization():
     try:
         session_id = session["session_id"]
         layout = layouts.get(session_id)
-        params = post_layout_optimization_params()
+        check_optimizable(layout, functools.partial(session_design_rules, session_id))
 
-        if not layout:
+        params = optimization_parameters(request.json)
+
+        # The worker optimizes a serialized copy so that the session layout
+        # stays untouched until the job has completed
+        description = layout_to_dict(layout)
+
+        def run(job):
+            return designer.optimize(description, params, job.cancel_event)
+
+        job = job_manager.submit(session_id, "optimization", run, install_layout_result)
+        return jsonify({"success": True, "job_id": job.id, "status": job.status})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)})
+
+
+@app.route("/apply_portfolio", methods=["POST"])
+@with_session_lock("read")
+def apply_portfolio():
+    try:
+        session_id = session["session_id"]
+        network = networks.get(session_id)
+        check_network(network, "portfolio")
+
+        # Parameters
+        data = request.json or {}
+        budget = float(data.get("budget", PORTFOLIO_BUDGET))
+        if budget <= 0:
+            return jsonify({"success": False, "error": "Budget must be positive."})
+
+        objective = data.get("objective", "area")
+        if objective not in OBJECTIVES:
             return jsonify(
-                {
-                    "success": False,
-                    "error": "Layout not found. Please create a layout first",
-                }
+                {"success": False, "error": f"Unknown objective: {objective}."}
             )
 
-        warnings, errors, report = check_design_rules_function(layout)
-        if errors != 0:
-            return jsonify(
-                {
-                    "success": False,
-                    "error": f"Layout has {errors} errors. Fix them first before optimizing.",
-                }
+        engines = portfolio_engines(network, budget)
+        if data.get("engines") is not None:
+            unknown = set(data["engines"]) - {engine["name"] for engine in engines}
+            if unknown:
+                return jsonify(
+                    {
+                        "success": False,
+                        "error": f"Engines not applicable: {', '.join(sorted(unknown))}.",
+                    }
+                )
+            engines = [
+                engine for engine in engines if engine["name"] in data["engines"]
+            ]
+        if not engines:
+            return jsonify({"success": False, "error": "No engines selected."})
+
+        verilog = verilogs[session_id]
+        key = preference(objective)
+
+        def run(job):
+            deadline = time.monotonic() + budget
+            candidates = []
+            best = {}
+
+            def run_engine(engine, stop):
+                payload = {"verilog": verilog}
+                if engine["params"] is not None:
+                    payload["params"] = engine["params"]
+                # Engines without a timeout parameter are killed at the deadline
+                return designer.run(
+                    engine["task"],
+                    payload,
+                    timeout=max(deadline - time.monotonic(), 0) + 1,
+                    cancel_event=stop,
+                )
+
+            def on_result(engine, fgl, error, elapsed):
+                candidate = {"engine": engine["name"], "elapsed": round(elapsed, 3)}
+                candidates.append(candidate)
+                if not fgl:
+                    candidate["error"] = error or "No layout found."
+                else:
+                    layout = layout_from_fgl(fgl)
+                    candidate["metrics"] = layout_metrics(layout)
+                    # The best layout so far is reported while slower engines
+                    # still run, but only installed once the job completes
+                    if not best or key(candidate) < key(best["candidate"]):
+                        layout_dimensions, gates = get_layout_information(layout)
+                        best["candidate"] = candidate
+                        best["layout"] = layout
+                        best["information"] = {
+                            "layoutDimensions": layout_dimensions,
+                            "gates": gates,
+                        }
+                job_manager.report(
+                    job,
+                    {
+                        **portfolio_summary(candidates, best),
+                        **best.get("information", {}),
+                    },
+                )
+
+            run_portfolio(engines, run_engine, on_result, job.cancel_event)
+            if not best:
+                msg = "No engine found a layout within the budget."
+                raise JobError(msg)
+            return candidates, best
+
+        def commit(job, value):
+            candidates, best = value
+            return {
+                **install_layout_result(job, best["layout"]),
+                **portfolio_summary(candidates, best),
+            }
+
+        job = job_manager.submit(session_id, "portfolio", run, commit)
+        return jsonify({"success": True, "job_id": job.id, "status": job.status})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)})
+
+
+def portfolio_engines(network, budget):
+    timeout = int(budget * 1000)
+    engines = [{"name": "orthogonal", "task": "orthogonal", "params": None}]
+    if network.size() <= NETWORK_LIMITS["gold"][0]:
+        for cost in ("AREA", "WIRES", "CROSSINGS", "ACP"):
+            params = gold_parameters({"cost": cost, "timeout": timeout})
+            engines.append({"name": f"gold:{cost}", "task": "gold", "params": params})
+    if exact_params and network.size() <= NETWORK_LIMITS["exact"][0]:
+        params = exact_parameters(
+            # Bounds are stored as 16-bit integers
+            {"upper_bound_x": 2**16 - 1, "upper_bound_y": 2**16 - 1, "timeout": timeout}
+        )
+        engines.append({"name": "exact", "task": "exact", "params": params})
+    return engines
+
+
+def portfolio_summary(candidates, best):
+    found = [candidate for candidate in candidates if "metrics" in candidate]
+    return {
+        "candidates": list(candidates),
+        "front": pareto_front(found),
+        "selected": best["candidate"]["engine"] if best else None,
+    }
+
+
+@app.route("/sweep_gold", methods=["POST"])
+@with_session_lock("read")
+def sweep_gold_parameters():
+    try:
+        session_id = session["session_id"]
+        check_network(networks.get(session_id), "gold")
+
+        # Parameters, given as a grid of values per parameter and/or as a list
+        # of individual configurations
+        data = request.json or {}
+        try:
+            configurations = gold_configurations(
+                data.get("grid"), data.get("configurations"), SWEEP_MAX_RUNS
             )
-        if warnings != 0:
-            for x in range(layout.x() + 1):
-                for y in range(layout.y() + 1):
-                    if layout.is_dead(
-                        layout.get_node((x, y))
-                    ) and not layout.is_empty_tile((x, y)):
-                        return jsonify(
-                            {
-                                "success": False,
-                                "error": f"Layout has a dead node: ({x}, {y}). Fix it first before optimizing.",
-                            }
-                        )
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)})
 
-        data = request.json
-        max_gate_relocations = data.get("max_gate_relocations")
-        if max_gate_relocations:
-            params.max_gate_relocations = int(max_gate_relocations)
+        verilog = verilogs[session_id]
 
-        params.optimize_pos_only = bool(data.get("optimize_pos_only"))
-        params.planar_optimization = bool(data.get("planar_optimization"))
+        def run(job):
+            completed = []
 
-        params.timeout = int(data.get("timeout"))
+            def on_row(index, _row):
+                completed.append(index)
+                job_manager.report(
+                    job, {"completed": len(completed), "total": len(configurations)}
+                )
 
-        post_layout_optimization(layout, params)
-        layouts[session_id] = layout  # Update the layout in the session
+            return sweep_gold(
+                verilog,
+                configurations,
+                worker_pool,
+                cache=sweep_cache,
+                on_row=on_row,
+                cancel_event=job.cancel_event,
+                on_layout=result_cache.put,
+            )
 
-        layout_dimensions, gates = get_layout_information(layout)
+        def commit(_job, rows):
+            return {"rows": rows}
 
+        job = job_manager.submit(session_id, "gold_sweep", run, commit)
         return jsonify(
-            {"success": True, "layoutDimensions": layout_dimensions, "gates": gates}
+            {
+                "success": True,
+                "job_id": job.id,
+                "status": job.status,
+                "runs": len(configurations),
+            }
         )
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
 
 
-def get_layout_information(layout):
-    layout_dimensions = {"x": layout.x() + 1, "y": layout.y() + 1}
-    gates = []
-
-    for x in range(layout.x() + 1):
-        for y in range(layout.y() + 1):
-            node = layout.get_node((x, y))
-            name = ""
-            if node:
-                if layout.is_pi(node):
-                    gate_type = "pi"
-                    try:
-                        name = layout.get_name(layout.make_signal(node))
-                    except:
-                        name = ""
-                elif layout.is_po(node):
-                    gate_type = "po"
-                    try:
-                        name = layout.get_name(layout.make_signal(node))
-                    except:
-                        name = ""
-                elif layout.is_wire(node):
-                    gate_type = "buf"
-                    above_gate = layout.above(layout.get_tile(node))
-                    if not layout.is_empty_tile(above_gate) and layout.z() == 1:
-                        if (
-                            layout.fanins(above_gate)[0].x
-                            == layout.west(layout.get_tile(node)).x
-                            and layout.fanouts(above_gate)[0].x
-                            == layout.east(layout.get_tile(node)).x
-                        ) or (
-                            layout.fanins(above_gate)[0].x
-                            == layout.north(layout.get_tile(node)).x
-                            and layout.fanouts(above_gate)[0].x
-                            == layout.south(layout.get_tile(node)).x
-                        ):
-                            gate_type = "bufc"
-                        else:
-                            gate_type = "bufk"
-                    if layout.fanout_size(node) == 2:
-                        gate_type = "fanout"
-                elif layout.is_inv(node):
-                    gate_type = "inv"
-                elif layout.is_and(node):
-                    gate_type = "and"
-                elif layout.is_nand(node):
-                    gate_type = "nand"
-                elif layout.is_or(node):
-                    gate_type = "or"
-                elif layout.is_nor(node):
-                    gate_type = "nor"
-                elif layout.is_xor(node):
-                    gate_type = "xor"
-                elif layout.is_xnor(node):
-                    gate_type = "xnor"
-                else:
-                    raise Exception("Unsupported gate type")
-
-                gate_info = {
-                    "x": x,
-                    "y": y,
-                    "type": gate_type,
-                    "connections": [],
-                    "name": name,
-                }
-                # Get fanins (source nodes)
-                fanins = layout.fanins((x, y))
-                for fin in fanins:
-                    gate_info["connections"].append(
-                        {"sourceX": fin.x, "sourceY": fin.y}
-                    )
-                if gate_type in ("bufc", "bufk"):
-                    fanins = layout.fanins((x, y, 1))
-                    for fin in fanins:
-                        gate_info["connections"].append(
-                            {"sourceX": fin.x, "sourceY": fin.y}
-                        )
-                gates.append(gate_info)
-    return layout_dimensions, gates
+def install_layout(session_id, layout):
+    with session_locks.write(session_id):
+        layouts[session_id] = cartesian_obstruction_layout(layout)
+        return record_reset(session_id)
+
+
+def install_layout_result(job, layout):
+    # Update the layout in the session once the job has completed
+    revision = install_layout(job.session_id, layout)
+    layout_dimensions, gates = get_layout_information(layout)
+    return {"layoutDimensions": layout_dimensions, "gates": gates, "revision": revision}
+
+
+@app.route("/job_status/<job_id>", methods=["GET"])
+def job_status(job_id):
+    try:
+        job = job_manager.get(job_id, session.get("session_id"))
+        if not job:
+            return jsonify({"success": False, "error": "Job not found."}), 404
+
+        return jsonify({"success": True, **job.to_dict()})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)})
+
+
+@app.route("/job_result/<job_id>", methods=["GET"])
+def job_result(job_id):
+    try:
+        job = job_manager.get(job_id, session.get("session_id"))
+        if not job:
+            return jsonify({"success": False, "error": "Job not found."}), 404
+
+        return jsonify(job_result_data(job))
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)})
+
+
+def job_result_data(job):
+    if job.status in (QUEUED, RUNNING):
+        return {
+            "success": False,
+            "status": job.status,
+            "error": "Job has not finished yet.",
+        }
+    if job.status != DONE:
+        return {
+            "success": False,
+            "status": job.status,
+            "error": job.error or f"Job was {job.status}.",
+        }
+    return {"success": True, "status": job.status, **job.result}
+
+
+# Interval (in seconds) at which job events report the elapsed time while the
+# job does not change otherwise
+JOB_EVENT_INTERVAL = 1.0
+
+
+@app.route("/job_events/<job_id>", methods=["GET"])
+def job_events(job_id):
+    # Server-sent events with the status, stage, elapsed time and progress of
+    # a job, ending with a "done" event that carries the job result
+    session_id = session.get("session_id")
+    if not job_manager.get(job_id, session_id):
+        return jsonify({"success": False, "error": "Job not found."}), 404
+
+    def event(name, data):
+        return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+    def stream():
+        while True:
+            seen = job_manager.changes
+            job = job_manager.get(job_id, session_id)
+            if job is None:
+                yield event("done", {"success": False, "error": "Job not found."})
+                return
+            if job.status not in (QUEUED, RUNNING):
+                yield event("done", job_result_data(job))
+                return
+            yield event("progress", {"success": True, **job.to_dict()})
+            job_manager.wait_for_change(seen, JOB_EVENT_INTERVAL)
+
+    return Response(
+        stream(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/cancel_job/<job_id>", methods=["POST"])
+def cancel_job(job_id):
+    try:
+        if not job_manager.cancel(job_id, session.get("session_id")):
+            return jsonify(
+                {"success": False, "error": "Job not found or already finished."}
+            )
+
+        return jsonify({"success": True})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)})
+
+
+def get_revision_log(session_id):
+    revision_log = revisions.get(session_id)
+    if revision_log is None:
+        revision_log = revisions[session_id] = RevisionLog()
+    return revision_log
+
+
+def record_edit(session_id, tiles):
+    # Tiles are (x, y) pairs whose gate, type or connections may have changed;
+    # no tiles at all mark a change outside the layout, e.g., of the Verilog
+    revision = get_revision_log(session_id).record(tiles)
+    session_changed(session_id)
+    return revision
+
+
+def record_reset(session_id):
+    # The layout was replaced or resized as a whole
+    revision = get_revision_log(session_id).reset()
+    session_changed(session_id)
+    return revision
+
+
+def get_drc_checker(session_id):
+    checker = drc_checkers.get(session_id)
+    if checker is None:
+        checker = drc_checkers[session_id] = DesignRuleChecker()
+    return checker
+
+
+def session_design_rules(session_id, layout):
+    # Only the tiles edited since the last check are checked again, and
+    # gate_level_drvs only runs every so often, so the caller holds the session
+    # lock throughout. A copy of the layout would lose its dead nodes and the
+    # connections pyfiction does not list, so the live layout is checked
+    return get_drc_checker(session_id).check(layout, get_revision_log(session_id))
+
+
+def session_changed(session_id):
+    session_artifacts = artifacts.get(session_id)
+    if session_artifacts is not None:
+        session_artifacts.invalidate()
+    sessions.refresh(session_id)
+    if snapshot_writer is not None:
+        snapshot_writer.schedule(session_id)
+    elif shared_state:
+        # Other processes must see the change before the response is sent
+        values = sessions.peek(session_id)
+        snapshot = snapshot_session(values)
+        if not snapshot_backend.save(
+            session_id, snapshot, values.get("stored_revision"), check=True
+        ):
+            sessions.drop(session_id)
+            msg = "The session was modified by another request. Please reload."
+            raise ConcurrentModificationError(msg)
+        sessions.set(session_id, "stored_revision", snapshot["revision"])
 
 
 def start_server():
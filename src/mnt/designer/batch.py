@@ -0,0 +1,233 @@
+"""Headless batch processing of Verilog files.
+
+Every circuit is run through the same flow as in the designer: parsing,
+physical design, optional post-layout optimization, design rule checking,
+equivalence checking and export. Circuits are processed in parallel worker
+processes and the outcome of each one is appended to a JSONL log, which also
+lets an interrupted batch resume where it stopped.
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from mnt.designer.caches import content_hash
+from mnt.designer.sweep import GOLD_CHOICES, gold_configuration
+from mnt.designer.workers import PIPELINE_EXPORTS, WorkerError, WorkerPool
+
+
+def find_verilog_files(inputs):
+    # Directories are searched recursively, anything else may be a glob pattern
+    files = []
+    for entry in inputs:
+        pattern = str(Path(entry, "**", "*.v")) if Path(entry).is_dir() else entry
+        # Patterns may be absolute, which Path.glob does not support
+        matches = sorted(glob.glob(pattern, recursive=True))  # noqa: PTH207
+        if not matches and not glob.has_magic(pattern):
+            msg = f"No such file or directory: {pattern}"
+            raise FileNotFoundError(msg)
+        files.extend(path for path in matches if Path(path).is_file())
+    return list(dict.fromkeys(str(Path(path).resolve()) for path in files))
+
+
+def read_log(path):
+    # Records by key; a line cut off by an interruption is ignored
+    records = {}
+    path = Path(path)
+    if path.exists():
+        with path.open(encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                records[record.get("key")] = record
+    return records
+
+
+def output_name(path, root):
+    # Unique file name stem for the exports of a circuit
+    relative = Path(os.path.relpath(path, root) if root else Path(path).name)
+    return str(relative.with_suffix("")).replace(os.sep, "__")
+
+
+def pipeline_options(args):
+    options = {
+        "algorithm": args.algorithm,
+        "optimize": args.optimize,
+        "equivalence": not args.no_equivalence,
+        "exports": sorted(set(args.export)),
+    }
+    if args.algorithm == "gold":
+        options["params"] = gold_configuration(
+            {
+                "mode": args.gold_mode,
+                "cost": args.gold_cost,
+                "timeout": int(args.timeout * 1000),
+            }
+        )
+    elif args.algorithm == "exact":
+        options["params"] = {"timeout": int(args.timeout * 1000)}
+    return options
+
+
+def run_batch(
+    files, options, output, pool, log_path, *, retry_failed=False, timeout=None
+):
+    """Processes all files not yet contained in the log and yields their records.
+
+    The pipeline ``options`` are passed to the ``pipeline`` worker task.
+    Records are appended to ``log_path`` as soon as a circuit is done; a
+    circuit is skipped if the log already holds a record for the same code
+    and options, unless that record failed and ``retry_failed`` is set.
+    """
+    output = Path(output)
+    output.mkdir(parents=True, exist_ok=True)
+    config_hash = content_hash(json.dumps(options, sort_keys=True))
+    done = read_log(log_path)
+    root = os.path.commonpath(files) if len(files) > 1 else None
+
+    todo = []
+    for path in files:
+        verilog = Path(path).read_text(encoding="utf-8")
+        key = content_hash(f"{path}:{content_hash(verilog)}:{config_hash}")
+        record = done.get(key)
+        if record is not None and (record["status"] == "ok" or not retry_failed):
+            continue
+        todo.append((path, key, verilog))
+
+    stop = threading.Event()
+
+    def process(path, key, verilog):
+        payload = {
+            **options,
+            "verilog": verilog,
+            "name": output_name(path, root),
+            "output": str(output.resolve()),
+        }
+        start = time.perf_counter()
+        try:
+            result = pool.run("pipeline", payload, timeout=timeout, cancel_event=stop)
+        except WorkerError as e:
+            result = {"stages": {}, "error": str(e)}
+        return {
+            "key": key,
+            "file": path,
+            "status": "failed" if "error" in result else "ok",
+            "elapsed": round(time.perf_counter() - start, 4),
+            **result,
+        }
+
+    executor = ThreadPoolExecutor(
+        max_workers=max(pool.processes, 1), thread_name_prefix="mnt-batch"
+    )
+    try:
+        with Path(log_path).open("a", encoding="utf-8") as log:
+            futures = [executor.submit(process, *item) for item in todo]
+            for future in as_completed(futures):
+                record = future.result()
+                log.write(json.dumps(record) + "\n")
+                log.flush()
+                yield record
+    finally:
+        # Runs that are aborted are not logged and thus repeated on resumption
+        stop.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="mnt.designer-batch", description=__doc__.splitlines()[0]
+    )
+    parser.add_argument(
+        "inputs", nargs="+", help="Verilog files, directories or glob patterns"
+    )
+    parser.add_argument(
+        "-o", "--output", default="batch_output", help="directory for all results"
+    )
+    parser.add_argument(
+        "-a",
+        "--algorithm",
+        choices=("orthogonal", "gold", "exact"),
+        default="orthogonal",
+    )
+    parser.add_argument(
+        "--gold-mode", choices=GOLD_CHOICES["mode"], default="HIGH_EFFICIENCY"
+    )
+    parser.add_argument("--gold-cost", choices=GOLD_CHOICES["cost"], default="AREA")
+    parser.add_argument(
+        "--optimize", action="store_true", help="apply post-layout optimization"
+    )
+    parser.add_argument(
+        "--no-equivalence", action="store_true", help="skip equivalence checking"
+    )
+    parser.add_argument(
+        "--export",
+        nargs="*",
+        choices=tuple(PIPELINE_EXPORTS),
+        default=["fgl"],
+        help="file formats to export (default: fgl)",
+    )
+    parser.add_argument(
+        "-j", "--workers", type=int, default=None, help="number of worker processes"
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=60,
+        help="time limit of the layout algorithm in seconds (default: 60)",
+    )
+    parser.add_argument(
+        "--log", help="JSONL results log (default: results.jsonl in the output)"
+    )
+    parser.add_argument(
+        "--retry-failed",
+        action="store_true",
+        help="run circuits again whose previous run failed",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        files = find_verilog_files(args.inputs)
+    except FileNotFoundError as e:
+        parser.error(str(e))
+    log_path = args.log or Path(args.output, "results.jsonl")
+    options = pipeline_options(args)
+
+    pool = WorkerPool(processes=max(args.workers or os.cpu_count() or 1, 1))
+    failed = 0
+    try:
+        # Every run gets a hard limit well beyond the algorithm's own timeout
+        records = run_batch(
+            files,
+            options,
+            args.output,
+            pool,
+            log_path,
+            retry_failed=args.retry_failed,
+            timeout=args.timeout * 2 + 60,
+        )
+        for record in records:
+            failed += record["status"] != "ok"
+            message = record.get("error", "")
+            print(
+                f"{record['status']:6} {record['elapsed']:8.2f} s  {record['file']}"
+                + (f"  ({message})" if message else ""),
+                file=sys.stderr,
+            )
+    except KeyboardInterrupt:
+        print("Interrupted; run again to resume.", file=sys.stderr)
+        return 130
+    finally:
+        pool.shutdown()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def verilog_hash(code):
+    # Comments and formatting do not change the network
+    code = re.sub(r"//[^\n]*|/\*.*?\*/", " ", code, flags=re.DOTALL)
+    return content_hash(" ".join(code.split()))
+
+
+class LRUCache:
+    """Thread-safe mapping that keeps the ``max_entries`` most recently used."""
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+class ResultCache:
+    """Content-addressed cache of physical design results.
+
+    Results are FGL strings, looked up by a hash of the input network (or
+    layout), the algorithm and its full parameter set. The most recently used
+    ones are kept in memory; with a ``directory``, all results are also
+    stored on disk and survive restarts.
+    """
+
+    def __init__(self, max_entries=128, directory=None):
+        self.memory = LRUCache(max_entries)
+        self.directory = Path(directory) if directory is not None else None
+        self.disk_hits = 0
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key(algorithm, input_hash, params):
+        description = json.dumps([algorithm, input_hash, params], sort_keys=True)
+        return content_hash(description)
+
+    def get(self, key):
+        fgl = self.memory.get(key)
+        if fgl is None and self.directory is not None:
+            path = self.directory / f"{key}.fgl"
+            if path.exists():
+                fgl = path.read_text(encoding="utf-8")
+                self.disk_hits += 1
+                self.memory.put(key, fgl)
+        return fgl
+
+    def put(self, key, fgl):
+        self.memory.put(key, fgl)
+        if self.directory is not None:
+            path = self.directory / f"{key}.fgl"
+            temp_path = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+            temp_path.write_text(fgl, encoding="utf-8")
+            temp_path.replace(path)
+
+    def stats(self):
+        return {**self.memory.stats(), "disk_hits": self.disk_hits}
+
+
+class ArtifactCache:
+    """Products derived from a single revision of a session's layout.
+
+    Intermediate results such as the hexagonalized or cell-level layouts are
+    kept next to the exported files, so that they can be shared between
+    exports. Everything is dropped as soon as a different revision is
+    requested or the layout gets edited.
+    """
+
+    def __init__(self):
+        self.revision = None
+        self.items = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, revision, key, create):
+        with self.lock:
+            if revision != self.revision:
+                self.items.clear()
+                self.revision = revision
+            if key in self.items:
+                self.hits += 1
+                return self.items[key]
+            self.misses += 1
+        value = create()
+        with self.lock:
+            # Do not keep anything that became stale while it was created
+            if revision == self.revision:
+                self.items[key] = value
+        return value
+
+    def invalidate(self):
+        with self.lock:
+            self.items.clear()
+            self.revision = None
+
+    @property
+    def nbytes(self):
+        with self.lock:
+            return sum(
+                len(value) for value in self.items.values() if isinstance(value, bytes)
+            )
@@ -0,0 +1,490 @@
+"""Design rule checks of gate-level layouts as structured violation records.
+
+The checks follow the rules of pyfiction's ``gate_level_drvs``, but report
+every violation with its rule, severity and tile instead of printing a
+report, so they neither touch ``sys.stdout`` nor need to be parsed. The text
+report is rendered from the records on demand.
+
+Most rules only relate a tile to the tiles it is connected to, so the
+checker below keeps the violations of every tile and, after an edit,
+re-evaluates only the edited tiles and their neighbours in the data flow, as
+recorded in the session's ``RevisionLog``. Rules the bindings cannot check
+tile by tile are counted by gate_level_drvs on the live layout every so
+often instead, when the indexed rules are verified against it as well.
+"""
+
+import bisect
+import logging
+import threading
+
+from mnt.pyfiction import gate_level_drv_params, gate_level_drvs
+
+from mnt.designer.metrics import pyfiction_call
+from mnt.designer.revisions import RevisionLog
+
+logger = logging.getLogger(__name__)
+
+ERROR = "error"
+WARNING = "warning"
+
+# Rules of the report in the order and wording of gate_level_drvs
+SECTIONS = (
+    (
+        "Topology",
+        (
+            ("unplaced_nodes", "all nodes are properly placed"),
+            ("placed_dead_nodes", "all placed nodes are alive"),
+            ("non_adjacent_connections", "all tiles are adjacently connected"),
+            ("missing_connections", "all occupied tiles are properly connected"),
+            ("crossing_gates", "all wire crossings cross over other wires only"),
+        ),
+    ),
+    ("Clocking", (("clocked_data_flow", "all connected tiles are properly clocked"),)),
+    (
+        "I/O ports",
+        (
+            ("has_io", "all I/O are properly specified"),
+            ("empty_io", "all I/O ports are assigned to a non-empty tile"),
+            ("io_pins", "all I/O ports are realized by designated pins"),
+            ("border_io", "all I/O ports are located at the layout's borders"),
+        ),
+    ),
+)
+
+
+class Violation:
+    """A design rule violation at a tile, or of the layout as a whole."""
+
+    __slots__ = ("message", "rule", "severity", "tile")
+
+    def __init__(self, rule, severity, tile, message):
+        self.rule = rule
+        self.severity = severity
+        self.tile = tile
+        self.message = message
+
+    def to_dict(self):
+        return {
+            "rule": self.rule,
+            "severity": self.severity,
+            "tile": self.tile,
+            "message": self.message,
+        }
+
+
+# Rules on connections that the bindings do not expose: fanins() and fanouts()
+# only list adjacent tiles in clock order, and copies of a layout lose the
+# other connections altogether. gate_level_drvs counts them on the layout
+# itself, without telling the tiles
+COUNTED_RULES = (
+    "unplaced_nodes",
+    "non_adjacent_connections",
+    "clocked_data_flow",
+    "io_pins",
+)
+
+COUNTED_MESSAGES = {
+    "unplaced_nodes": "A node of the layout is not placed on a tile",
+    "non_adjacent_connections": "Tiles are connected across a non-adjacent tile",
+    "clocked_data_flow": "A connection runs against the clocking scheme",
+    "io_pins": "An I/O port is not realized by a designated pin",
+}
+
+RULES = tuple(rule for _, rules in SECTIONS for rule, _ in rules)
+
+# Rules on tiles that are verified against gate_level_drvs every so often. Only
+# dead nodes are expected to deviate, as edits may also kill nodes across
+# connections the index does not see. The rules on the I/O lists are exact
+INDEXED_RULES = (
+    "placed_dead_nodes",
+    "missing_connections",
+    "crossing_gates",
+    "border_io",
+)
+
+
+class TileCheck:
+    """Violations of the nodes on a tile, and the data flow around them.
+
+    ``related`` holds the (x, y) tiles the nodes are connected to, ``nodes``
+    the tile of every node and whether pyfiction killed it.
+    """
+
+    __slots__ = ("nodes", "related", "violations")
+
+    def __init__(self, violations, related, nodes):
+        self.violations = violations
+        self.related = related
+        self.nodes = nodes
+
+    def signature(self):
+        messages = tuple(violation.message for violation in self.violations)
+        return self.nodes, self.related, messages
+
+
+def tile_violations(layout, x, y):
+    """Checks the nodes on a tile; the tile is empty if the check has no nodes.
+
+    Edits may kill nodes but leave them on their tiles. As for
+    gate_level_drvs, they still occupy the tiles and are checked like any
+    other node.
+    """
+    violations = []
+    related = set()
+    nodes = []
+    for z in range(layout.z() + 1):
+        tile = (x, y, z)
+        if layout.is_empty_tile(tile):
+            continue
+        node = layout.get_node(tile)
+        dead = layout.is_dead(node)
+        nodes.append((tile, dead))
+        fanins = layout.fanins(tile)
+        fanouts = layout.fanouts(tile)
+        related.update((fanin.x, fanin.y) for fanin in fanins)
+        related.update((fanout.x, fanout.y) for fanout in fanouts)
+        is_pi = layout.is_pi(node)
+        is_po = layout.is_po(node)
+        if dead:
+            violations.append(
+                Violation(
+                    "placed_dead_nodes",
+                    WARNING,
+                    tile,
+                    f"{tile} is occupied by a dead node",
+                )
+            )
+        if z == 1 and not layout.is_wire(node):
+            violations.append(
+                Violation(
+                    "crossing_gates",
+                    ERROR,
+                    tile,
+                    f"{tile} places a gate other than a wire on the crossing layer",
+                )
+            )
+        if not is_pi and not fanins:
+            violations.append(
+                Violation(
+                    "missing_connections",
+                    ERROR,
+                    tile,
+                    f"{tile} has no incoming connection",
+                )
+            )
+        elif not is_po and not fanouts:
+            violations.append(
+                Violation(
+                    "missing_connections",
+                    ERROR,
+                    tile,
+                    f"{tile} has no outgoing connection",
+                )
+            )
+        if (is_pi or is_po) and not layout.is_at_any_border(tile):
+            violations.append(
+                Violation(
+                    "border_io",
+                    WARNING,
+                    tile,
+                    f"I/O port at {tile} is not located at the layout's borders",
+                )
+            )
+    related.discard((x, y))
+    return TileCheck(violations, frozenset(related), tuple(nodes))
+
+
+def drv_counts(layout, rules):
+    """Warnings and errors of gate_level_drvs for some of its rules together."""
+    params = gate_level_drv_params()
+    for rule in RULES:
+        setattr(params, rule, rule in rules)
+    with pyfiction_call("gate_level_drvs"):
+        warnings, errors = gate_level_drvs(layout, params, False)
+    return warnings, errors
+
+
+def counted_violations(rule, warnings, errors):
+    message = COUNTED_MESSAGES.get(rule, f"The layout violates {rule}")
+    return [Violation(rule, WARNING, None, message) for _ in range(warnings)] + [
+        Violation(rule, ERROR, None, message) for _ in range(errors)
+    ]
+
+
+def io_violations(layout):
+    # Rules on the I/O ports of a non-empty layout as a whole
+    violations = []
+    if layout.num_pis() == 0:
+        violations.append(
+            Violation("has_io", ERROR, None, "Layout has no primary inputs")
+        )
+    if layout.num_pos() == 0:
+        violations.append(
+            Violation("has_io", ERROR, None, "Layout has no primary outputs")
+        )
+    for kind, ports in (("input", layout.pis()), ("output", layout.pos())):
+        for port in ports:
+            # Ports whose tiles were cleared are listed as dead coordinates
+            if layout.is_empty_tile(port):
+                tile = (port.x, port.y, port.z)
+                violations.append(
+                    Violation(
+                        "empty_io",
+                        ERROR,
+                        tile,
+                        f"Primary {kind} at {tile} is assigned to an empty tile",
+                    )
+                )
+    return violations
+
+
+def placed_nodes(layout):
+    """The node on every occupied tile, including the nodes pyfiction killed.
+
+    Killed nodes stay on their tiles but are listed by neither ``gates()`` nor
+    ``pis()``, whereas ``num_gates()`` and ``num_wires()`` still count them. So
+    the node ids are walked until every counted node is found on its tile,
+    which takes a step per node ever created instead of one per tile and is
+    faster than listing the gates to begin with. Only if there were more nodes
+    than tiles is the layout scanned instead.
+    """
+    num_nodes = layout.num_gates() + layout.num_wires()
+    num_tiles = (layout.x() + 1) * (layout.y() + 1) * (layout.z() + 1)
+    nodes = {}
+    # Nodes 0 and 1 are the constants; removed nodes are on no tile
+    for node in range(2, num_tiles + 2):
+        if len(nodes) == num_nodes:
+            return nodes
+        tile = layout.get_tile(node)
+        if layout.get_node(tile) == node:
+            nodes[(tile.x, tile.y, tile.z)] = node
+    if len(nodes) == num_nodes:
+        return nodes
+
+    return {
+        (x, y, z): layout.get_node((x, y, z))
+        for x in range(layout.x() + 1)
+        for y in range(layout.y() + 1)
+        for z in range(layout.z() + 1)
+        if not layout.is_empty_tile((x, y, z))
+    }
+
+
+def dead_nodes(layout):
+    """Sorted tiles of the nodes pyfiction killed but left on the layout."""
+    return sorted(
+        tile for tile, node in placed_nodes(layout).items() if layout.is_dead(node)
+    )
+
+
+def design_rule_violations(layout):
+    """All design rule violations of a layout, checked from scratch."""
+    return DesignRuleChecker().check(layout, RevisionLog())
+
+
+def count_violations(violations):
+    # Warnings and errors, in the order gate_level_drvs returns them
+    warnings = sum(violation.severity == WARNING for violation in violations)
+    return warnings, len(violations) - warnings
+
+
+def format_report(violations):
+    # Same lines as the report printed by gate_level_drvs
+    failed = {(violation.rule, violation.severity) for violation in violations}
+    lines = []
+    for section, rules in SECTIONS:
+        lines.append(f"[i] {section}:")
+        for rule, description in rules:
+            if (rule, ERROR) in failed:
+                lines.append(f"[i] [✗] not {description}")
+            elif (rule, WARNING) in failed:
+                lines.append(f"[i] [!] not {description}")
+            else:
+                lines.append(f"[i] [✓] {description}")
+    warnings, errors = count_violations(violations)
+    lines.append(f"[i] DRVs: {errors}, Warnings: {warnings}")
+    return "\n".join(lines) + "\n"
+
+
+class DesignRuleChecker:
+    """Design rule violations of a session layout, kept up to date edit by edit.
+
+    The rules on tiles are indexed per tile and re-evaluated for the tiles
+    edited since the last check and, as long as their checks change, the
+    tiles they are connected to. A check thus costs in the size of the edits
+    rather than of the layout.
+
+    Every ``full_check_interval``-th check, and every check that rebuilds the
+    index, is a full one: it counts the ``COUNTED_RULES`` and the dead nodes
+    by gate_level_drvs, which the checks in between report as of then. The
+    other indexed rules take pyfiction far longer on large layouts, so only
+    every ``verify_interval``-th full check and those after a rebuild verify
+    them as well. Where the index disagrees even after it was rebuilt from
+    every node of the layout, pyfiction's counts are returned instead and
+    every check is a full one until the two agree again.
+    """
+
+    def __init__(self, full_check_interval=20, verify_interval=10):
+        self.full_check_interval = full_check_interval
+        self.verify_interval = verify_interval
+        self.layout = None
+        self.revision = None
+        self.tiles = {}
+        self.flagged = {}
+        self.order = []
+        self.dead = set()
+        self.counted = {}
+        self.overrides = {}
+        self.violations = []
+        self.checks = 0
+        self.full_checks = 0
+        self.lock = threading.Lock()
+
+    def check(self, layout, revision_log):
+        # The layout must not change during the check, e.g., under the
+        # session's read lock. Returns the list of violations
+        with self.lock:
+            return list(self._refresh(layout, revision_log))
+
+    def _refresh(self, layout, revision_log):
+        if layout is self.layout and revision_log.revision == self.revision:
+            return self.violations
+        self.checks += 1
+        changes = None
+        if layout is self.layout and self.revision is not None:
+            changes = revision_log.changes_since(self.revision)
+        if changes is None:
+            self._rebuild(layout)
+        else:
+            self._recheck(layout, changes)
+            revived = self._revived_tiles(layout)
+            if revived:
+                # Nodes the index holds dead may be alive again after an edit
+                # elsewhere
+                self._recheck(layout, revived)
+        self.revision = revision_log.revision
+
+        if (
+            changes is None
+            or self.overrides
+            or self.checks % self.full_check_interval == 0
+        ):
+            self._full_check(layout, rebuilt=changes is None)
+        self.violations = self._violations()
+        return self.violations
+
+    def _full_check(self, layout, rebuilt):
+        # Pyfiction checks every rule in a pass of its own, so counting them
+        # one by one costs no more than counting them together
+        self.full_checks += 1
+        self.counted = {rule: drv_counts(layout, (rule,)) for rule in COUNTED_RULES}
+        rules = ("placed_dead_nodes",)
+        if rebuilt or self.overrides or self.full_checks % self.verify_interval == 0:
+            rules = INDEXED_RULES
+        expected = self._indexed_counts(rules)
+        counts = {rule: drv_counts(layout, (rule,)) for rule in rules}
+        if counts != expected:
+            # Dead nodes are caught up with, whereas other deviations are bugs
+            deviating = [rule for rule in rules if counts[rule] != expected[rule]]
+            log = logger.info if deviating == ["placed_dead_nodes"] else logger.warning
+            log(
+                "Incremental design rule check deviated from gate_level_drvs at "
+                "revision %d: %s instead of %s",
+                self.revision,
+                expected,
+                counts,
+            )
+            self._rebuild(layout)
+            expected = self._indexed_counts(rules)
+        self.overrides = {
+            rule: counts[rule] for rule in counts if counts[rule] != expected[rule]
+        }
+
+    def _indexed_counts(self, rules):
+        counts = dict.fromkeys(rules, (0, 0))
+        for violations in self.flagged.values():
+            for violation in violations:
+                if violation.rule in counts:
+                    warnings, errors = counts[violation.rule]
+                    if violation.severity == WARNING:
+                        counts[violation.rule] = (warnings + 1, errors)
+                    else:
+                        counts[violation.rule] = (warnings, errors + 1)
+        return counts
+
+    def _revived_tiles(self, layout):
+        return {
+            (x, y)
+            for x, y, z in self.dead
+            if layout.is_empty_tile((x, y, z))
+            or not layout.is_dead(layout.get_node((x, y, z)))
+        }
+
+    def _rebuild(self, layout):
+        self.layout = layout
+        self.tiles.clear()
+        self.flagged.clear()
+        self.order.clear()
+        self.dead.clear()
+        # In order, so that the flagged tiles are appended to their order
+        for x, y in sorted({(x, y) for x, y, _ in placed_nodes(layout)}):
+            self._update((x, y), tile_violations(layout, x, y))
+
+    def _recheck(self, layout, tiles):
+        dirty = set(tiles)
+        for tile in tiles:
+            if tile in self.tiles:
+                dirty.update(self.tiles[tile].related)
+        pending = list(dirty)
+        while pending:
+            tile = pending.pop()
+            if not layout.is_within_bounds((*tile, 0)):
+                continue
+            previous = self.tiles.get(tile)
+            check = tile_violations(layout, *tile)
+            self._update(tile, check)
+            # Connections and killed nodes are followed as long as the checks
+            # of the tiles change
+            if previous is None:
+                previous = TileCheck([], frozenset(), ())
+            if check.signature() != previous.signature():
+                for related in previous.related | check.related:
+                    if related not in dirty:
+                        dirty.add(related)
+                        pending.append(related)
+
+    def _update(self, tile, check):
+        previous = self.tiles.pop(tile, None)
+        if previous is not None:
+            self.dead.difference_update(
+                node_tile for node_tile, dead in previous.nodes if dead
+            )
+        was_flagged = self.flagged.pop(tile, None) is not None
+        if check.nodes:
+            self.tiles[tile] = check
+            self.dead.update(node_tile for node_tile, dead in check.nodes if dead)
+            if check.violations:
+                self.flagged[tile] = check.violations
+        # The flagged tiles are kept sorted rather than sorted on every check
+        if tile in self.flagged and not was_flagged:
+            bisect.insort(self.order, tile)
+        elif was_flagged and tile not in self.flagged:
+            del self.order[bisect.bisect_left(self.order, tile)]
+
+    def _violations(self):
+        violations = []
+        for tile in self.order:
+            if self.overrides:
+                violations.extend(
+                    violation
+                    for violation in self.flagged[tile]
+                    if violation.rule not in self.overrides
+                )
+            else:
+                violations.extend(self.flagged[tile])
+        # Rules on the layout's I/O as a whole only apply to non-empty layouts
+        if self.tiles:
+            violations.extend(io_violations(self.layout))
+        for rule, (warnings, errors) in {**self.counted, **self.overrides}.items():
+            violations.extend(counted_violations(rule, warnings, errors))
+        return violations
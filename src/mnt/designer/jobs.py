@@ -0,0 +1,250 @@
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+
+class JobError(Exception):
+    """Raised by a job body to fail the job with a user-facing message."""
+
+
+class Job:
+    def __init__(self, session_id, kind):
+        self.id = str(uuid.uuid4())
+        self.session_id = session_id
+        self.kind = kind
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.progress = None
+        self.stage = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.future = None
+        self.lock = threading.Lock()
+        self.cancel_event = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        end = self.finished if self.finished is not None else time.time()
+        return end - self.started
+
+    def to_record(self):
+        # Everything but the synchronization primitives, e.g., to share the
+        # job with other server processes
+        return {
+            "id": self.id,
+            "session_id": self.session_id,
+            "kind": self.kind,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "progress": self.progress,
+            "stage": self.stage,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+        }
+
+    @classmethod
+    def from_record(cls, record):
+        job = cls(record["session_id"], record["kind"])
+        for key, value in record.items():
+            setattr(job, key, value)
+        return job
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "error": self.error,
+            "progress": self.progress,
+            "stage": self.stage,
+            "elapsed": round(self.elapsed(), 3),
+        }
+
+
+class JobManager:
+    """Runs long physical design calls off the request thread.
+
+    ``run(job)`` does the heavy work and returns an intermediate value,
+    ``commit(job, value)`` turns it into the job result. ``commit`` is only
+    invoked if the job was not cancelled in the meantime, so it is the place
+    to write results into the session state.
+
+    With a ``registry``, the state of every job is published so that other
+    server processes can report it, and their cancellation requests are
+    picked up every ``poll_interval`` seconds.
+    """
+
+    def __init__(self, max_workers=4, retention=3600, registry=None, poll_interval=0.5):
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="mnt-job"
+        )
+        self.retention = retention
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.registry = registry
+        self.poll_interval = poll_interval
+        self.watcher = None
+        # Number of job state changes so far, to wait for the next one
+        self.changes = 0
+        self.changed = threading.Condition()
+
+    def submit(self, session_id, kind, run, commit):
+        job = Job(session_id, kind)
+        with self.lock:
+            self._prune()
+            self.jobs[job.id] = job
+            if self.registry is not None and self.watcher is None:
+                self.watcher = threading.Thread(
+                    target=self._watch, name="mnt-job-watcher", daemon=True
+                )
+                self.watcher.start()
+        self._publish(job)
+        job.future = self.executor.submit(self._execute, job, run, commit)
+        return job
+
+    def get(self, job_id, session_id):
+        # Jobs are only visible to the session that submitted them
+        if session_id is None:
+            return None
+        with self.lock:
+            job = self.jobs.get(job_id)
+        if job is None and self.registry is not None:
+            # The job may belong to another server process
+            record = self.registry.lookup(job_id)
+            job = Job.from_record(record) if record is not None else None
+        if job is None or job.session_id != session_id:
+            return None
+        return job
+
+    def cancel(self, job_id, session_id):
+        job = self.get(job_id, session_id)
+        if job is None:
+            return False
+        return self._cancel(job)
+
+    def _cancel(self, job):
+        if job.future is None:
+            # Leave it to the process running the job
+            if job.status in FINISHED_STATES:
+                return False
+            self.registry.request_cancel(job.id)
+            return True
+        with job.lock:
+            if job.status in FINISHED_STATES:
+                return False
+            job.cancel_event.set()
+            job.status = CANCELLED
+            job.finished = time.time()
+        self._publish(job)
+        # A queued job never starts; a running one has its result discarded
+        job.future.cancel()
+        return True
+
+    def report(self, job, progress):
+        # Intermediate results of a running job
+        with job.lock:
+            job.progress = progress
+        self._publish(job)
+
+    def enter_stage(self, job, stage):
+        # Current step of a running job, e.g., the layout search
+        with job.lock:
+            job.stage = stage
+        self._publish(job)
+
+    def wait_for_change(self, seen, timeout=None):
+        # Blocks until a job changed after ``changes`` was ``seen`` and
+        # returns the new count; changes in other processes are not notified
+        with self.changed:
+            self.changed.wait_for(lambda: self.changes != seen, timeout)
+            return self.changes
+
+    def in_flight(self):
+        with self.lock:
+            return sum(
+                1 for job in self.jobs.values() if job.status in (QUEUED, RUNNING)
+            )
+
+    def _execute(self, job, run, commit):
+        with job.lock:
+            if job.cancelled:
+                return
+            job.status = RUNNING
+            job.started = time.time()
+        self._publish(job)
+        try:
+            value = run(job)
+            with job.lock:
+                if job.cancelled:
+                    return
+                job.result = commit(job, value)
+                job.status = DONE
+        except Exception as e:  # noqa: BLE001
+            with job.lock:
+                if job.cancelled:
+                    return
+                job.error = str(e)
+                job.status = FAILED
+        finally:
+            with job.lock:
+                if job.finished is None:
+                    job.finished = time.time()
+            self._publish(job)
+
+    def _publish(self, job):
+        with self.changed:
+            self.changes += 1
+            self.changed.notify_all()
+        if self.registry is not None:
+            with job.lock:
+                record = job.to_record()
+            self.registry.publish(record)
+
+    def _watch(self):
+        while True:
+            time.sleep(self.poll_interval)
+            with self.lock:
+                jobs = {
+                    job.id: job
+                    for job in self.jobs.values()
+                    if job.status in (QUEUED, RUNNING)
+                }
+            try:
+                for job_id in self.registry.cancel_requested(list(jobs)):
+                    self._cancel(jobs[job_id])
+            except Exception:
+                # Try again on the next poll
+                logger.exception("Could not poll for cancelled jobs")
+
+    def _prune(self):
+        horizon = time.time() - self.retention
+        stale = [
+            job_id
+            for job_id, job in self.jobs.items()
+            if job.finished is not None and job.finished < horizon
+        ]
+        for job_id in stale:
+            del self.jobs[job_id]
+        if self.registry is not None:
+            self.registry.prune(horizon)
@@ -0,0 +1,355 @@
+"""Load test of a designer server with many concurrent sessions.
+
+Every simulated designer has its own browser session and repeatedly runs an
+edit trace: it creates a layout, places PIs, gates and POs, moves and
+connects gates, checks the design rules, and exports the result. Optional
+background sessions keep GOLD or exact jobs running at the same time to
+measure their interference. Unless a ``--url`` is given, a server is started
+locally. Throughput and latency percentiles are reported per endpoint.
+"""
+
+import argparse
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import requests
+
+# Circuit laid out by the background jobs: a full adder and a majority gate
+HEAVY_VERILOG = """module top( a , b , c , s , co , m );
+  input a , b , c ;
+  output s , co , m ;
+  wire n1 , n2 , n3 , n4 , n5 , n6 ;
+  assign n1 = a ^ b ;
+  assign n2 = n1 ^ c ;
+  assign n3 = a & b ;
+  assign n4 = n1 & c ;
+  assign n5 = n3 | n4 ;
+  assign n6 = a | c ;
+  assign s = n2 ;
+  assign co = n5 ;
+  assign m = n6 & n5 ;
+endmodule
+"""
+
+
+class LoadTestError(Exception):
+    pass
+
+
+class Stats:
+    """Latencies and errors of all requests, by endpoint."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def add(self, endpoint, latency, ok):
+        with self.lock:
+            self.latencies[endpoint].append(latency)
+            if not ok:
+                self.errors[endpoint] += 1
+
+    def report(self, duration):
+        rows = []
+        for endpoint, latencies in sorted(self.latencies.items()):
+            ordered = sorted(latencies)
+            rows.append(
+                {
+                    "endpoint": endpoint,
+                    "requests": len(ordered),
+                    "errors": self.errors[endpoint],
+                    "throughput": len(ordered) / duration,
+                    "mean_ms": statistics.fmean(ordered) * 1000,
+                    "p50_ms": percentile(ordered, 0.5) * 1000,
+                    "p95_ms": percentile(ordered, 0.95) * 1000,
+                    "p99_ms": percentile(ordered, 0.99) * 1000,
+                    "max_ms": ordered[-1] * 1000,
+                }
+            )
+        return rows
+
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, round(q * (len(ordered) - 1)))]
+
+
+class SimulatedSession:
+    """A simulated designer with its own session cookie."""
+
+    def __init__(self, url, stats, think_time=0.0, seed=None):
+        self.url = url
+        self.stats = stats
+        self.think_time = think_time
+        self.rng = random.Random(seed)
+        self.http = requests.Session()
+        # The index page assigns the session ID
+        self.http.get(url + "/").raise_for_status()
+
+    def call(self, method, endpoint, body=None, name=None):
+        if self.think_time:
+            time.sleep(self.rng.uniform(0, 2 * self.think_time))
+        start = time.perf_counter()
+        data = None
+        try:
+            response = self.http.request(method, self.url + endpoint, json=body)
+            ok = response.ok
+            # Exports answer with the file itself unless they fail
+            if ok and response.headers.get("Content-Type") == "application/json":
+                data = response.json()
+                ok = data.get("success", True)
+        except (requests.RequestException, ValueError):
+            ok = False
+        self.stats.add(name or endpoint.split("?")[0], time.perf_counter() - start, ok)
+        return data if ok else None
+
+    def place(self, x, y, gate_type, *sources):
+        params = {}
+        for key, (sx, sy, source_type) in zip(("first", "second"), sources):
+            params[key] = {"position": {"x": sx, "y": sy}, "gate_type": source_type}
+        body = {"x": x, "y": y, "gate_type": gate_type, "params": params}
+        return self.call("POST", "/place_gate", body)
+
+    def edit_trace(self, blocks):
+        # Each block of 3x3 tiles holds an AND gate with two PIs and a PO
+        # that is moved and connected again
+        size = 3 * blocks + 1
+        self.call("POST", "/reset_layout", {"x": size, "y": size})
+        for i in range(blocks):
+            x, y = 3 * i, 3 * self.rng.randrange(blocks)
+            self.place(x, y + 1, "pi")
+            self.place(x + 1, y, "pi")
+            self.place(x + 1, y + 1, "and", (x, y + 1, "pi"), (x + 1, y, "pi"))
+            self.place(x + 2, y + 1, "po", (x + 1, y + 1, "and"))
+            move = {
+                "source_x": x + 2,
+                "source_y": y + 1,
+                "source_gate_type": "po",
+                "target_x": x + 1,
+                "target_y": y + 2,
+            }
+            self.call("POST", "/move_gate", move)
+            connect = {
+                "source_x": x + 1,
+                "source_y": y + 1,
+                "source_gate_type": "and",
+                "target_x": x + 1,
+                "target_y": y + 2,
+                "target_gate_type": "po",
+                "find_path": False,
+            }
+            self.call("POST", "/connect_gates", connect)
+            self.call("GET", "/get_layout")
+        self.call("POST", "/check_design_rules")
+        self.call("GET", "/export_layout")
+        self.call("GET", "/export_qca_layout")
+
+    def heavy_job(self, algorithm, stop, poll_interval=0.05):
+        self.call("POST", "/save_verilog_code", {"code": HEAVY_VERILOG})
+        # A varying timeout keeps the result cache from answering the job
+        timeout = 30000 + self.rng.randrange(30000)
+        if algorithm == "gold":
+            cost = self.rng.choice(("AREA", "WIRES", "CROSSINGS", "ACP"))
+            body = {"mode": "HIGH_EFFORT", "cost": cost, "timeout": timeout}
+        else:
+            body = {"upper_bound_x": 20, "upper_bound_y": 20, "timeout": timeout}
+        start = time.perf_counter()
+        data = self.call("POST", f"/apply_{algorithm}", body)
+        if data is None:
+            return
+        status = data["status"]
+        while status in ("queued", "running"):
+            if stop.wait(poll_interval):
+                # Unfinished jobs at the end of the run are not recorded
+                return
+            job = self.http.get(f"{self.url}/job_status/{data['job_id']}").json()
+            status = job.get("status")
+        self.stats.add(
+            f"job:{algorithm}", time.perf_counter() - start, status == "done"
+        )
+
+
+def start_server(workers, port=None):
+    # Runs the designer in a separate process, so that the load generator
+    # does not compete with it for the interpreter
+    if port is None:
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            port = s.getsockname()[1]
+    env = dict(os.environ)
+    if workers is not None:
+        env["MNT_DESIGNER_WORKERS"] = str(workers)
+    command = (
+        "from mnt.designer.app import app; "
+        f"app.run(host='127.0.0.1', port={port}, threaded=True)"
+    )
+    process = subprocess.Popen(
+        [sys.executable, "-c", command],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            msg = "Server process exited during startup."
+            raise LoadTestError(msg)
+        try:
+            requests.get(url + "/", timeout=1)
+            return process, url
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    process.kill()
+    msg = "Server did not start within 60 s."
+    raise LoadTestError(msg)
+
+
+def run_load(
+    url,
+    sessions,
+    duration,
+    blocks,
+    *,
+    heavy=0,
+    heavy_algorithm="gold",
+    think_time=0.0,
+    seed=0,
+):
+    """Runs the load and returns the statistics and the actual duration."""
+    stats = Stats()
+    stop = threading.Event()
+    # Any error ends a session and is raised once the load is over
+    failures = []
+
+    def editor(index):
+        try:
+            designer = SimulatedSession(url, stats, think_time, seed + index)
+            while not stop.is_set():
+                designer.edit_trace(blocks)
+        except Exception as e:  # noqa: BLE001
+            failures.append(e)
+
+    def background(index):
+        try:
+            designer = SimulatedSession(url, stats, seed=seed + sessions + index)
+            while not stop.is_set():
+                designer.heavy_job(heavy_algorithm, stop)
+        except Exception as e:  # noqa: BLE001
+            failures.append(e)
+
+    threads = [threading.Thread(target=editor, args=(i,)) for i in range(sessions)]
+    threads += [threading.Thread(target=background, args=(i,)) for i in range(heavy)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    stop.wait(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    if failures:
+        msg = f"{len(failures)} sessions failed: {failures[0]}"
+        raise LoadTestError(msg)
+    return stats, time.perf_counter() - start
+
+
+def print_report(rows, duration, sessions, heavy):
+    total = sum(
+        row["requests"] for row in rows if not row["endpoint"].startswith("job:")
+    )
+    errors = sum(row["errors"] for row in rows)
+    print(
+        f"{sessions} sessions, {heavy} background jobs, {duration:.1f} s: "
+        f"{total} requests ({total / duration:.1f}/s), {errors} errors\n"
+    )
+    print(
+        f"{'endpoint':24}{'requests':>9}{'errors':>7}{'req/s':>8}"
+        + "".join(f"{q:>10}" for q in ("p50 ms", "p95 ms", "p99 ms", "max ms"))
+    )
+    for row in rows:
+        print(
+            f"{row['endpoint']:24}{row['requests']:9}{row['errors']:7}"
+            f"{row['throughput']:8.1f}"
+            + "".join(
+                f"{row[q]:10.1f}" for q in ("p50_ms", "p95_ms", "p99_ms", "max_ms")
+            )
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="mnt.designer-loadtest", description=__doc__.splitlines()[0]
+    )
+    parser.add_argument(
+        "--url", help="server to test (default: start one on a free local port)"
+    )
+    parser.add_argument("-n", "--sessions", type=int, default=10)
+    parser.add_argument(
+        "-d", "--duration", type=float, default=30, help="seconds (default: 30)"
+    )
+    parser.add_argument(
+        "--blocks", type=int, default=4, help="gate blocks placed per edit trace"
+    )
+    parser.add_argument(
+        "--think-time",
+        type=float,
+        default=0.0,
+        help="mean pause between the requests of a session in seconds",
+    )
+    parser.add_argument(
+        "--heavy", type=int, default=0, help="sessions running background jobs"
+    )
+    parser.add_argument("--heavy-algorithm", choices=("gold", "exact"), default="gold")
+    parser.add_argument(
+        "--workers", type=int, help="worker processes of the started server"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="save the report to this JSON file")
+    args = parser.parse_args(argv)
+
+    process = None
+    url = args.url
+    if url is None:
+        process, url = start_server(args.workers)
+    try:
+        stats, duration = run_load(
+            url.rstrip("/"),
+            args.sessions,
+            args.duration,
+            args.blocks,
+            heavy=args.heavy,
+            heavy_algorithm=args.heavy_algorithm,
+            think_time=args.think_time,
+            seed=args.seed,
+        )
+    except LoadTestError as e:
+        print(e, file=sys.stderr)
+        return 1
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(10)
+
+    rows = stats.report(duration)
+    print_report(rows, duration, args.sessions, args.heavy)
+    if args.output:
+        with Path(args.output).open("w", encoding="utf-8") as f:
+            json.dump(
+                {"args": vars(args), "duration": duration, "endpoints": rows},
+                f,
+                indent=2,
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
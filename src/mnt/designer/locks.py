@@ -0,0 +1,95 @@
+import threading
+import weakref
+from contextlib import contextmanager
+
+
+class RWLock:
+    """Reader/writer lock that lets any number of readers or a single writer in.
+
+    Waiting writers take precedence over new readers, so a steady stream of
+    reads cannot starve an edit. The lock is not reentrant.
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.readers = 0
+        self.writer = False
+        self.waiting_writers = 0
+
+    def acquire_read(self):
+        with self.condition:
+            while self.writer or self.waiting_writers:
+                self.condition.wait()
+            self.readers += 1
+
+    def release_read(self):
+        with self.condition:
+            self.readers -= 1
+            if not self.readers:
+                self.condition.notify_all()
+
+    def acquire_write(self, blocking=True):
+        with self.condition:
+            if not blocking:
+                if self.writer or self.readers:
+                    return False
+                self.writer = True
+                return True
+            self.waiting_writers += 1
+            try:
+                while self.writer or self.readers:
+                    self.condition.wait()
+            finally:
+                self.waiting_writers -= 1
+            self.writer = True
+            return True
+
+    def release_write(self):
+        with self.condition:
+            self.writer = False
+            self.condition.notify_all()
+
+    @contextmanager
+    def read(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+class SessionLocks:
+    """One ``RWLock`` per session, created on demand.
+
+    Locks are only referenced weakly, so the lock of a session disappears as
+    soon as no request holds or waits for it anymore.
+    """
+
+    def __init__(self):
+        self.locks = weakref.WeakValueDictionary()
+        self.lock = threading.Lock()
+
+    def get(self, session_id):
+        with self.lock:
+            rw_lock = self.locks.get(session_id)
+            if rw_lock is None:
+                rw_lock = self.locks[session_id] = RWLock()
+            return rw_lock
+
+    @contextmanager
+    def read(self, session_id):
+        with self.get(session_id).read():
+            yield
+
+    @contextmanager
+    def write(self, session_id):
+        with self.get(session_id).write():
+            yield
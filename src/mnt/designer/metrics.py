@@ -0,0 +1,232 @@
+"""Request and pyfiction timings in the Prometheus text exposition format.
+
+Pyfiction calls are timed wherever they run. Calls made inside the worker
+processes are captured per task and merged into the histograms of the server
+process once the task returns. Since pyfiction's functions are invisible to
+Python profilers, the call running on a thread can also be looked up via
+``current_call``.
+"""
+
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds (in seconds) of the histogram buckets, from quick edits to
+# long-running solvers
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    300.0,
+)
+
+
+def format_labels(names, values):
+    if not names:
+        return ""
+    pairs = (
+        '{}="{}"'.format(
+            name,
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+        )
+        for name, value in zip(names, values)
+    )
+    return "{" + ",".join(pairs) + "}"
+
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonically increasing count per combination of label values."""
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self.lock:
+            self.values[labelvalues] = self.values.get(labelvalues, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            values = sorted(self.values.items())
+        for labelvalues, value in values:
+            yield self.name, format_labels(self.labelnames, labelvalues), value
+
+
+class Gauge:
+    """Value that is read from a callback whenever the metrics are collected.
+
+    The callback returns a number, or a mapping from tuples of label values
+    to numbers.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, callback, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.labelnames = tuple(labelnames)
+
+    def samples(self):
+        value = self.callback()
+        values = value.items() if isinstance(value, dict) else [((), value)]
+        for labelvalues, value in sorted(values):
+            yield self.name, format_labels(self.labelnames, labelvalues), value
+
+
+class Histogram:
+    """Distribution of observed durations per combination of label values."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        with self.lock:
+            series = self.series.get(labelvalues)
+            if series is None:
+                # Counts per bucket, the last one beyond the largest bound
+                series = self.series[labelvalues] = [
+                    [0] * (len(self.buckets) + 1),
+                    0.0,
+                ]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, *labelvalues):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labelvalues)
+
+    def samples(self):
+        with self.lock:
+            series = sorted(
+                (labelvalues, list(counts), total)
+                for labelvalues, (counts, total) in self.series.items()
+            )
+        names = (*self.labelnames, "le")
+        for labelvalues, counts, total in series:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                labels = format_labels(names, (*labelvalues, format_value(bound)))
+                yield self.name + "_bucket", labels, cumulative
+            labels = format_labels(self.labelnames, labelvalues)
+            yield self.name + "_sum", labels, total
+            yield self.name + "_count", labels, cumulative
+
+
+class Registry:
+    """Collection of metrics that is rendered as one exposition."""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+registry = Registry()
+
+PYFICTION_SECONDS = registry.register(
+    Histogram(
+        "mnt_designer_pyfiction_call_duration_seconds",
+        "Duration of pyfiction calls.",
+        ("function",),
+    )
+)
+
+_local = threading.local()
+
+
+@contextmanager
+def pyfiction_call(function):
+    # Times a pyfiction call; inside a captured worker task the timing is
+    # only collected and reported to the server process with the result
+    _local.call = function
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        _local.call = None
+        timings = getattr(_local, "timings", None)
+        if timings is not None:
+            timings.append((function, elapsed))
+        else:
+            PYFICTION_SECONDS.observe(elapsed, function)
+
+
+def current_call():
+    # Name of the pyfiction function running on this thread, if any
+    return getattr(_local, "call", None)
+
+
+def timed(function):
+    # Pyfiction function whose calls are timed under its own name
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        with pyfiction_call(function.__name__):
+            return function(*args, **kwargs)
+
+    return wrapper
+
+
+@contextmanager
+def capture_timings():
+    _local.timings = timings = []
+    try:
+        yield timings
+    finally:
+        _local.timings = None
+
+
+def record_timings(timings):
+    for function, elapsed in timings:
+        PYFICTION_SECONDS.observe(elapsed, function)
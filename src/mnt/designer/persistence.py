@@ -0,0 +1,349 @@
+import json
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+
+from mnt.pyfiction import cartesian_obstruction_layout
+
+from mnt.designer.revisions import RevisionLog
+from mnt.designer.workers import (
+    layout_from_dict,
+    layout_from_fgl,
+    layout_to_dict,
+    network_from_verilog,
+)
+
+logger = logging.getLogger(__name__)
+
+# A snapshot is a plain dictionary with the layout as JSON text ("layout"), the
+# Verilog source ("verilog"), whether that source was parsed into a network
+# ("network") and the layout revision ("revision"). Snapshots of format 1 held
+# the layout as FGL text ("fgl") instead, which cannot describe layouts that
+# are still being edited; they are still read.
+SNAPSHOT_FORMAT = 2
+
+
+def snapshot_session(values):
+    layout = values.get("layout")
+    revision_log = values.get("revisions")
+    return {
+        "format": SNAPSHOT_FORMAT,
+        "layout": json.dumps(layout_to_dict(layout)) if layout is not None else None,
+        "verilog": values.get("verilog"),
+        "network": values.get("network") is not None,
+        "revision": revision_log.revision if revision_log is not None else 0,
+    }
+
+
+def restore_session(snapshot, parse_verilog=network_from_verilog):
+    # The revision carries over, but not the history of edits leading to it
+    values = {"revisions": RevisionLog(revision=snapshot.get("revision", 0))}
+    if snapshot.get("layout") is not None:
+        values["layout"] = layout_from_dict(json.loads(snapshot["layout"]))
+    elif snapshot.get("fgl") is not None:
+        values["layout"] = cartesian_obstruction_layout(
+            layout_from_fgl(snapshot["fgl"])
+        )
+    if snapshot.get("verilog") is not None:
+        values["verilog"] = snapshot["verilog"]
+        values["network"] = (
+            parse_verilog(snapshot["verilog"]) if snapshot["network"] else None
+        )
+    return values
+
+
+class DirectoryBackend:
+    """Stores every session as a JSON file in a directory.
+
+    Snapshots of format 1 kept their FGL in a separate file next to it, which
+    is read along and removed once the session is saved again.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def path(self, session_id, suffix=".json"):
+        # Session IDs are generated by the server, but never trust a path
+        return self.directory / (Path(session_id).name + suffix)
+
+    def save(self, session_id, snapshot):
+        # Write atomically so that a crash never leaves a truncated snapshot
+        path = self.path(session_id)
+        temp_path = path.with_name(path.name + ".tmp")
+        with temp_path.open("w", encoding="utf-8") as f:
+            json.dump(snapshot, f)
+        temp_path.replace(path)
+        self.path(session_id, ".fgl").unlink(missing_ok=True)
+
+    def load(self, session_id):
+        path = self.path(session_id)
+        if not path.exists():
+            return None
+        with path.open(encoding="utf-8") as f:
+            snapshot = json.load(f)
+        fgl_path = self.path(session_id, ".fgl")
+        if "format" not in snapshot and fgl_path.exists():
+            snapshot["fgl"] = fgl_path.read_text(encoding="utf-8")
+        return snapshot
+
+    def delete(self, session_id):
+        for suffix in (".json", ".fgl"):
+            self.path(session_id, suffix).unlink(missing_ok=True)
+
+
+class SpillDirectory(DirectoryBackend):
+    """Holds sessions evicted from memory until they are accessed again.
+
+    Without a persistent store, evicted sessions are written here instead of
+    being dropped, and their files are removed once they are loaded back.
+    """
+
+    def load(self, session_id):
+        snapshot = super().load(session_id)
+        if snapshot is not None:
+            self.delete(session_id)
+        return snapshot
+
+
+class SQLiteDatabase:
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+
+    def connection(self):
+        # SQLite connections must not be shared between threads
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = self.local.conn = sqlite3.connect(
+                self.path, timeout=30, isolation_level=None
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+
+class SQLiteBackend(SQLiteDatabase):
+    """Stores all sessions in a single SQLite database file.
+
+    The file may be shared by several server processes: ``save`` can be made
+    conditional on the revision that is currently stored.
+    """
+
+    def __init__(self, path):
+        super().__init__(path)
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "session_id TEXT PRIMARY KEY, fgl TEXT, verilog TEXT, "
+                "network INTEGER NOT NULL, revision INTEGER NOT NULL, layout TEXT)"
+            )
+            # Databases of format 1 snapshots lack the layout column
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(sessions)")}
+            for column in ("fgl", "layout"):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE sessions ADD COLUMN {column} TEXT")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def save(self, session_id, snapshot, expected_revision=None, check=False):
+        # With check=True, only save if the stored revision (None if there is
+        # none) still equals expected_revision; returns whether it was saved
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if check and self.revision(session_id) != expected_revision:
+                conn.execute("ROLLBACK")
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions "
+                "(session_id, fgl, verilog, network, revision, layout) "
+                "VALUES (?, NULL, ?, ?, ?, ?)",
+                (
+                    session_id,
+                    snapshot["verilog"],
+                    int(snapshot["network"]),
+                    snapshot["revision"],
+                    snapshot["layout"],
+                ),
+            )
+            conn.execute("COMMIT")
+            return True
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def revision(self, session_id):
+        row = (
+            self.connection()
+            .execute(
+                "SELECT revision FROM sessions WHERE session_id = ?", (session_id,)
+            )
+            .fetchone()
+        )
+        return row[0] if row is not None else None
+
+    def load(self, session_id):
+        row = (
+            self.connection()
+            .execute(
+                "SELECT layout, fgl, verilog, network, revision FROM sessions "
+                "WHERE session_id = ?",
+                (session_id,),
+            )
+            .fetchone()
+        )
+        if row is None:
+            return None
+        layout, fgl, verilog, network, revision = row
+        snapshot = {
+            "format": SNAPSHOT_FORMAT,
+            "layout": layout,
+            "verilog": verilog,
+            "network": bool(network),
+            "revision": revision,
+        }
+        if fgl is not None:
+            snapshot.update(format=1, fgl=fgl)
+        return snapshot
+
+    def delete(self, session_id):
+        self.connection().execute(
+            "DELETE FROM sessions WHERE session_id = ?", (session_id,)
+        )
+
+
+class SQLiteJobRegistry(SQLiteDatabase):
+    """Makes the jobs of one server process visible to all others.
+
+    Jobs keep running in the process that started them; the registry holds
+    their state and result as well as cancellation requests from other
+    processes.
+    """
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.connection().execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "job_id TEXT PRIMARY KEY, record TEXT NOT NULL, "
+            "cancel_requested INTEGER NOT NULL DEFAULT 0)"
+        )
+
+    def publish(self, record):
+        self.connection().execute(
+            "INSERT INTO jobs (job_id, record) VALUES (?, ?) "
+            "ON CONFLICT (job_id) DO UPDATE SET record = excluded.record",
+            (record["id"], json.dumps(record)),
+        )
+
+    def lookup(self, job_id):
+        row = (
+            self.connection()
+            .execute("SELECT record FROM jobs WHERE job_id = ?", (job_id,))
+            .fetchone()
+        )
+        return json.loads(row[0]) if row is not None else None
+
+    def request_cancel(self, job_id):
+        self.connection().execute(
+            "UPDATE jobs SET cancel_requested = 1 WHERE job_id = ?", (job_id,)
+        )
+
+    def cancel_requested(self, job_ids):
+        if not job_ids:
+            return []
+        rows = (
+            self.connection()
+            .execute(
+                "SELECT job_id FROM jobs WHERE cancel_requested = 1 AND job_id IN "
+                f"({', '.join('?' for _ in job_ids)})",
+                list(job_ids),
+            )
+            .fetchall()
+        )
+        return [row[0] for row in rows]
+
+    def prune(self, horizon):
+        self.connection().execute(
+            "DELETE FROM jobs WHERE json_extract(record, '$.finished') < ?",
+            (horizon,),
+        )
+
+
+def open_backend(location):
+    # SQLite for database files, a directory store for everything else
+    if location.endswith((".db", ".sqlite", ".sqlite3")):
+        return SQLiteBackend(location)
+    return DirectoryBackend(location)
+
+
+class SnapshotWriter:
+    """Writes session snapshots to a backend in a background thread.
+
+    ``schedule`` only marks a session as dirty; the snapshot is taken by the
+    writer thread at most ``delay`` seconds later, so a burst of edits to the
+    same session results in a single write. ``snapshot(session_id)`` must
+    return the current snapshot of a session, or ``None`` if there is nothing
+    to write (anymore).
+    """
+
+    def __init__(self, backend, snapshot, delay=0.5):
+        self.backend = backend
+        self.snapshot = snapshot
+        self.delay = delay
+        self.pending = set()
+        self.writes = 0
+        self.errors = 0
+        self.condition = threading.Condition()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(
+            target=self._run, name="mnt-snapshot-writer", daemon=True
+        )
+        self.thread.start()
+
+    def schedule(self, session_id):
+        with self.condition:
+            self.pending.add(session_id)
+            self.condition.notify()
+
+    def write(self, session_id, snapshot):
+        # Write immediately, e.g., when a session is evicted from memory
+        with self.condition:
+            self.pending.discard(session_id)
+        self.backend.save(session_id, snapshot)
+        self.writes += 1
+
+    def flush(self):
+        with self.condition:
+            pending, self.pending = self.pending, set()
+        for session_id in pending:
+            try:
+                snapshot = self.snapshot(session_id)
+                if snapshot is not None:
+                    self.backend.save(session_id, snapshot)
+                    self.writes += 1
+            except Exception:
+                logger.exception("Could not save session %s", session_id)
+                self.errors += 1
+
+    def close(self):
+        with self.condition:
+            self.stopped.set()
+            self.condition.notify()
+        self.thread.join()
+        self.flush()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.pending and not self.stopped.is_set():
+                    self.condition.wait()
+            if self.stopped.is_set():
+                return
+            # Give further edits to the same sessions time to coalesce
+            self.stopped.wait(self.delay)
+            self.flush()
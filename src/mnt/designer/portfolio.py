@@ -0,0 +1,81 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+OBJECTIVES = ("area", "wires", "crossings")
+
+
+def layout_metrics(layout):
+    return {
+        "area": (layout.x() + 1) * (layout.y() + 1),
+        "wires": layout.num_wires(),
+        "crossings": layout.num_crossings(),
+    }
+
+
+def dominates(a, b, objectives=OBJECTIVES):
+    return all(a[o] <= b[o] for o in objectives) and any(
+        a[o] < b[o] for o in objectives
+    )
+
+
+def pareto_front(candidates, objectives=OBJECTIVES):
+    # Candidates are dictionaries with a "metrics" entry; of several
+    # candidates with equal metrics, only the first one is kept
+    front = []
+    for candidate in candidates:
+        metrics = candidate["metrics"]
+        if any(
+            dominates(other["metrics"], metrics, objectives)
+            or all(other["metrics"][o] == metrics[o] for o in objectives)
+            for other in front
+        ):
+            continue
+        front = [
+            other
+            for other in front
+            if not dominates(metrics, other["metrics"], objectives)
+        ]
+        front.append(candidate)
+    return front
+
+
+def preference(objective):
+    # Sort key that ranks candidates by one objective, then by all of them
+    def key(candidate):
+        metrics = candidate["metrics"]
+        return (metrics[objective], *(metrics[o] for o in OBJECTIVES))
+
+    return key
+
+
+def run_portfolio(engines, run, on_result=None, cancel_event=None):
+    """Runs all engines in parallel and reports their outcomes as they arrive.
+
+    ``run(engine, stop_event)`` executes a single engine and is expected to
+    honour its own time limit. ``on_result(engine, value, error, elapsed)`` is
+    called from the calling thread as soon as an engine has finished.
+    Setting ``cancel_event`` stops all engines that are still running.
+    """
+    stop = threading.Event()
+    start = time.monotonic()
+    executor = ThreadPoolExecutor(
+        max_workers=max(len(engines), 1), thread_name_prefix="mnt-portfolio"
+    )
+    try:
+        futures = {executor.submit(run, engine, stop): engine for engine in engines}
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=0.05, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    value, error = future.result(), None
+                except Exception as e:  # noqa: BLE001
+                    value, error = None, str(e)
+                if on_result is not None:
+                    on_result(futures[future], value, error, time.monotonic() - start)
+            if cancel_event is not None and cancel_event.is_set():
+                stop.set()
+    finally:
+        stop.set()
+        executor.shutdown(wait=True)
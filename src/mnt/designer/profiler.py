@@ -0,0 +1,174 @@
+"""Opt-in profiling of single requests on development instances.
+
+Pyfiction's functions are native code that Python profilers cannot see. The
+profiler therefore follows the call stack of the request thread itself and
+adds the pyfiction call that is running (see ``metrics.current_call``) as a
+leaf frame, so that time spent in pyfiction is separated from the Python
+code around it. Profiles are written in the collapsed stack format read by
+flamegraph.pl and speedscope.
+"""
+
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from pathlib import Path
+
+from flask import g, request
+
+from mnt.designer.metrics import current_call
+
+# Categories of self time: pyfiction calls, the Flask app module, the rest of
+# the designer package, and any other Python code (Flask, standard library)
+CATEGORIES = ("pyfiction", "app", "designer", "python")
+
+
+class StackProfiler:
+    """Deterministic profiler that records the time spent in every call stack.
+
+    It only observes the thread that started it.
+    """
+
+    def __init__(self):
+        self.totals = defaultdict(float)
+        self.labels = {}
+        self.categories = {}
+        self.stack = ()
+        self.last = None
+
+    def start(self):
+        self.stack = self._stack(sys._getframe(1))
+        self.last = time.perf_counter()
+        sys.setprofile(self._event)
+
+    def stop(self):
+        sys.setprofile(None)
+        self.totals[self.stack] += time.perf_counter() - self.last
+
+    def folded(self):
+        # One line per stack with its time in microseconds
+        lines = []
+        for stack, seconds in self.totals.items():
+            microseconds = round(seconds * 1e6)
+            if stack and microseconds:
+                lines.append(f"{';'.join(stack)} {microseconds}")
+        return "\n".join(lines) + "\n"
+
+    def breakdown(self):
+        # Self time in seconds by category
+        times = dict.fromkeys(CATEGORIES, 0.0)
+        for stack, seconds in self.totals.items():
+            if stack:
+                times[self.categories[stack[-1]]] += seconds
+        return times
+
+    def _event(self, frame, event, _arg):
+        self.totals[self.stack] += time.perf_counter() - self.last
+        self.stack = self._stack(frame.f_back if event == "return" else frame)
+        # The profiler's own overhead is not attributed to any stack
+        self.last = time.perf_counter()
+
+    def _stack(self, frame):
+        labels = []
+        while frame is not None:
+            labels.append(self._label(frame))
+            frame = frame.f_back
+        labels.reverse()
+        call = current_call()
+        if call is not None:
+            label = f"[pyfiction] {call}"
+            self.categories[label] = "pyfiction"
+            labels.append(label)
+        return tuple(labels)
+
+    def _label(self, frame):
+        code = frame.f_code
+        label = self.labels.get(code)
+        if label is None:
+            module = frame.f_globals.get("__name__", "?")
+            label = self.labels[code] = (
+                f"{code.co_name} ({module}:{code.co_firstlineno})"
+            )
+            if module == "mnt.designer.app":
+                self.categories[label] = "app"
+            elif module.startswith("mnt.designer."):
+                self.categories[label] = "designer"
+            else:
+                self.categories[label] = "python"
+        return label
+
+
+class RequestProfiler:
+    """Profiles requests of a Flask app and writes one dump per request.
+
+    Requests are profiled if they carry the ``header`` with a value other
+    than ``0``, or all of them with ``always``. Responses of profiled requests
+    name their dump in the same header and break down their self time in a
+    ``Server-Timing`` header. Once the dumps in ``directory`` exceed
+    ``max_bytes``, the oldest ones are deleted.
+    """
+
+    def __init__(
+        self, directory, max_bytes=100 * 1024**2, always=False, header="X-MNT-Profile"
+    ):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.always = always
+        self.header = header
+        self.lock = threading.Lock()
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def init_app(self, app):
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.teardown_request(self._abort)
+
+    def dump(self, profiler, endpoint):
+        name = "{}-{}-{}.folded".format(
+            time.strftime("%Y%m%d-%H%M%S"),
+            endpoint or "unmatched",
+            uuid.uuid4().hex[:8],
+        )
+        (self.directory / name).write_text(profiler.folded(), encoding="utf-8")
+        self._enforce_retention()
+        return name
+
+    def _start(self):
+        if self.always or request.headers.get(self.header, "0") != "0":
+            g.profiler = StackProfiler()
+            g.profiler.start()
+
+    def _finish(self, response):
+        profiler = g.pop("profiler", None)
+        if profiler is None:
+            return response
+        profiler.stop()
+        response.headers[self.header] = self.dump(profiler, request.endpoint)
+        response.headers["Server-Timing"] = ", ".join(
+            f"{category};dur={seconds * 1000:.3f}"
+            for category, seconds in profiler.breakdown().items()
+        )
+        return response
+
+    def _abort(self, _exception):
+        # Requests that end without a response are not dumped
+        if g.pop("profiler", None) is not None:
+            sys.setprofile(None)
+
+    def _enforce_retention(self):
+        with self.lock:
+            dumps = []
+            for path in self.directory.glob("*.folded"):
+                if path.is_file():
+                    stat = path.stat()
+                    dumps.append((stat.st_mtime, stat.st_size, path))
+            total = sum(size for _, size, _ in dumps)
+            for _, size, path in sorted(dumps):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    path.unlink()
+                except OSError:
+                    continue
+                total -= size
@@ -0,0 +1,41 @@
+from collections import deque
+
+
+class RevisionLog:
+    """Monotonically increasing layout revision with a bounded edit history.
+
+    Every edit records the tiles it touched under a new revision. Changes that
+    cannot be described tile by tile (e.g., resizing or replacing the whole
+    layout) reset the history, as does trimming it to ``max_history`` entries;
+    clients older than ``base`` then need a full snapshot.
+    """
+
+    def __init__(self, max_history=256, revision=0):
+        self.revision = revision
+        self.base = revision
+        self.history = deque()
+        self.max_history = max_history
+
+    def record(self, tiles):
+        self.revision += 1
+        self.history.append((self.revision, frozenset(tiles)))
+        while len(self.history) > self.max_history:
+            self.base, _ = self.history.popleft()
+        return self.revision
+
+    def reset(self):
+        self.revision += 1
+        self.history.clear()
+        self.base = self.revision
+        return self.revision
+
+    def changes_since(self, revision):
+        # None signals that the history does not reach back far enough
+        if revision < self.base or revision > self.revision:
+            return None
+        tiles = set()
+        for entry_revision, entry_tiles in reversed(self.history):
+            if entry_revision <= revision:
+                break
+            tiles.update(entry_tiles)
+        return tiles
@@ -0,0 +1,1038 @@
+"""Designer operations on pyfiction networks and layouts.
+
+Everything the Flask routes do beyond handling requests and sessions lives
+here, so that it can be scripted and benchmarked without a web server.
+"""
+
+import json
+import logging
+import sys
+
+from mnt.pyfiction import a_star, route_path
+
+from mnt.designer.caches import (
+    LRUCache,
+    ResultCache,
+    content_hash,
+    verilog_hash,
+)
+from mnt.designer.drc import count_violations, dead_nodes, design_rule_violations
+from mnt.designer.metrics import pyfiction_call
+from mnt.designer.sweep import GOLD_DEFAULTS, gold_configuration
+from mnt.designer.workers import (
+    WORKER_GRACE_PERIOD,
+    WorkerPool,
+    layout_from_fgl,
+    layout_to_dict,
+    network_from_verilog,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class DesignError(Exception):
+    """Raised when an operation cannot be applied to a network or layout."""
+
+
+# Largest networks the physical design algorithms are applied to, and the
+# reason given beyond that size
+NETWORK_LIMITS = {
+    "orthogonal": (
+        500,
+        "Network size exceeds 500 nodes and the resulting layout can not be rendered.",
+    ),
+    "gold": (150, "Network size exceeds 150 nodes."),
+    "exact": (30, "Network size exceeds 30 nodes."),
+    "portfolio": (None, None),
+}
+NETWORK_LIMITS["iosdn"] = NETWORK_LIMITS["orthogonal"]
+
+
+def check_network(network, algorithm):
+    # Raises a DesignError if the algorithm cannot be applied to the network
+    if not network:
+        msg = "Network not found. Please save or import Verilog code first."
+        raise DesignError(msg)
+
+    if network.size() < 3:
+        msg = "Network is empty."
+        raise DesignError(msg)
+
+    max_size, reason = NETWORK_LIMITS[algorithm]
+    if max_size is not None and network.size() > max_size:
+        raise DesignError(reason)
+
+    for po in network.pos():
+        for fanin in network.fanins(po):
+            if fanin in (0, 1):
+                name = network.get_output_name(network.po_index(po))
+                msg = f"Network has an unconnected PO: {name}."
+                raise DesignError(msg)
+
+
+def gold_parameters(options):
+    # Parameters of the graph-oriented layout design, with defaults for any
+    # that are missing
+    options = {key: value for key, value in options.items() if key in GOLD_DEFAULTS}
+    try:
+        return gold_configuration(options)
+    except ValueError as e:
+        raise DesignError(str(e)) from None
+
+
+def exact_parameters(options):
+    return {
+        "upper_bound_x": int(options.get("upper_bound_x", sys.maxsize)),
+        "upper_bound_y": int(options.get("upper_bound_y", sys.maxsize)),
+        "fixed_size": bool(options.get("fixed_size", False)),
+        "num_threads": int(options.get("num_threads", 1)),
+        "crossings": bool(options.get("crossings", True)),
+        "border_io": bool(options.get("border_io", True)),
+        "straight_inverters": bool(options.get("straight_inverters", False)),
+        "desynchronize": bool(options.get("desynchronize", True)),
+        "minimize_wires": bool(options.get("minimize_wires", False)),
+        "minimize_crossings": bool(options.get("minimize_crossings", False)),
+        "timeout": int(options.get("timeout", 4294967)),
+    }
+
+
+def optimization_parameters(options):
+    params = {}
+    max_gate_relocations = options.get("max_gate_relocations")
+    if max_gate_relocations:
+        params["max_gate_relocations"] = int(max_gate_relocations)
+    params["optimize_pos_only"] = bool(options.get("optimize_pos_only"))
+    params["planar_optimization"] = bool(options.get("planar_optimization"))
+    params["timeout"] = int(options.get("timeout"))
+    return params
+
+
+def check_optimizable(layout, check_design_rules=design_rule_violations):
+    # Post-layout optimization requires a layout without errors and dead nodes;
+    # the design rules may also be checked incrementally
+    if not layout:
+        msg = "Layout not found. Please create a layout first"
+        raise DesignError(msg)
+
+    violations = check_design_rules(layout)
+    _, errors = count_violations(violations)
+    if errors != 0:
+        msg = f"Layout has {errors} errors. Fix them first before optimizing."
+        raise DesignError(msg)
+    # The nodes pyfiction killed, found without visiting every tile
+    for x, y, _ in dead_nodes(layout):
+        msg = f"Layout has a dead node: ({x}, {y}). Fix it first before optimizing."
+        raise DesignError(msg)
+
+
+# Name prefixes of the methods with which mockturtle changes a network
+NETWORK_MUTATORS = (
+    "create_",
+    "clone_",
+    "substitute",
+    "replace_",
+    "take_out",
+    "set_",
+    "incr_",
+    "decr_",
+)
+
+
+def is_read_only(network):
+    return not any(name.startswith(NETWORK_MUTATORS) for name in dir(network))
+
+
+class Designer:
+    """Parses networks and runs the physical design algorithms on them.
+
+    Algorithms run on the ``WorkerPool`` ``pool``, inline by default, and
+    take Verilog code since networks cannot be passed to worker processes.
+    Parsed networks are cached by content and shared by every session that
+    imports the same code. This is only safe as long as pyfiction offers no
+    way to change a network from Python, so networks are parsed anew for
+    each call as soon as it does. With a ``ResultCache``, results
+    are cached by input and parameters as well. Layouts passed to a worker
+    may also be given as their dictionary description, e.g., to snapshot a
+    layout that is still being edited.
+    """
+
+    def __init__(
+        self,
+        pool=None,
+        network_cache=None,
+        result_cache=None,
+        grace_period=WORKER_GRACE_PERIOD,
+    ):
+        self.pool = pool if pool is not None else WorkerPool(processes=0)
+        self.network_cache = network_cache if network_cache is not None else LRUCache()
+        self.result_cache = result_cache
+        # Additional time (in seconds) granted to a run beyond its own timeout
+        # parameter before its worker process gets killed
+        self.grace_period = grace_period
+
+    def parse_verilog(self, code):
+        key = verilog_hash(code)
+        network = self.network_cache.get(key)
+        if network is None:
+            network = network_from_verilog(code)
+            if is_read_only(network):
+                self.network_cache.put(key, network)
+        return network
+
+    def run(self, task, payload, timeout=None, cancel_event=None):
+        # Returns the resulting layout as FGL, or None if none was found
+        if self.result_cache is None:
+            return self.pool.run(task, payload, timeout, cancel_event)
+        if "verilog" in payload:
+            input_hash = verilog_hash(payload["verilog"])
+        else:
+            input_hash = content_hash(json.dumps(payload["layout"], sort_keys=True))
+        key = ResultCache.key(task, input_hash, payload.get("params"))
+        fgl = self.result_cache.get(key)
+        if fgl is None:
+            fgl = self.pool.run(task, payload, timeout, cancel_event)
+            if fgl:
+                self.result_cache.put(key, fgl)
+        return fgl
+
+    def orthogonal(self, verilog, cancel_event=None):
+        return self._layout("orthogonal", {"verilog": verilog}, cancel_event)
+
+    def gold(self, verilog, params, cancel_event=None, on_stage=None):
+        payload = {"verilog": verilog, "params": params}
+        return self._layout("gold", payload, cancel_event, on_stage)
+
+    def exact(self, verilog, params, cancel_event=None, on_stage=None):
+        payload = {"verilog": verilog, "params": params}
+        return self._layout("exact", payload, cancel_event, on_stage)
+
+    def optimize(self, layout, params, cancel_event=None):
+        payload = {"layout": self._describe(layout), "params": params}
+        return self._layout("optimization", payload, cancel_event)
+
+    def check_equivalence(self, layout, verilog):
+        payload = {"layout": self._describe(layout), "verilog": verilog}
+        result = self.pool.run("equivalence", payload)
+        return result["equivalence"], result["counter_example"]
+
+    def _layout(self, task, payload, cancel_event, on_stage=None):
+        # ``on_stage`` is told when the search ends and conversion begins
+        timeout = None
+        if "timeout" in payload.get("params", {}):
+            timeout = payload["params"]["timeout"] / 1000 + self.grace_period
+        if on_stage is not None:
+            on_stage("layout search")
+        fgl = self.run(task, payload, timeout, cancel_event)
+        if not fgl:
+            msg = "No layout found with the specified parameters."
+            raise DesignError(msg)
+        if on_stage is not None:
+            on_stage("conversion")
+        return layout_from_fgl(fgl)
+
+    @staticmethod
+    def _describe(layout):
+        return layout if isinstance(layout, dict) else layout_to_dict(layout)
+
+
+def placement_tiles(x, y, params):
+    # Sources may have turned into fanouts
+    tiles = [(x, y)]
+    for source in (params or {}).values():
+        tiles.append((int(source["position"]["x"]), int(source["position"]["y"])))
+    return tiles
+
+
+def place_gate_function(layout, x, y, gate_type, params):  # noqa: PLR0911, PLR0912, PLR0915
+    try:
+        update_first = False
+        update_second = False
+
+        node = layout.get_node((x, y))
+        if node != 0:
+            return {"success": False, "error": "Tile already has a gate."}
+
+        if gate_type in ["bufc", "bufk"] and layout.z() == 0:
+            layout.resize((layout.x(), layout.y(), 1))
+
+        # Enforce incoming signal constraints
+        if gate_type == "pi":
+            if params:
+                return {"success": False, "error": "PI gate cannot have inputs."}
+            layout.create_pi("", (x, y))
+        elif gate_type in ["buf", "inv", "po"]:
+            if "first" not in params or "second" in params:
+                return {
+                    "success": False,
+                    "error": f"{gate_type.upper()} gate requires exactly one input.",
+                }
+            source_x = int(params["first"]["position"]["x"])
+            source_y = int(params["first"]["position"]["y"])
+            source_z = 0
+            source_gate_type = params["first"]["gate_type"]
+
+            if source_gate_type == "bufc":
+                if source_x < x:
+                    if layout.has_southern_outgoing_signal((source_x, source_y, 0)):
+                        source_z = 1
+                    elif layout.has_southern_outgoing_signal((source_x, source_y, 1)):
+                        source_z = 0
+                    elif layout.has_northern_incoming_signal((source_x, source_y, 0)):
+                        source_z = 1
+                    elif layout.has_northern_incoming_signal((source_x, source_y, 1)):
+                        source_z = 0
+                    else:
+                        return {"success": False, "error": "Something went wrong."}
+                elif source_y < y:
+                    if layout.has_eastern_outgoing_signal((source_x, source_y, 0)):
+                        source_z = 1
+                    elif layout.has_eastern_outgoing_signal(
+                        (source_x, source_y, 1)
+                    ) or layout.has_northern_incoming_signal((source_x, source_y, 0)):
+                        source_z = 0
+                    elif layout.has_northern_incoming_signal((source_x, source_y, 1)):
+                        source_z = 1
+                    else:
+                        return {"success": False, "error": "Something went wrong."}
+                else:
+                    return {"success": False, "error": "Something went wrong."}
+
+            if source_gate_type == "bufk":
+                if source_x < x:
+                    if layout.has_southern_outgoing_signal((source_x, source_y, 0)):
+                        source_z = 1
+                    elif layout.has_southern_outgoing_signal(
+                        (source_x, source_y, 1)
+                    ) or layout.has_northern_incoming_signal((source_x, source_y, 0)):
+                        source_z = 0
+                    elif layout.has_northern_incoming_signal((source_x, source_y, 1)):
+                        source_z = 1
+                    else:
+                        return {"success": False, "error": "Something went wrong."}
+                elif source_y < y:
+                    if layout.has_eastern_outgoing_signal((source_x, source_y, 0)):
+                        source_z = 1
+                    elif layout.has_eastern_outgoing_signal((source_x, source_y, 1)):
+                        source_z = 0
+                    elif layout.has_northern_incoming_signal((source_x, source_y, 0)):
+                        source_z = 1
+                    elif layout.has_northern_incoming_signal((source_x, source_y, 1)):
+                        source_z = 0
+                    else:
+                        return {"success": False, "error": "Something went wrong."}
+                else:
+                    return {"success": False, "error": "Something went wrong."}
+
+            source_node = layout.get_node((source_x, source_y, source_z))
+            if not source_node:
+                return {"success": False, "error": "Source gate not found."}
+
+            # Check if the gate already has inputs
+            existing_fanins = layout.fanins((x, y))
+            if existing_fanins:
+                return {
+                    "success": False,
+                    "error": f"Gate at ({x}, {y}) cannot have more than 1 input.",
+                }
+
+            # Determine allowed number of fanouts
+            existing_fanouts = layout.fanouts((source_x, source_y, source_z))
+            num_fanouts = len(existing_fanouts)
+
+            if layout.is_po(source_node):
+                max_fanouts = 0
+            elif layout.is_wire(source_node) and source_z != 1:
+                max_fanouts = 2
+            else:
+                max_fanouts = 1
+
+            if num_fanouts >= max_fanouts:
+                return {
+                    "success": False,
+                    "error": f"Gate at ({source_x}, {source_y}, {source_z}) cannot have more than {max_fanouts} outgoing connections.",
+                }
+
+            if gate_type == "po":
+                layout.create_po(layout.make_signal(source_node), "", (x, y))
+            elif gate_type == "inv":
+                layout.create_not(layout.make_signal(source_node), (x, y))
+            elif gate_type == "buf":
+                layout.create_buf(layout.make_signal(source_node), (x, y))
+            if layout.fanout_size(source_node) == 2:
+                update_first = True
+        elif gate_type in ["and", "or", "nor", "xor", "xnor", "bufc", "bufk"]:
+            if "first" not in params or "second" not in params:
+                return {
+                    "success": False,
+                    "error": f"{gate_type.upper()} gate requires exactly two inputs.",
+                }
+            first_x = int(params["first"]["position"]["x"])
+            first_y = int(params["first"]["position"]["y"])
+            first_z = 0
+            first_source_gate_type = params["first"]["gate_type"]
+            if first_source_gate_type == "bufc":
+                if first_x < x:
+                    if layout.has_southern_outgoing_signal((first_x, first_y, 0)):
+                        first_z = 1
+                    elif layout.has_southern_outgoing_signal((first_x, first_y, 1)):
+                        first_z = 0
+                    elif layout.has_northern_incoming_signal((first_x, first_y, 0)):
+                        first_z = 1
+                    elif layout.has_northern_incoming_signal((first_x, first_y, 1)):
+                        first_z = 0
+                    else:
+                        return {"success": False, "error": "Something went wrong."}
+                elif first_y < y:
+                    if layout.has_eastern_outgoing_signal((first_x, first_y, 0)):
+                        first_z = 1
+                    elif layout.has_eastern_outgoing_signal(
+                        (first_x, first_y, 1)
+                    ) or layout.has_northern_incoming_signal((first_x, first_y, 0)):
+                        first_z = 0
+                    elif layout.has_northern_incoming_signal((first_x, first_y, 1)):
+                        first_z = 1
+                    else:
+                        return {"success": False, "error": "Something went wrong."}
+                else:
+                    return {"success": False, "error": "Something went wrong."}
+
+            if first_source_gate_type == "bufk":
+                if first_x < x:
+                    if layout.has_southern_outgoing_signal((first_x, first_y, 0)):
+                        first_z = 1
+                    elif layout.has_southern_outgoing_signal(
+                        (first_x, first_y, 1)
+                    ) or layout.has_northern_incoming_signal((first_x, first_y, 0)):
+                        first_z = 0
+                    elif layout.has_northern_incoming_signal((first_x, first_y, 1)):
+                        first_z = 1
+                    else:
+                        return {"success": False, "error": "Something went wrong."}
+                elif first_y < y:
+                    if layout.has_eastern_outgoing_signal((first_x, first_y, 0)):
+                        first_z = 1
+                    elif layout.has_eastern_outgoing_signal((first_x, first_y, 1)):
+                        first_z = 0
+                    elif layout.has_northern_incoming_signal((first_x, first_y, 0)):
+                        first_z = 1
+                    elif layout.has_northern_incoming_signal((first_x, first_y, 1)):
+                        first_z = 0
+                    else:
+                        return {"success": False, "error": "Something went wrong."}
+                else:
+                    return {"success": False, "error": "Something went wrong."}
+            second_x = int(params["second"]["position"]["x"])
+            second_y = int(params["second"]["position"]["y"])
+            second_z = 0
+            second_source_gate_type = params["second"]["gate_type"]
+            if second_source_gate_type == "bufc":
+                if second_x < x:
+                    if layout.has_southern_outgoing_signal((second_x, second_y, 0)):
+                        second_z = 1
+                    elif layout.has_southern_outgoing_signal((second_x, second_y, 1)):
+                        second_z = 0
+                    elif layout.has_northern_incoming_signal((second_x, second_y, 0)):
+                        second_z = 1
+                    elif layout.has_northern_incoming_signal((second_x, second_y, 1)):
+                        second_z = 0
+                    else:
+                        return {"success": False, "error": "Something went wrong."}
+                elif second_y < y:
+                    if layout.has_eastern_outgoing_signal((second_x, second_y, 0)):
+                        second_z = 1
+                    elif layout.has_eastern_outgoing_signal(
+                        (second_x, second_y, 1)
+                    ) or layout.has_northern_incoming_signal((second_x, second_y, 0)):
+                        second_z = 0
+                    elif layout.has_northern_incoming_signal((second_x, second_y, 1)):
+                        second_z = 1
+                    else:
+                        return {"success": False, "error": "Something went wrong."}
+                else:
+                    return {"success": False, "error": "Something went wrong."}
+
+            if first_source_gate_type == "bufk":
+                if second_x < x:
+                    if layout.has_southern_outgoing_signal((second_x, second_y, 0)):
+                        second_z = 1
+                    elif layout.has_southern_outgoing_signal(
+                        (second_x, second_y, 1)
+                    ) or layout.has_northern_incoming_signal((second_x, second_y, 0)):
+                        second_z = 0
+                    elif layout.has_northern_incoming_signal((second_x, second_y, 1)):
+                        second_z = 1
+                    else:
+                        return {"success": False, "error": "Something went wrong."}
+                elif second_y < y:
+                    if layout.has_eastern_outgoing_signal((second_x, second_y, 0)):
+                        second_z = 1
+                    elif layout.has_eastern_outgoing_signal((second_x, second_y, 1)):
+                        second_z = 0
+                    elif layout.has_northern_incoming_signal((second_x, second_y, 0)):
+                        second_z = 1
+                    elif layout.has_northern_incoming_signal((second_x, second_y, 1)):
+                        second_z = 0
+                    else:
+                        return {"success": False, "error": "Something went wrong."}
+                else:
+                    return {"success": False, "error": "Something went wrong."}
+            first_node = layout.get_node((first_x, first_y, first_z))
+            second_node = layout.get_node((second_x, second_y, second_z))
+            if not first_node or not second_node:
+                return {
+                    "success": False,
+                    "error": "One or both source gates not found.",
+                }
+
+            # Check if the gate already has inputs
+            existing_fanins = layout.fanins((x, y))
+            if len(existing_fanins) >= 2:
+                return {
+                    "success": False,
+                    "error": f"Gate at ({x}, {y}) cannot have more than 2 inputs.",
+                }
+
+            for existing_fanin in existing_fanins:
+                # Determine allowed number of fanouts
+                existing_fanouts = layout.fanouts(existing_fanin)
+                num_fanouts = len(existing_fanouts)
+
+                if layout.is_po(existing_fanin):
+                    max_fanouts = 0
+                elif layout.is_wire(existing_fanin) and existing_fanin.z != 1:
+                    max_fanouts = 2
+                else:
+                    max_fanouts = 1
+
+                if num_fanouts >= max_fanouts:
+                    return {
+                        "success": False,
+                        "error": f"Gate at {existing_fanin} cannot have more than {max_fanouts} outgoing connections.",
+                    }
+
+            # Determine allowed number of fanouts
+            existing_fanouts_first_node = layout.fanouts((first_x, first_y, first_z))
+            num_fanouts_first_node = len(existing_fanouts_first_node)
+
+            if layout.is_po(first_node):
+                max_fanouts_first_node = 0
+            elif layout.is_wire(first_node) and first_z != 1:
+                max_fanouts_first_node = 2
+            else:
+                max_fanouts_first_node = 1
+
+            if num_fanouts_first_node >= max_fanouts_first_node:
+                return {
+                    "success": False,
+                    "error": f"Gate at ({first_x}, {first_y}, {first_z}) cannot have more than {max_fanouts_first_node} outgoing connections.",
+                }
+
+                # Determine allowed number of fanouts
+            existing_fanouts_second_node = layout.fanouts(
+                (second_x, second_y, second_z)
+            )
+            num_fanouts_second_node = len(existing_fanouts_second_node)
+
+            if layout.is_po(second_node):
+                max_fanouts_second_node = 0
+            elif layout.is_wire(second_node) and second_z != 1:
+                max_fanouts_second_node = 2
+            else:
+                max_fanouts_second_node = 1
+
+            if num_fanouts_second_node >= max_fanouts_second_node:
+                return {
+                    "success": False,
+                    "error": f"Gate at ({second_x}, {second_y}, {second_z}) cannot have more than {max_fanouts_second_node} outgoing connections.",
+                }
+
+            if gate_type == "and":
+                layout.create_and(
+                    layout.make_signal(first_node),
+                    layout.make_signal(second_node),
+                    (x, y),
+                )
+            elif gate_type == "or":
+                layout.create_or(
+                    layout.make_signal(first_node),
+                    layout.make_signal(second_node),
+                    (x, y),
+                )
+            elif gate_type == "nor":
+                layout.create_nor(
+                    layout.make_signal(first_node),
+                    layout.make_signal(second_node),
+                    (x, y),
+                )
+            elif gate_type == "xor":
+                layout.create_xor(
+                    layout.make_signal(first_node),
+                    layout.make_signal(second_node),
+                    (x, y),
+                )
+            elif gate_type == "xnor":
+                layout.create_xnor(
+                    layout.make_signal(first_node),
+                    layout.make_signal(second_node),
+                    (x, y),
+                )
+            elif gate_type in ["bufc", "bufk"]:
+                layout.create_buf(layout.make_signal(first_node), (x, y, 0))
+                layout.create_buf(layout.make_signal(second_node), (x, y, 1))
+                layout.obstruct_coordinate((x, y, 1))
+            if layout.fanout_size(first_node) == 2:
+                update_first = True
+            if layout.fanout_size(second_node) == 2:
+                update_second = True
+        else:
+            return {"success": False, "error": f"Unsupported gate type: {gate_type}"}
+
+        layout.obstruct_coordinate((x, y, 0))
+
+        return {
+            "success": True,
+            "updateFirstBufToFanout": update_first,
+            "updateSecondBufToFanout": update_second,
+        }
+    except Exception as e:
+        logger.exception("Error in place_gate")
+        return {"success": False, "error": str(e)}
+
+
+def connect_gates_function(  # noqa: PLR0911, PLR0912, PLR0915
+    layout,
+    source_x,
+    source_y,
+    source_gate_type,
+    target_x,
+    target_y,
+    target_gate_type,
+    find_path,
+):
+    try:
+        source_z = 0
+        target_z = 0
+
+        if source_gate_type == "bufc":
+            if find_path:
+                return {
+                    "success": False,
+                    "error": "Source gate is a crossing and the outgoing direction cannot be specified, create a connected buffer first.",
+                }
+            if source_x < target_x:
+                if layout.has_southern_outgoing_signal((source_x, source_y, 0)):
+                    source_z = 1
+                elif layout.has_southern_outgoing_signal((source_x, source_y, 1)):
+                    source_z = 0
+                elif layout.has_northern_incoming_signal((source_x, source_y, 0)):
+                    source_z = 1
+                elif layout.has_northern_incoming_signal((source_x, source_y, 1)):
+                    source_z = 0
+                else:
+                    source_z = 0
+            elif source_y < target_y:
+                if layout.has_eastern_outgoing_signal((source_x, source_y, 0)):
+                    source_z = 1
+                elif layout.has_eastern_outgoing_signal(
+                    (source_x, source_y, 1)
+                ) or layout.has_northern_incoming_signal((source_x, source_y, 0)):
+                    source_z = 0
+                elif layout.has_northern_incoming_signal((source_x, source_y, 1)):
+                    source_z = 1
+                else:
+                    source_z = 0
+            else:
+                return {"success": False, "error": "Something went wrong."}
+
+        if source_gate_type == "bufk":
+            if find_path:
+                return {
+                    "success": False,
+                    "error": "Source gate is a crossing and the outgoing direction cannot be specified, create a connected buffer first.",
+                }
+            if source_x < target_x:
+                if layout.has_southern_outgoing_signal((source_x, source_y, 0)):
+                    source_z = 1
+                elif layout.has_southern_outgoing_signal(
+                    (source_x, source_y, 1)
+                ) or layout.has_northern_incoming_signal((source_x, source_y, 0)):
+                    source_z = 0
+                elif layout.has_northern_incoming_signal((source_x, source_y, 1)):
+                    source_z = 1
+                else:
+                    source_z = 0
+            elif source_y < target_y:
+                if layout.has_eastern_outgoing_signal((source_x, source_y, 0)):
+                    source_z = 1
+                elif layout.has_eastern_outgoing_signal((source_x, source_y, 1)):
+                    source_z = 0
+                elif layout.has_northern_incoming_signal((source_x, source_y, 0)):
+                    source_z = 1
+                elif layout.has_northern_incoming_signal((source_x, source_y, 1)):
+                    source_z = 0
+                else:
+                    source_z = 0
+            else:
+                return {"success": False, "error": "Something went wrong."}
+
+        if target_gate_type == "bufc":
+            if find_path:
+                return {
+                    "success": False,
+                    "error": "Target gate is a crossing and the incoming direction cannot be specified, create a connected buffer first.",
+                }
+            if source_x < target_x:
+                if layout.has_southern_outgoing_signal((target_x, target_y, 0)):
+                    target_z = 1
+                elif layout.has_southern_outgoing_signal((target_x, target_y, 1)):
+                    target_z = 0
+                elif layout.has_northern_incoming_signal((target_x, target_y, 0)):
+                    target_z = 1
+                elif layout.has_northern_incoming_signal((target_x, target_y, 1)):
+                    target_z = 0
+                else:
+                    target_z = 0
+            elif source_y < target_y:
+                if layout.has_eastern_outgoing_signal((target_x, target_y, 0)):
+                    target_z = 1
+                elif layout.has_eastern_outgoing_signal((target_x, target_y, 1)):
+                    target_z = 0
+                elif layout.has_western_incoming_signal((target_x, target_y, 0)):
+                    target_z = 1
+                elif layout.has_western_incoming_signal((target_x, target_y, 1)):
+                    target_z = 0
+                else:
+                    target_z = 0
+            else:
+                return {"success": False, "error": "Something went wrong."}
+
+        if target_gate_type == "bufk":
+            if find_path:
+                return {
+                    "success": False,
+                    "error": "Target gate is a crossing and the incoming direction cannot be specified, create a connected buffer first.",
+                }
+            if source_x < target_x:
+                if layout.has_southern_outgoing_signal((target_x, target_y, 0)):
+                    target_z = 0
+                elif layout.has_southern_outgoing_signal(
+                    (target_x, target_y, 1)
+                ) or layout.has_northern_incoming_signal((target_x, target_y, 0)):
+                    target_z = 1
+                elif layout.has_northern_incoming_signal((target_x, target_y, 1)):
+                    target_z = 0
+                else:
+                    target_z = 0
+            elif source_y < target_y:
+                if layout.has_eastern_outgoing_signal((target_x, target_y, 0)):
+                    target_z = 0
+                elif layout.has_eastern_outgoing_signal(
+                    (target_x, target_y, 1)
+                ) or layout.has_western_incoming_signal((target_x, target_y, 0)):
+                    target_z = 1
+                elif layout.has_western_incoming_signal((target_x, target_y, 1)):
+                    target_z = 0
+                else:
+                    target_z = 0
+            else:
+                return {"success": False, "error": "Something went wrong."}
+
+        source_node = layout.get_node((source_x, source_y, source_z))
+        target_node = layout.get_node((target_x, target_y, target_z))
+
+        if not source_node:
+            return {"success": False, "error": "Source gate not found."}
+        if not target_node:
+            return {"success": False, "error": "Target gate not found."}
+
+        # Determine allowed number of fanouts
+        existing_fanouts = layout.fanouts((source_x, source_y, source_z))
+        num_fanouts = len(existing_fanouts)
+
+        if layout.is_po(source_node):
+            max_fanouts = 0
+        elif layout.is_wire(source_node) and source_z != 1:
+            max_fanouts = 2
+        else:
+            max_fanouts = 1
+
+        if num_fanouts >= max_fanouts:
+            return {
+                "success": False,
+                "error": f"Gate at ({source_x}, {source_y}, {source_z}) cannot have more than {max_fanouts} outgoing connections.",
+            }
+
+        # Determine allowed number of fanins
+        existing_fanins = layout.fanins((target_x, target_y, target_z))
+        num_fanins = len(existing_fanins)
+
+        if layout.is_pi(target_node):
+            max_fanins = 0
+        elif layout.is_wire(target_node) or layout.is_inv(target_node):
+            max_fanins = 1
+        else:
+            max_fanins = 2
+
+        if num_fanins >= max_fanins:
+            return {
+                "success": False,
+                "error": f"Gate at ({target_x}, {target_y}, {target_z}) cannot have more than {max_fanins} incoming connections.",
+            }
+
+        if (source_x, source_y, source_z) in existing_fanins:
+            return {
+                "success": False,
+                "error": f"Gate at ({target_x}, {target_y}, {target_z}) is already connected to ({source_x}, {source_y}, {source_z}.",
+            }
+        if not find_path:
+            existing_fanins.append((source_x, source_y, source_z))
+
+        incoming_signals = []
+        for fanin in existing_fanins:
+            incoming_signals.append(layout.make_signal(layout.get_node(fanin)))
+
+        if find_path:
+            with pyfiction_call("a_star"):
+                path = a_star(
+                    layout,
+                    (source_x, source_y, source_z),
+                    (target_x, target_y, target_z),
+                )
+
+            if not path:
+                return {
+                    "success": False,
+                    "error": "No (crossing-free) path found between the selected gates.",
+                }
+        else:
+            path = [(source_x, source_y, source_z), (target_x, target_y, target_z)]
+
+        if find_path:
+            with pyfiction_call("route_path"):
+                route_path(layout, path)
+        else:
+            layout.move_node(
+                target_node, (target_x, target_y, target_z), incoming_signals
+            )
+
+        update = layout.fanout_size(source_node) == 2
+
+        if find_path:
+            for coord in path:
+                layout.obstruct_coordinate(coord)
+            path = [(coord.x, coord.y) for coord in path]
+        else:
+            path = [(source_x, source_y), (target_x, target_y)]
+
+        return {"success": True, "updateBufToFanout": update, "path": path}
+    except Exception as e:
+        logger.exception("Error in connect_gates")
+        return {"success": False, "error": str(e)}
+
+
+def delete_gate_function(layout, x, y):
+    # Connected gates change along with the deleted one
+    tiles = adjacent_tiles(layout, x, y)
+
+    if not layout.is_empty_tile((x, y, 1)) and layout.get_node((x, y, 1)):
+        remove_node(layout, (x, y, 1))
+    # Remove the gate from the layout
+    if not layout.get_node((x, y)):
+        return {
+            "success": False,
+            "error": "Gate not found at the specified position.",
+            # Only the crossing layer may have been occupied
+            "tiles": sorted(tiles) if len(tiles) > 1 else [],
+        }
+    remove_node(layout, (x, y))
+    return {"success": True, "tiles": sorted(tiles)}
+
+
+def move_gate_function(
+    layout, source_x, source_y, source_gate_type, target_x, target_y
+):
+    crossing = source_gate_type in ("bufc", "bufk")
+    source = (source_x, source_y, 1 if crossing else 0)
+    target = (target_x, target_y, 0)
+    if not layout.get_node(source):
+        return {"success": False, "error": "Source gate not found."}
+
+    # The moved gate loses its connections to all adjacent gates
+    tiles = adjacent_tiles(layout, source_x, source_y)
+    tiles.add((target_x, target_y))
+
+    relocate_node(layout, source, target)
+    if crossing:
+        # The wire below the crossing moves up onto the crossing layer
+        source = (source_x, source_y, 0)
+        if not layout.get_node(source):
+            return {"success": False, "error": "Source gate not found."}
+        relocate_node(layout, source, (target_x, target_y, 1), clear=True)
+
+    return {
+        "success": True,
+        "updateGateType": source_gate_type == "fanout",
+        "tiles": sorted(tiles),
+    }
+
+
+def adjacent_tiles(layout, x, y):
+    # The tile itself and all tiles connected to either of its layers
+    tiles = {(x, y)}
+    for z in (0, 1):
+        if not layout.is_empty_tile((x, y, z)):
+            tiles.update((t.x, t.y) for t in layout.fanins((x, y, z)))
+            tiles.update((t.x, t.y) for t in layout.fanouts((x, y, z)))
+    return tiles
+
+
+def remove_node(layout, tile):
+    # Find all gates that use this node as an input signal
+    outgoing_tiles = layout.fanouts(tile)
+    layout.clear_tile(tile)
+    layout.clear_obstructed_coordinate(tile)
+    disconnect(layout, outgoing_tiles, tile)
+
+
+def relocate_node(layout, source, target, clear=False):
+    # Find all gates that use this node as an input signal
+    outgoing_tiles = layout.fanouts(source)
+    layout.move_node(layout.get_node(source), target, [])
+    if clear:
+        layout.clear_tile(source)
+    layout.clear_obstructed_coordinate(source)
+    layout.obstruct_coordinate(target)
+    disconnect(layout, outgoing_tiles, source)
+
+
+def disconnect(layout, outgoing_tiles, tile):
+    # Update signals for dependent nodes, keeping their other inputs, if any
+    for outgoing_tile in outgoing_tiles:
+        incoming_tiles = layout.fanins(outgoing_tile)
+        incoming_signals = [
+            layout.make_signal(layout.get_node(inp))
+            for inp in incoming_tiles
+            if inp != tile
+        ]
+        layout.move_node(
+            layout.get_node(outgoing_tile), outgoing_tile, incoming_signals
+        )
+
+
+def get_layout_information(layout):
+    layout_dimensions = {"x": layout.x() + 1, "y": layout.y() + 1}
+    gates = []
+
+    for x, y in occupied_tiles(layout):
+        gates.append(get_gate_information(layout, x, y))
+    return layout_dimensions, gates
+
+
+def occupied_tiles(layout):
+    # Walk the placed nodes instead of scanning every tile of the layout.
+    # Materializing a node's coordinate costs about as much as probing ten
+    # empty tiles, so densely populated layouts are still scanned
+    num_nodes = layout.num_gates() + layout.num_wires()
+    if num_nodes * 10 >= (layout.x() + 1) * (layout.y() + 1):
+        return occupied_tiles_scan(layout)
+
+    # gates() covers everything but PIs and includes the crossing layer; pis()
+    # still lists the tiles of PIs that were cleared from the layout
+    tiles = {(tile.x, tile.y, tile.z) for tile in layout.pis()}
+    tiles.update((tile.x, tile.y, tile.z) for tile in layout.gates())
+    tiles = [tile for tile in tiles if layout.get_node(tile)]
+    if len(tiles) < num_nodes:
+        # Killed nodes remain on their tiles but are listed by neither
+        return occupied_tiles_scan(layout)
+    return sorted((x, y) for x, y, z in tiles if z == 0)
+
+
+def occupied_tiles_scan(layout):
+    return [
+        (x, y)
+        for x in range(layout.x() + 1)
+        for y in range(layout.y() + 1)
+        if layout.get_node((x, y))
+    ]
+
+
+# Layout predicates of the logic gates the frontend knows
+LOGIC_GATE_TYPES = (
+    ("inv", "is_inv"),
+    ("and", "is_and"),
+    ("nand", "is_nand"),
+    ("or", "is_or"),
+    ("nor", "is_nor"),
+    ("xor", "is_xor"),
+    ("xnor", "is_xnor"),
+)
+
+
+def signal_name(layout, node):
+    # I/O names are optional
+    try:
+        return layout.get_name(layout.make_signal(node))
+    except (IndexError, RuntimeError):
+        return ""
+
+
+def wire_type(layout, node):
+    # Wires are buffers, fanouts or the lower half of a crossing
+    gate_type = "buf"
+    above_gate = layout.above(layout.get_tile(node))
+    if not layout.is_empty_tile(above_gate) and layout.z() == 1:
+        if (
+            layout.fanins(above_gate)[0].x == layout.west(layout.get_tile(node)).x
+            and layout.fanouts(above_gate)[0].x == layout.east(layout.get_tile(node)).x
+        ) or (
+            layout.fanins(above_gate)[0].x == layout.north(layout.get_tile(node)).x
+            and layout.fanouts(above_gate)[0].x == layout.south(layout.get_tile(node)).x
+        ):
+            gate_type = "bufc"
+        else:
+            gate_type = "bufk"
+    if layout.fanout_size(node) == 2:
+        gate_type = "fanout"
+    return gate_type
+
+
+def get_gate_information(layout, x, y):
+    node = layout.get_node((x, y))
+    name = ""
+    if layout.is_pi(node):
+        gate_type = "pi"
+        name = signal_name(layout, node)
+    elif layout.is_po(node):
+        gate_type = "po"
+        name = signal_name(layout, node)
+    elif layout.is_wire(node):
+        gate_type = wire_type(layout, node)
+    else:
+        gate_type = next(
+            (
+                gate_type
+                for gate_type, predicate in LOGIC_GATE_TYPES
+                if getattr(layout, predicate)(node)
+            ),
+            None,
+        )
+        if gate_type is None:
+            msg = "Unsupported gate type"
+            raise ValueError(msg)
+
+    gate_info = {
+        "x": x,
+        "y": y,
+        "type": gate_type,
+        "connections": [],
+        "name": name,
+    }
+    # Get fanins (source nodes)
+    fanins = layout.fanins((x, y))
+    for fin in fanins:
+        gate_info["connections"].append({"sourceX": fin.x, "sourceY": fin.y})
+    if gate_type in ("bufc", "bufk"):
+        fanins = layout.fanins((x, y, 1))
+        for fin in fanins:
+            gate_info["connections"].append({"sourceX": fin.x, "sourceY": fin.y})
+    return gate_info
@@ -0,0 +1,309 @@
+import logging
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Rough per-object costs used to estimate the resident size of a session
+TILE_BYTES = 16
+NODE_BYTES = 256
+
+
+def estimate_size(values):
+    size = 0
+    layout = values.get("layout")
+    if layout is not None:
+        area = (layout.x() + 1) * (layout.y() + 1) * (layout.z() + 1)
+        size += area * TILE_BYTES
+        size += (layout.num_gates() + layout.num_wires()) * NODE_BYTES
+    network = values.get("network")
+    if network is not None:
+        size += network.size() * NODE_BYTES
+    verilog = values.get("verilog")
+    if verilog is not None:
+        size += len(verilog)
+    artifacts = values.get("artifacts")
+    if artifacts is not None:
+        size += artifacts.nbytes
+    checker = values.get("drc")
+    if checker is not None:
+        size += len(checker.tiles) * NODE_BYTES
+    return size
+
+
+class _Session:
+    __slots__ = ("last_access", "size", "values")
+
+    def __init__(self, now):
+        self.values = {}
+        self.last_access = now
+        self.size = 0
+
+
+class SessionView(MutableMapping):
+    """Dictionary-like access to a single field of all sessions in a store."""
+
+    def __init__(self, store, field):
+        self.store = store
+        self.field = field
+
+    def __getitem__(self, session_id):
+        return self.store.get(session_id, self.field)
+
+    def __setitem__(self, session_id, value):
+        self.store.set(session_id, self.field, value)
+
+    def __delitem__(self, session_id):
+        self.store.discard(session_id, self.field)
+
+    def __iter__(self):
+        return iter(self.store.sessions_with(self.field))
+
+    def __len__(self):
+        return len(self.store.sessions_with(self.field))
+
+
+class SessionStore:
+    """Bounded storage for the per-session state of the designer.
+
+    Sessions are kept in least-recently-used order. A session idle for longer
+    than ``ttl`` seconds expires, and the least recently used sessions are
+    evicted whenever there are more than ``max_sessions`` of them or their
+    estimated size exceeds ``max_bytes``. Every evicted session is handed to
+    ``on_evict(session_id, values)``, which may write it to disk;
+    ``on_miss(session_id)`` can in turn bring such a session back by
+    returning its values. If several processes share the sessions,
+    ``is_stale(session_id, values)`` tells whether a resident session was
+    changed elsewhere and must be loaded again. Both hooks run outside the
+    store lock, so that reading a session does not hold up all others;
+    requests for the same session wait for a single load instead.
+
+    With ``session_lock(session_id)`` returning the ``RWLock`` of a session,
+    only sessions whose write lock is free are evicted, and the lock is held
+    until ``on_evict`` is done, so that no request sees the session half
+    written. The hook runs after the store itself is unlocked again.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_sessions=None,
+        max_bytes=None,
+        ttl=None,
+        on_evict=None,
+        on_miss=None,
+        is_stale=None,
+        session_lock=None,
+        estimate=estimate_size,
+        clock=time.monotonic,
+    ):
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self.on_miss = on_miss
+        self.is_stale = is_stale
+        self.session_lock = session_lock
+        self.estimate = estimate
+        self.clock = clock
+        self.sessions = OrderedDict()
+        self.resident_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = {"ttl": 0, "lru": 0, "size": 0}
+        self.reloads = 0
+        self.evicted = []
+        self.loading = weakref.WeakValueDictionary()
+        self.lock = threading.RLock()
+
+    def view(self, field):
+        return SessionView(self, field)
+
+    def get(self, session_id, field):
+        self._load(session_id)
+        with self.lock:
+            entry = self._lookup(session_id)
+            if entry is None or field not in entry.values:
+                raise KeyError(session_id)
+            return entry.values[field]
+
+    def set(self, session_id, field, value):
+        self._load(session_id)
+        with self._locked():
+            entry = self._lookup(session_id, count=False)
+            if entry is None:
+                entry = self.sessions[session_id] = _Session(self.clock())
+            entry.values[field] = value
+            self._resize(entry)
+            self._enforce(keep=session_id)
+
+    def discard(self, session_id, field):
+        with self.lock:
+            entry = self.sessions.get(session_id)
+            if entry is None or field not in entry.values:
+                raise KeyError(session_id)
+            del entry.values[field]
+            self._resize(entry)
+
+    def refresh(self, session_id):
+        # Re-estimate the size of a session after its layout changed in place
+        with self._locked():
+            entry = self.sessions.get(session_id)
+            if entry is not None:
+                self._resize(entry)
+                self._enforce(keep=session_id)
+
+    def peek(self, session_id):
+        # Copy of the values of a resident session that counts as no access
+        with self.lock:
+            entry = self.sessions.get(session_id)
+            return dict(entry.values) if entry is not None else None
+
+    def sessions_with(self, field):
+        with self.lock:
+            return [
+                session_id
+                for session_id, entry in self.sessions.items()
+                if field in entry.values
+            ]
+
+    def evict(self, session_id, reason="lru"):
+        with self._locked():
+            return self._evict(session_id, reason)
+
+    def drop(self, session_id):
+        # Forget a session without handing it to the eviction hook
+        with self.lock:
+            entry = self.sessions.pop(session_id, None)
+            if entry is not None:
+                self.resident_bytes -= entry.size
+
+    def stats(self):
+        with self.lock:
+            return {
+                "sessions": len(self.sessions),
+                "resident_bytes": self.resident_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": dict(self.evictions),
+                "reloads": self.reloads,
+            }
+
+    @contextmanager
+    def _locked(self):
+        # Eviction hooks run once the store is unlocked again
+        try:
+            with self.lock:
+                yield
+        finally:
+            self._spill()
+
+    def _evict(self, session_id, reason):
+        if session_id not in self.sessions:
+            return False
+        session_lock = None
+        if self.session_lock is not None:
+            session_lock = self.session_lock(session_id)
+            # Sessions in use by a request stay in memory for now
+            if not session_lock.acquire_write(blocking=False):
+                return False
+        entry = self.sessions.pop(session_id)
+        self.resident_bytes -= entry.size
+        self.evictions[reason] = self.evictions.get(reason, 0) + 1
+        self.evicted.append((session_id, entry.values, session_lock))
+        return True
+
+    def _spill(self):
+        with self.lock:
+            evicted, self.evicted = self.evicted, []
+        for session_id, values, session_lock in evicted:
+            try:
+                if self.on_evict is not None:
+                    self.on_evict(session_id, values)
+            except Exception:
+                logger.exception("Could not spill session %s", session_id)
+            finally:
+                if session_lock is not None:
+                    session_lock.release_write()
+
+    def _load(self, session_id):
+        # Expires idle sessions, and loads the session if it is missing or
+        # stale. The hooks may read from disk or a database, so they only
+        # hold the loading lock of the session, and the store is locked again
+        # to insert the values if no other request changed the session since
+        with self._locked():
+            self._expire()
+            if self.on_miss is None and self.is_stale is None:
+                return
+            loading = self.loading.get(session_id)
+            if loading is None:
+                loading = self.loading[session_id] = threading.Lock()
+
+        with loading:
+            with self.lock:
+                entry = self.sessions.get(session_id)
+            if entry is None:
+                stale = False
+            elif self.is_stale is None:
+                return
+            else:
+                stale = self.is_stale(session_id, entry.values)
+                if not stale:
+                    return
+            values = None
+            if self.on_miss is not None:
+                values = self.on_miss(session_id)
+
+            with self._locked():
+                if self.sessions.get(session_id) is not entry:
+                    return
+                if stale:
+                    self.drop(session_id)
+                    self.reloads += 1
+                if values:
+                    entry = self.sessions[session_id] = _Session(self.clock())
+                    entry.values.update(values)
+                    self._resize(entry)
+                    self._enforce(keep=session_id)
+
+    def _lookup(self, session_id, count=True):
+        entry = self.sessions.get(session_id)
+        if count:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if entry is not None:
+            entry.last_access = self.clock()
+            self.sessions.move_to_end(session_id)
+        return entry
+
+    def _resize(self, entry):
+        size = self.estimate(entry.values)
+        self.resident_bytes += size - entry.size
+        entry.size = size
+
+    def _expire(self):
+        if self.ttl is None:
+            return
+        horizon = self.clock() - self.ttl
+        # Sessions are ordered by last access, so expired ones come first
+        for session_id, entry in list(self.sessions.items()):
+            if entry.last_access > horizon:
+                break
+            self._evict(session_id, "ttl")
+
+    def _enforce(self, keep=None):
+        for session_id in list(self.sessions):
+            if session_id == keep:
+                continue
+            if self.max_sessions is not None and len(self.sessions) > self.max_sessions:
+                self._evict(session_id, "lru")
+            elif self.max_bytes is not None and self.resident_bytes > self.max_bytes:
+                self._evict(session_id, "size")
+            else:
+                break
@@ -335,6 +335,77 @@ $(document).ready(() => {
     });
   });
 
+  // Follow a background job via server-sent events until it has finished and
+  // hand over its result; meanwhile, its stage and elapsed time are shown
+  // together with a button to stop it
+  function waitForJob(jobId, onSuccess, onFailure, description = "Running") {
+    if (!window.EventSource) {
+      pollJob(jobId, onSuccess, onFailure);
+      return;
+    }
+
+    const source = new EventSource("/job_events/" + jobId);
+    let finished = false;
+
+    source.addEventListener("progress", function (event) {
+      const job = JSON.parse(event.data);
+      const stage = job.stage || job.status;
+      updateMessageArea(
+        `${description}: ${stage} (${job.elapsed.toFixed(1)} s)`,
+        "info",
+      );
+      $("<button>")
+        .addClass("btn btn-sm btn-outline-secondary ms-3")
+        .text("Stop")
+        .on("click", function () {
+          $(this).prop("disabled", true);
+          $.post("/cancel_job/" + jobId);
+        })
+        .appendTo("#message-area");
+    });
+
+    source.addEventListener("done", function (event) {
+      finished = true;
+      source.close();
+      const data = JSON.parse(event.data);
+      if (data.success) {
+        onSuccess(data);
+      } else {
+        onFailure(data.error);
+      }
+    });
+
+    source.onerror = function () {
+      // Fall back to polling if the stream breaks off
+      source.close();
+      if (!finished) {
+        pollJob(jobId, onSuccess, onFailure);
+      }
+    };
+  }
+
+  // Poll a background job until it has finished and hand over its result
+  function pollJob(jobId, onSuccess, onFailure) {
+    $.ajax({
+      url: "/job_result/" + jobId,
+      type: "GET",
+      success: function (data) {
+        if (data.success) {
+          onSuccess(data);
+        } else if (data.status === "queued" || data.status === "running") {
+          setTimeout(function () {
+            pollJob(jobId, onSuccess, onFailure);
+          }, 500);
+        } else {
+          onFailure(data.error);
+        }
+      },
+      error: function (jqXHR, textStatus, errorThrown) {
+        onFailure(errorThrown);
+      },
+    });
+  }
+
   // Gold Button Click Event (opens modal automatically due to data-bs-toggle)
   $("#apply-gold").on("click", function () {
     // Disable the apply button to prevent multiple clicks
@@ -409,18 +480,33 @@ $(document).ready(() => {
       contentType: "application/json",
       data: JSON.stringify(requestData), // Send the parameters as JSON
       success: function (data) {
-        $("#apply-gold").prop("disabled", false);
-        if (data.success) {
-          // Update the layout with the new data after the Gold algorithm is applied
-          updateLayout(data.layoutDimensions, data.gates);
-          updateMessageArea("gold algorithm applied successfully.", "success");
-          $("#goldModal").modal("hide"); // Close the modal
-        } else {
+        if (!data.success) {
+          $("#apply-gold").prop("disabled", false);
           updateMessageArea(
             "Failed to create layout using gold: " + data.error,
             "danger",
           );
+          return;
         }
+        // The algorithm runs as a background job on the server
+        waitForJob(
+          data.job_id,
+          function (result) {
+            $("#apply-gold").prop("disabled", false);
+            // Update the layout with the new data after the Gold algorithm is applied
+            updateLayout(result.layoutDimensions, result.gates);
+            updateMessageArea("gold algorithm applied successfully.", "success");
+            $("#goldModal").modal("hide"); // Close the modal
+          },
+          function (error) {
+            $("#apply-gold").prop("disabled", false);
+            updateMessageArea(
+              "Failed to create layout using gold: " + error,
+              "danger",
+            );
+          },
+          "Applying gold",
+        );
       },
       error: function (jqXHR, textStatus, errorThrown) {
         $("#apply-gold").prop("disabled", false);
@@ -507,18 +593,36 @@ $(document).ready(() => {
       contentType: "application/json",
       data: JSON.stringify(requestData), // Send the parameters as JSON
       success: function (data) {
-        $("#apply-exact").prop("disabled", false);
-        if (data.success) {
-          // Update the layout with the new data after the exact algorithm is applied
-          updateLayout(data.layoutDimensions, data.gates);
-          updateMessageArea("Exact algorithm applied successfully.", "success");
-          $("#exactModal").modal("hide"); // Close the modal
-        } else {
+        if (!data.success) {
+          $("#apply-exact").prop("disabled", false);
           updateMessageArea(
             "Failed to create layout using exact algorithm: " + data.error,
             "danger",
           );
+          return;
         }
+        // The algorithm runs as a background job on the server
+        waitForJob(
+          data.job_id,
+          function (result) {
+            $("#apply-exact").prop("disabled", false);
+            // Update the layout with the new data after the exact algorithm is applied
+            updateLayout(result.layoutDimensions, result.gates);
+            updateMessageArea(
+              "Exact algorithm applied successfully.",
+              "success",
+            );
+            $("#exactModal").modal("hide"); // Close the modal
+          },
+          function (error) {
+            $("#apply-exact").prop("disabled", false);
+            updateMessageArea(
+              "Failed to create layout using exact algorithm: " + error,
+              "danger",
+            );
+          },
+          "Applying exact algorithm",
+        );
       },
       error: function (jqXHR, textStatus, errorThrown) {
         $("#apply-exact").prop("disabled", false);
@@ -610,18 +714,30 @@ $(document).ready(() => {
       contentType: "application/json",
       data: JSON.stringify(requestData), // Send the parameters as JSON
       success: function (data) {
-        $("#apply-optimization").prop("disabled", false).text("Optimize");
-        if (data.success) {
-          // Update the layout with the new data after the optimization algorithm is applied
-          updateLayout(data.layoutDimensions, data.gates);
-          updateMessageArea("Layout was optimized successfully.", "success");
-          $("#optimizationModal").modal("hide"); // Close the modal
-        } else {
+        if (!data.success) {
+          $("#apply-optimization").prop("disabled", false).text("Optimize");
           updateMessageArea(
             "Failed to optimize layout: " + data.error,
             "danger",
           );
+          return;
         }
+        // The optimization runs as a background job on the server
+        waitForJob(
+          data.job_id,
+          function (result) {
+            $("#apply-optimization").prop("disabled", false).text("Optimize");
+            // Update the layout with the new data after the optimization algorithm is applied
+            updateLayout(result.layoutDimensions, result.gates);
+            updateMessageArea("Layout was optimized successfully.", "success");
+            $("#optimizationModal").modal("hide"); // Close the modal
+          },
+          function (error) {
+            $("#apply-optimization").prop("disabled", false).text("Optimize");
+            updateMessageArea("Failed to optimize layout: " + error, "danger");
+          },
+          "Optimizing layout",
+        );
       },
       error: function (jqXHR, textStatus, errorThrown) {
         $("#apply-optimization").prop("disabled", false).text("Optimize");
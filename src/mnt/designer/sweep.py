@@ -0,0 +1,140 @@
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from mnt.designer.caches import LRUCache, ResultCache, verilog_hash
+from mnt.designer.workers import WORKER_GRACE_PERIOD, WorkerError
+
+GOLD_DEFAULTS = {
+    "return_first": False,
+    "mode": "HIGH_EFFICIENCY",
+    "timeout": 10000,
+    "num_vertex_expansions": 4,
+    "planar": False,
+    "cost": "AREA",
+}
+
+GOLD_CHOICES = {
+    "mode": ("HIGH_EFFICIENCY", "HIGH_EFFORT", "HIGHEST_EFFORT"),
+    "cost": ("AREA", "WIRES", "CROSSINGS", "ACP"),
+}
+
+NO_METRICS = {"area": None, "wires": None, "crossings": None}
+
+
+def gold_configuration(options):
+    # Complete a single configuration with the defaults and validate it
+    unknown = set(options) - set(GOLD_DEFAULTS)
+    if unknown:
+        msg = f"Unknown GOLD parameters: {', '.join(sorted(unknown))}."
+        raise ValueError(msg)
+    params = {**GOLD_DEFAULTS, **options}
+    for name, choices in GOLD_CHOICES.items():
+        if params[name] not in choices:
+            msg = f"Unknown {name}: {params[name]}."
+            raise ValueError(msg)
+    params["return_first"] = bool(params["return_first"])
+    params["timeout"] = int(params["timeout"])
+    params["num_vertex_expansions"] = int(params["num_vertex_expansions"])
+    params["planar"] = bool(params["planar"])
+    if params["timeout"] <= 0 or params["num_vertex_expansions"] <= 0:
+        msg = "Timeout and vertex expansions must be positive."
+        raise ValueError(msg)
+    return params
+
+
+def expand_grid(grid):
+    # Cartesian product of the values listed for each parameter
+    names = list(grid)
+    values = [v if isinstance(v, (list, tuple)) else [v] for v in grid.values()]
+    return [dict(zip(names, combination)) for combination in itertools.product(*values)]
+
+
+def gold_configurations(grid=None, configurations=None, max_runs=None):
+    options = list(configurations or [])
+    if grid:
+        options.extend(expand_grid(grid))
+    if not options:
+        msg = "No configurations given."
+        raise ValueError(msg)
+    if max_runs is not None and len(options) > max_runs:
+        msg = f"Sweep exceeds the limit of {max_runs} runs."
+        raise ValueError(msg)
+    return [gold_configuration(o) for o in options]
+
+
+def sweep_gold(
+    verilog,
+    configurations,
+    pool,
+    cache=None,
+    on_row=None,
+    cancel_event=None,
+    on_layout=None,
+):
+    """Runs GOLD with every configuration and returns one row per configuration.
+
+    Runs are spread over all processes of the ``WorkerPool`` ``pool``.
+    Identical configurations are only run once; with an ``LRUCache`` as
+    ``cache``, their outcomes are also remembered across sweeps. Rows hold
+    the parameters together with the runtime of the algorithm in seconds and
+    the area, wire count and crossings of the layout found. ``on_row(index,
+    row)`` is called as soon as a row is complete, ``on_layout(key, fgl)``
+    for every layout actually computed.
+    """
+    configurations = [gold_configuration(c) for c in configurations]
+    input_hash = verilog_hash(verilog)
+    keys = [ResultCache.key("gold", input_hash, c) for c in configurations]
+    cache = cache if cache is not None else LRUCache(len(configurations))
+    cancel_event = cancel_event or threading.Event()
+    rows = [None] * len(configurations)
+    lock = threading.Lock()
+
+    def complete(indices, outcome, cached):
+        with lock:
+            for index in indices:
+                rows[index] = {**configurations[index], **outcome, "cached": cached}
+                if on_row is not None:
+                    on_row(index, rows[index])
+
+    def run(key, indices):
+        params = configurations[indices[0]]
+        try:
+            result = pool.run(
+                "gold_sweep",
+                {"verilog": verilog, "params": params},
+                timeout=params["timeout"] / 1000 + WORKER_GRACE_PERIOD,
+                cancel_event=cancel_event,
+            )
+        except WorkerError as e:
+            outcome = {"found": False, "runtime": None, **NO_METRICS, "error": str(e)}
+            complete(indices, outcome, False)
+            return
+        metrics = result["metrics"] or NO_METRICS
+        outcome = {
+            "found": result["fgl"] is not None,
+            "runtime": round(result["runtime"], 4),
+            **metrics,
+        }
+        cache.put(key, outcome)
+        if result["fgl"] is not None and on_layout is not None:
+            on_layout(key, result["fgl"])
+        complete(indices, outcome, False)
+
+    pending = {}
+    for index, key in enumerate(keys):
+        outcome = cache.get(key)
+        if outcome is not None:
+            complete([index], outcome, True)
+        else:
+            pending.setdefault(key, []).append(index)
+
+    if pending:
+        with ThreadPoolExecutor(
+            max_workers=min(max(pool.processes, 1), len(pending)),
+            thread_name_prefix="mnt-sweep",
+        ) as executor:
+            futures = [executor.submit(run, k, i) for k, i in pending.items()]
+            for future in futures:
+                future.result()
+    return rows
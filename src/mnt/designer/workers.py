@@ -0,0 +1,640 @@
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from xml.etree import ElementTree as ET
+
+from mnt.pyfiction import (
+    apply_bestagon_library,
+    apply_qca_one_library,
+    cartesian_gate_layout,
+    cartesian_obstruction_layout,
+    eq_type,
+    equivalence_checking,
+    equivalence_checking_stats,
+    gate_level_drvs,
+    gold_cost_objective,
+    gold_effort_mode,
+    graph_oriented_layout_design,
+    graph_oriented_layout_design_params,
+    hexagonalization,
+    orthogonal,
+    post_layout_optimization,
+    post_layout_optimization_params,
+    read_cartesian_fgl_layout,
+    read_technology_network,
+    write_dot_layout,
+    write_fgl_layout,
+    write_qca_layout_svg,
+    write_qca_layout_svg_params,
+    write_sqd_layout,
+)
+
+from mnt.designer.metrics import (
+    capture_timings,
+    pyfiction_call,
+    record_timings,
+    timed,
+)
+from mnt.designer.portfolio import layout_metrics
+
+try:
+    from mnt.pyfiction import exact_cartesian, exact_params
+except ImportError:
+    exact_params = None
+    exact_cartesian = None
+
+
+# Additional time (in seconds) granted to a run beyond its own timeout
+# parameter before its worker process gets killed
+WORKER_GRACE_PERIOD = 10
+
+
+class WorkerError(Exception):
+    """Raised when a task could not be completed by a worker process."""
+
+
+class WorkerTimeout(WorkerError):
+    pass
+
+
+class WorkerCancelled(WorkerError):
+    pass
+
+
+# Serialization helpers: networks cross the process boundary as Verilog,
+# layouts as dictionaries (see below) and results as FGL text. Pyfiction
+# only reads and writes named files (and picks the parser by file
+# extension), so they go through a memory-backed tmpfs where available to
+# avoid any disk I/O.
+
+
+def scratch_directory():
+    directory = Path("/dev/shm")
+    if directory.is_dir() and os.access(directory, os.W_OK | os.X_OK):
+        return directory
+    return None
+
+
+SCRATCH_DIR = scratch_directory()
+
+
+def network_from_verilog(code):
+    with tempfile.NamedTemporaryFile(
+        delete=False, suffix=".v", dir=SCRATCH_DIR
+    ) as temp_file:
+        temp_file.write(code.encode("utf-8"))
+    try:
+        with pyfiction_call("read_technology_network"):
+            return read_technology_network(temp_file.name)
+    finally:
+        Path(temp_file.name).unlink()
+
+
+def write_to_memory(write, suffix):
+    # Runs a pyfiction writer on a uniquely named scratch file and returns
+    # what it wrote
+    with tempfile.NamedTemporaryFile(
+        delete=False, suffix=suffix, dir=SCRATCH_DIR
+    ) as temp_file:
+        pass
+    try:
+        write(temp_file.name)
+        return Path(temp_file.name).read_bytes()
+    finally:
+        Path(temp_file.name).unlink()
+
+
+def layout_to_fgl(layout):
+    return write_to_memory(lambda path: write_fgl_layout(layout, path), ".fgl").decode(
+        "utf-8"
+    )
+
+
+def layout_from_fgl(fgl, reader=read_cartesian_fgl_layout):
+    with tempfile.NamedTemporaryFile(
+        delete=False, suffix=".fgl", dir=SCRATCH_DIR
+    ) as temp_file:
+        temp_file.write(fgl.encode("utf-8"))
+    try:
+        return reader(temp_file.name)
+    finally:
+        Path(temp_file.name).unlink()
+
+
+# FGL cannot describe layouts that are still being edited, e.g., gates whose
+# inputs were deleted. Layouts that are not produced by an algorithm are
+# therefore copied and stored as plain dictionaries listing every gate.
+
+# Regular clocking schemes that come in a 3-phase and a 4-phase variant
+THREE_PHASE_VARIANTS = ("2DDWAVE", "COLUMNAR", "ROW")
+
+GATE_TYPES = (
+    ("buf", "is_wire"),
+    ("inv", "is_inv"),
+    ("and", "is_and"),
+    ("nand", "is_nand"),
+    ("or", "is_or"),
+    ("nor", "is_nor"),
+    ("xor", "is_xor"),
+    ("xnor", "is_xnor"),
+    ("maj", "is_maj"),
+    ("lt", "is_lt"),
+    ("le", "is_le"),
+    ("gt", "is_gt"),
+    ("ge", "is_ge"),
+)
+
+GATE_ARITY = {"buf": 1, "inv": 1, "maj": 3}
+
+
+def gate_type(layout, node):
+    return next(name for name, check in GATE_TYPES if getattr(layout, check)(node))
+
+
+def create_gate(layout, gate_type, tile, constant):
+    # A gate of the given type with all inputs set to the constant
+    create = getattr(
+        layout, "create_not" if gate_type == "inv" else "create_" + gate_type
+    )
+    create(*[constant] * GATE_ARITY.get(gate_type, 2), tile)
+
+
+def clocking_scheme(layout):
+    # Pyfiction's bindings cannot pass a name to is_clocking_scheme, but FGL
+    # files name the clocking scheme of the layout, if not its number of phases
+    fgl = ET.fromstring(layout_to_fgl(layout))
+    name = fgl.findtext("layout/clocking/name")
+    if name in THREE_PHASE_VARIANTS and layout.num_clocks() == 3:
+        name += "3"
+    return name
+
+
+def io_ports(layout, tiles):
+    # Pyfiction keeps PIs and POs whose tiles were cleared in its lists, marked
+    # as dead coordinates that no longer resolve to a node even if the tile
+    # was reused; otherwise, only the last entry of a tile is the current gate.
+    # Dead coordinates read as (0, 0, 0), so they must not count as entries.
+    ports = []
+    nodes = [layout.get_node(t) for t in tiles]
+    last = {(t.x, t.y, t.z): index for index, t in enumerate(tiles) if nodes[index]}
+    for index, t in enumerate(tiles):
+        tile = (t.x, t.y, t.z)
+        node = nodes[index]
+        port = {"tile": tile, "stale": not node or last[tile] != index}
+        if not port["stale"]:
+            port["name"] = layout.get_name(layout.make_signal(node))
+            port["fanins"] = [(f.x, f.y, f.z) for f in layout.fanins(tile)]
+        ports.append(port)
+    return ports
+
+
+def layout_to_dict(layout):
+    pis = io_ports(layout, layout.pis())
+    pos = io_ports(layout, layout.pos())
+    ports = {port["tile"] for port in pis + pos if not port["stale"]}
+
+    gates = []
+    for tile in sorted(
+        {(t.x, t.y, t.z) for t in layout.gates()} - ports, key=layout.get_node
+    ):
+        node = layout.get_node(tile)
+        if not node:
+            continue
+        gates.append(
+            {
+                "tile": tile,
+                "type": gate_type(layout, node),
+                "fanins": [(t.x, t.y, t.z) for t in layout.fanins(tile)],
+            }
+        )
+
+    description = {
+        "name": layout.get_layout_name(),
+        "size": (layout.x(), layout.y(), layout.z()),
+        "clocking": clocking_scheme(layout),
+        "pis": pis,
+        "pos": pos,
+        "gates": gates,
+    }
+    if description["clocking"] == "OPEN":
+        description["clock_numbers"] = [
+            (x, y, layout.get_clock_number((x, y)))
+            for x in range(layout.x() + 1)
+            for y in range(layout.y() + 1)
+        ]
+    return description
+
+
+def layout_from_dict(description):
+    layout = cartesian_obstruction_layout(
+        cartesian_gate_layout(
+            tuple(description["size"]), description["clocking"], description["name"]
+        )
+    )
+    for x, y, clock_number in description.get("clock_numbers", ()):
+        layout.assign_clock_number((x, y), clock_number)
+
+    # Gates are created with constant inputs first and connected afterwards,
+    # since their inputs may be created later or be missing altogether. Stale
+    # I/O ports are recreated on a tile that stays free and cleared right away
+    # to keep their order.
+    constant = layout.make_signal(0)
+    spare = spare_tile(description)
+    for port in description["pis"]:
+        tile = spare if port["stale"] else tuple(port["tile"])
+        if tile is None:
+            continue
+        layout.create_pi(port.get("name", ""), tile)
+        if port["stale"]:
+            layout.clear_tile(tile)
+    for port in description["pos"]:
+        tile = spare if port["stale"] else tuple(port["tile"])
+        if tile is None:
+            continue
+        layout.create_po(constant, port.get("name", ""), tile)
+        if port["stale"]:
+            layout.clear_tile(tile)
+    for gate in description["gates"]:
+        create_gate(layout, gate["type"], tuple(gate["tile"]), constant)
+
+    connected = [port for port in description["pos"] if not port["stale"]]
+    for gate in connected + description["gates"]:
+        tile = tuple(gate["tile"])
+        layout.move_node(
+            layout.get_node(tile),
+            tile,
+            [layout.make_signal(layout.get_node(tuple(t))) for t in gate["fanins"]],
+        )
+    return layout
+
+
+def spare_tile(description):
+    # A tile that no gate of the layout occupies, if there is any
+    ports = description["pis"] + description["pos"]
+    occupied = {tuple(port["tile"]) for port in ports if not port["stale"]}
+    occupied.update(tuple(gate["tile"]) for gate in description["gates"])
+    x, y, _ = description["size"]
+    return next(
+        (
+            (tile_x, tile_y, 0)
+            for tile_y in range(y + 1)
+            for tile_x in range(x + 1)
+            if (tile_x, tile_y, 0) not in occupied
+        ),
+        None,
+    )
+
+
+def copy_layout(layout, dead_tiles=()):
+    # Pyfiction layouts share their storage when wrapped, so copy explicitly;
+    # occupied tiles count as obstructed without further bookkeeping. Killed
+    # nodes cannot be recreated as such, so the given tiles of dead nodes are
+    # occupied by live nodes of the same type instead, connected as before
+    copy = layout_from_dict(layout_to_dict(layout))
+    constant = copy.make_signal(0)
+    for tile in dead_tiles:
+        node = layout.get_node(tile)
+        if layout.is_pi(node):
+            copy.create_pi("", tile)
+        elif layout.is_po(node):
+            copy.create_po(constant, "", tile)
+        else:
+            create_gate(copy, gate_type(layout, node), tile, constant)
+
+    # Only now can the connections from and to the dead nodes be restored
+    for tile in dead_tiles:
+        fanouts = [(t.x, t.y, t.z) for t in layout.fanouts(tile)]
+        for node_tile in [tile, *fanouts]:
+            copy.move_node(
+                copy.get_node(node_tile),
+                node_tile,
+                [
+                    copy.make_signal(copy.get_node((t.x, t.y, t.z)))
+                    for t in layout.fanins(node_tile)
+                ],
+            )
+    return copy
+
+
+# Parameter mapping from plain dictionaries to pyfiction parameter objects
+
+
+def gold_params(options):
+    params = graph_oriented_layout_design_params()
+    params.return_first = bool(options["return_first"])
+    params.mode = getattr(gold_effort_mode, options["mode"])
+    params.timeout = int(options["timeout"])
+    params.num_vertex_expansions = int(options["num_vertex_expansions"])
+    params.planar = bool(options["planar"])
+    params.cost = getattr(gold_cost_objective, options["cost"])
+    return params
+
+
+def exact_cartesian_params(options):
+    params = exact_params()
+    params.scheme = "2DDWave"
+    for key, value in options.items():
+        setattr(params, key, value)
+    return params
+
+
+def optimization_params(options):
+    params = post_layout_optimization_params()
+    for key, value in options.items():
+        setattr(params, key, value)
+    return params
+
+
+# Tasks executed inside the worker processes
+
+
+def _orthogonal(payload):
+    network = network_from_verilog(payload["verilog"])
+    with pyfiction_call("orthogonal"):
+        layout = orthogonal(network)
+    return layout_to_fgl(layout)
+
+
+def _gold(payload):
+    network = network_from_verilog(payload["verilog"])
+    with pyfiction_call("graph_oriented_layout_design"):
+        layout = graph_oriented_layout_design(network, gold_params(payload["params"]))
+    return layout_to_fgl(layout) if layout else None
+
+
+def _gold_sweep(payload):
+    # Single run of a parameter sweep, timed without the dispatch overhead
+    network = network_from_verilog(payload["verilog"])
+    start = time.perf_counter()
+    with pyfiction_call("graph_oriented_layout_design"):
+        layout = graph_oriented_layout_design(network, gold_params(payload["params"]))
+    runtime = time.perf_counter() - start
+    if not layout:
+        return {"fgl": None, "runtime": runtime, "metrics": None}
+    return {
+        "fgl": layout_to_fgl(layout),
+        "runtime": runtime,
+        "metrics": layout_metrics(layout),
+    }
+
+
+def _exact(payload):
+    if not exact_cartesian:
+        msg = "Pyfiction was installed without Z3 enabled."
+        raise WorkerError(msg)
+    network = network_from_verilog(payload["verilog"])
+    with pyfiction_call("exact_cartesian"):
+        layout = exact_cartesian(network, exact_cartesian_params(payload["params"]))
+    return layout_to_fgl(layout) if layout else None
+
+
+def _optimization(payload):
+    layout = layout_from_dict(payload["layout"])
+    with pyfiction_call("post_layout_optimization"):
+        post_layout_optimization(layout, optimization_params(payload["params"]))
+    return layout_to_fgl(layout)
+
+
+def _hexagonalization(payload):
+    layout = layout_from_dict(payload["layout"])
+    with pyfiction_call("hexagonalization"):
+        hex_layout = hexagonalization(layout)
+    return layout_to_fgl(hex_layout)
+
+
+def _equivalence(payload):
+    layout = layout_from_dict(payload["layout"])
+    network = network_from_verilog(payload["verilog"])
+    stats = equivalence_checking_stats()
+    with pyfiction_call("equivalence_checking"):
+        eq = equivalence_checking(layout, network, stats)
+    if eq == eq_type.STRONG:
+        return {"equivalence": "STRONG", "counter_example": None}
+    if eq == eq_type.WEAK:
+        return {"equivalence": "WEAK", "counter_example": None}
+    return {"equivalence": "NO", "counter_example": list(stats.counter_example)}
+
+
+# File formats a pipeline run can export, with the suffix of their file names
+PIPELINE_EXPORTS = {
+    "fgl": ".fgl",
+    "dot": ".dot",
+    "qca": "_qca.svg",
+    "sqd": ".sqd",
+}
+
+
+def _pipeline(payload):
+    # Complete flow from Verilog code to exported files for a single circuit.
+    # Every stage is timed; a failing stage ends the run, but the record of
+    # the stages completed until then is still returned.
+    stages = {}
+    record = {"stages": stages}
+
+    def stage(name, function, *args):
+        record["stage"] = name
+        start = time.perf_counter()
+        value = function(*args)
+        stages[name] = round(time.perf_counter() - start, 4)
+        return value
+
+    try:
+        network = stage("parse", network_from_verilog, payload["verilog"])
+        layout = stage("layout", _pipeline_layout, network, payload)
+        if payload.get("optimize"):
+            stage(
+                "optimization",
+                timed(post_layout_optimization),
+                layout,
+                optimization_params(payload.get("optimization_params") or {}),
+            )
+        record["metrics"] = {"gates": layout.num_gates(), **layout_metrics(layout)}
+
+        warnings, errors = stage("drc", timed(gate_level_drvs), layout)
+        record["drc"] = {"warnings": warnings, "errors": errors}
+
+        if payload.get("equivalence", True):
+            eq = stage("equivalence", timed(equivalence_checking), layout, network)
+            record["equivalence"] = eq.name
+
+        record["exports"] = {}
+        for fmt in payload.get("exports", ()):
+            path = str(Path(payload["output"], payload["name"] + PIPELINE_EXPORTS[fmt]))
+            stage(f"export_{fmt}", _pipeline_export, layout, fmt, path)
+            record["exports"][fmt] = path
+    except Exception as e:  # noqa: BLE001
+        record["failed_stage"] = record["stage"]
+        record["error"] = str(e)
+    del record["stage"]
+    return record
+
+
+def _pipeline_layout(network, payload):
+    algorithm = payload.get("algorithm", "orthogonal")
+    if algorithm == "orthogonal":
+        with pyfiction_call("orthogonal"):
+            layout = orthogonal(network)
+    elif algorithm == "gold":
+        with pyfiction_call("graph_oriented_layout_design"):
+            layout = graph_oriented_layout_design(
+                network, gold_params(payload["params"])
+            )
+    elif algorithm == "exact":
+        if not exact_cartesian:
+            msg = "Pyfiction was installed without Z3 enabled."
+            raise WorkerError(msg)
+        with pyfiction_call("exact_cartesian"):
+            layout = exact_cartesian(network, exact_cartesian_params(payload["params"]))
+    else:
+        msg = f"Unknown algorithm: {algorithm}."
+        raise WorkerError(msg)
+    if not layout:
+        msg = "No layout found with the specified parameters."
+        raise WorkerError(msg)
+    return layout
+
+
+def _pipeline_export(layout, fmt, path):
+    if fmt == "fgl":
+        write_fgl_layout(layout, path)
+    elif fmt == "dot":
+        with pyfiction_call("write_dot_layout"):
+            write_dot_layout(layout, path)
+    elif fmt == "qca":
+        with pyfiction_call("apply_qca_one_library"):
+            cell_level_layout = apply_qca_one_library(layout)
+        with pyfiction_call("write_qca_layout_svg"):
+            write_qca_layout_svg(cell_level_layout, path, write_qca_layout_svg_params())
+    elif fmt == "sqd":
+        with pyfiction_call("hexagonalization"):
+            hex_layout = hexagonalization(layout)
+        with pyfiction_call("apply_bestagon_library"):
+            cell_level_layout = apply_bestagon_library(hex_layout)
+        with pyfiction_call("write_sqd_layout"):
+            write_sqd_layout(cell_level_layout, path)
+
+
+TASKS = {
+    "orthogonal": _orthogonal,
+    "gold": _gold,
+    "gold_sweep": _gold_sweep,
+    "exact": _exact,
+    "optimization": _optimization,
+    "hexagonalization": _hexagonalization,
+    "equivalence": _equivalence,
+    "pipeline": _pipeline,
+}
+
+
+def run_task(task, payload):
+    return TASKS[task](payload)
+
+
+def _worker_main(conn):
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        if message is None:
+            return
+        task, payload = message
+        # Timings of the pyfiction calls travel back with the result
+        with capture_timings() as timings:
+            try:
+                ok, value = True, run_task(task, payload)
+            except Exception as e:  # noqa: BLE001
+                ok, value = False, str(e)
+        conn.send((ok, value, timings))
+
+
+class _Worker:
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main, args=(child_conn,), daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+
+    def kill(self):
+        self.process.terminate()
+        self.process.join(1)
+        self.conn.close()
+
+
+class WorkerPool:
+    """Pool of worker processes that execute pyfiction physical design tasks.
+
+    Every run is dispatched to an idle worker. A run that exceeds its time
+    limit or gets cancelled terminates its worker, which is replaced on
+    demand, so a runaway solver never blocks the Flask process. With
+    ``processes=0`` tasks run inline in the calling thread instead.
+    """
+
+    def __init__(self, processes=None, timeout=None, start_method="spawn"):
+        self.processes = (os.cpu_count() or 1) if processes is None else processes
+        self.timeout = timeout
+        self.context = multiprocessing.get_context(start_method)
+        self.slots = threading.BoundedSemaphore(max(self.processes, 1))
+        self.idle = []
+        self.lock = threading.Lock()
+
+    def run(self, task, payload, timeout=None, cancel_event=None):
+        if self.processes == 0:
+            return run_task(task, payload)
+
+        if timeout is None or (self.timeout is not None and self.timeout < timeout):
+            timeout = self.timeout
+
+        # Wait for a free worker slot, but stay responsive to cancellation
+        while not self.slots.acquire(timeout=0.05):
+            if cancel_event is not None and cancel_event.is_set():
+                msg = "Run was cancelled."
+                raise WorkerCancelled(msg)
+        try:
+            ok, value, timings = self._dispatch(task, payload, timeout, cancel_event)
+        finally:
+            self.slots.release()
+        record_timings(timings)
+
+        if not ok:
+            raise WorkerError(value)
+        return value
+
+    def shutdown(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for worker in idle:
+            worker.kill()
+
+    def _dispatch(self, task, payload, timeout, cancel_event):
+        with self.lock:
+            worker = self.idle.pop() if self.idle else None
+        if worker is None or not worker.process.is_alive():
+            worker = _Worker(self.context)
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            worker.conn.send((task, payload))
+            while not worker.conn.poll(0.05):
+                if cancel_event is not None and cancel_event.is_set():
+                    worker.kill()
+                    msg = "Run was cancelled."
+                    raise WorkerCancelled(msg)
+                if deadline is not None and time.monotonic() > deadline:
+                    worker.kill()
+                    msg = f"Run exceeded the time limit of {timeout} s."
+                    raise WorkerTimeout(msg)
+            result = worker.conn.recv()
+        except (EOFError, OSError):
+            worker.kill()
+            msg = "Worker process terminated unexpectedly."
+            raise WorkerError(msg) from None
+
+        with self.lock:
+            self.idle.append(worker)
+        return result
@@ -0,0 +1,206 @@
+import os
+import uuid
+
+import pytest
+
+# Physical design algorithms run in-process, and sessions are neither
+# persisted nor evicted during the tests
+os.environ.setdefault("MNT_DESIGNER_WORKERS", "0")
+for name in (
+    "MNT_DESIGNER_STORE",
+    "MNT_DESIGNER_SPILL_DIR",
+    "MNT_DESIGNER_SHARED_STATE",
+    "MNT_DESIGNER_MAX_SESSIONS",
+    "MNT_DESIGNER_MAX_SESSION_MB",
+    "MNT_DESIGNER_SESSION_TTL",
+):
+    os.environ.pop(name, None)
+
+# The app reads its configuration from the environment on import
+from mnt.designer.app import app, layouts  # noqa: E402
+
+
+class Editor:
+    """Edits the layout of a session through the routes of the app."""
+
+    def __init__(self, test_client):
+        self.client = test_client
+
+    def request(self, route, data):
+        response = self.client.post(route, json=data).get_json()
+        assert response["success"], response
+        return response
+
+    def create(self, x, y):
+        self.size = (x, y)
+        return self.request("/create_layout", {"x": x, "y": y})
+
+    def session_id(self):
+        with self.client.session_transaction() as flask_session:
+            return flask_session["session_id"]
+
+    def layout(self):
+        return layouts[self.session_id()]
+
+    def gates(self):
+        return self.client.get("/get_layout").get_json()["gates"]
+
+    def place(self, x, y, gate_type, *sources):
+        params = {
+            name: {"position": {"x": sx, "y": sy}, "gate_type": source_type}
+            for name, (sx, sy, source_type) in zip(("first", "second"), sources)
+        }
+        return self.request(
+            "/place_gate",
+            {"x": x, "y": y, "gate_type": gate_type, "params": params},
+        )
+
+    def delete(self, x, y):
+        return self.request("/delete_gate", {"x": x, "y": y})
+
+    def move(self, x, y, gate_type, target_x, target_y):
+        return self.request(
+            "/move_gate",
+            {
+                "source_x": x,
+                "source_y": y,
+                "source_gate_type": gate_type,
+                "target_x": target_x,
+                "target_y": target_y,
+            },
+        )
+
+    def kill_node(self):
+        # Edits after which pyfiction leaves a dead node on tile (3, 0) of a
+        # layout of at least 6 x 6 tiles
+        self.place(5, 5, "pi")
+        self.place(0, 2, "inv", (5, 5, "pi"))
+        self.place(0, 0, "buf", (0, 2, "inv"))
+        self.place(2, 2, "pi")
+        self.place(3, 0, "or", (0, 0, "buf"), (2, 2, "pi"))
+        self.place(2, 0, "or", (3, 0, "or"), (3, 0, "or"))
+        self.delete(3, 0)
+        self.place(3, 0, "xor", (2, 0, "or"), (2, 0, "or"))
+        self.move(2, 0, "or", 4, 5)
+        return (3, 0)
+
+    def random_edit(self, rng):
+        # Any edit the frontend offers, whether pyfiction accepts it or not
+        gates = self.gates()
+        occupied = {(gate["x"], gate["y"]): gate for gate in gates}
+        empty = [
+            (x, y)
+            for x in range(self.size[0])
+            for y in range(self.size[1])
+            if (x, y) not in occupied
+        ]
+
+        def pick(near):
+            # Prefer adjacent gates, which pyfiction can connect
+            adjacent = [
+                gate
+                for gate in gates
+                if abs(gate["x"] - near[0]) + abs(gate["y"] - near[1]) == 1
+            ]
+            gate = rng.choice(adjacent if adjacent and rng.random() < 0.8 else gates)
+            return {
+                "position": {"x": gate["x"], "y": gate["y"]},
+                "gate_type": gate["type"],
+            }
+
+        operation = rng.choice(
+            ["pi", "unary", "unary", "binary", "binary", "delete", "move", "connect"]
+        )
+        if not gates or (operation in ("pi", "unary", "binary") and empty):
+            if not empty:
+                return
+            x, y = rng.choice(empty)
+            gate_type, params = "pi", {}
+            if gates and operation == "unary":
+                gate_type = rng.choice(["buf", "inv", "po"])
+                params = {"first": pick((x, y))}
+            elif gates and operation == "binary":
+                gate_type = rng.choice(["and", "or", "xor"])
+                params = {"first": pick((x, y)), "second": pick((x, y))}
+            data = {"x": x, "y": y, "gate_type": gate_type, "params": params}
+            self.client.post("/place_gate", json=data)
+        elif operation == "delete":
+            gate = rng.choice(gates)
+            self.client.post("/delete_gate", json={"x": gate["x"], "y": gate["y"]})
+        elif operation == "move" and empty:
+            gate = rng.choice(gates)
+            x, y = rng.choice(empty)
+            data = {
+                "source_x": gate["x"],
+                "source_y": gate["y"],
+                "source_gate_type": gate["type"],
+                "target_x": x,
+                "target_y": y,
+            }
+            self.client.post("/move_gate", json=data)
+        elif operation == "connect":
+            source, target = rng.choice(gates), rng.choice(gates)
+            data = {
+                "source_x": source["x"],
+                "source_y": source["y"],
+                "source_gate_type": source["type"],
+                "target_x": target["x"],
+                "target_y": target["y"],
+                "target_gate_type": target["type"],
+                "find_path": False,
+            }
+            self.client.post("/connect_gates", json=data)
+
+    def clocked_edit(self, rng):
+        # Edits that connect tiles only along the 2DDWave clocking, from the
+        # west or the north, so that the bindings list every connection
+        gates = self.gates()
+        occupied = {(gate["x"], gate["y"]): gate for gate in gates}
+        operation = rng.choice(["place", "place", "place", "delete", "connect"])
+        if operation == "delete" and gates:
+            gate = rng.choice(gates)
+            self.client.post("/delete_gate", json={"x": gate["x"], "y": gate["y"]})
+            return
+
+        x, y = rng.randrange(self.size[0]), rng.randrange(self.size[1])
+        sources = [
+            {"position": {"x": gate["x"], "y": gate["y"]}, "gate_type": gate["type"]}
+            for gate in (occupied.get((x - 1, y)), occupied.get((x, y - 1)))
+            if gate is not None
+        ]
+        if operation == "connect" and (x, y) in occupied and sources:
+            source = rng.choice(sources)
+            data = {
+                "source_x": source["position"]["x"],
+                "source_y": source["position"]["y"],
+                "source_gate_type": source["gate_type"],
+                "target_x": x,
+                "target_y": y,
+                "target_gate_type": occupied[(x, y)]["type"],
+                "find_path": False,
+            }
+            self.client.post("/connect_gates", json=data)
+        elif (x, y) not in occupied:
+            gate_type, params = "pi", {}
+            if len(sources) == 2 and rng.random() < 0.5:
+                gate_type = rng.choice(["and", "or", "xor"])
+                params = dict(zip(("first", "second"), sources))
+            elif sources and rng.random() < 0.7:
+                gate_type = rng.choice(["buf", "inv", "po"])
+                params = {"first": rng.choice(sources)}
+            data = {"x": x, "y": y, "gate_type": gate_type, "params": params}
+            self.client.post("/place_gate", json=data)
+
+
+@pytest.fixture
+def client():
+    # Test client of a fresh session
+    test_client = app.test_client()
+    with test_client.session_transaction() as flask_session:
+        flask_session["session_id"] = str(uuid.uuid4())
+    return test_client
+
+
+@pytest.fixture
+def editor(client):
+    return Editor(client)
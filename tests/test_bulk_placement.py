@@ -0,0 +1,76 @@
+import random
+
+import pytest
+from mnt.pyfiction import cartesian_gate_layout, cartesian_obstruction_layout
+
+from mnt.designer.workers import copy_layout, layout_to_dict
+
+
+def place(x, y, gate_type, **params):
+    return {"x": x, "y": y, "gate_type": gate_type, "params": params}
+
+
+def source(x, y, gate_type):
+    return {"position": {"x": x, "y": y}, "gate_type": gate_type}
+
+
+def test_copies_keep_layouts_being_edited():
+    layout = cartesian_obstruction_layout(cartesian_gate_layout((4, 4, 1), "USE", ""))
+    a = layout.create_pi("a", (0, 0))
+    b = layout.create_pi("b", (3, 3))
+    layout.create_and(layout.create_buf(a, (1, 0)), b, (1, 1))
+    # Clearing the PI leaves the gates above with a missing input
+    layout.clear_tile((3, 3))
+
+    copy = copy_layout(layout)
+    assert layout_to_dict(copy) == layout_to_dict(layout)
+    copy.create_pi("c", (2, 2))
+    assert layout.is_empty_tile((2, 2))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_copies_match_edited_layouts(editor, seed):
+    rng = random.Random(seed)
+    editor.create(6, 6)
+    layout = editor.layout()
+    for _ in range(60):
+        editor.random_edit(rng)
+        assert layout_to_dict(copy_layout(layout)) == layout_to_dict(layout)
+
+
+def test_bulk_placement_is_all_or_nothing(editor):
+    editor.create(4, 4)
+    editor.place(0, 0, "pi")
+    items = [
+        place(1, 0, "buf", first=source(0, 0, "pi")),
+        place(1, 0, "pi"),
+    ]
+
+    response = editor.client.post("/place_gates", json={"items": items}).get_json()
+    assert not response["success"]
+    assert response["failedIndex"] == 1
+    assert [(gate["x"], gate["y"]) for gate in editor.gates()] == [(0, 0)]
+
+    response = editor.request("/place_gates", {"items": items[:1]})
+    assert [result["success"] for result in response["results"]] == [True]
+    assert [(gate["x"], gate["y"]) for gate in editor.gates()] == [(0, 0), (1, 0)]
+
+
+def test_bulk_placement_keeps_dead_nodes(editor):
+    editor.create(8, 8)
+    tile = editor.kill_node()
+    editor.request("/place_gates", {"items": [place(7, 7, "pi")]})
+
+    assert tile in {(gate["x"], gate["y"]) for gate in editor.gates()}
+
+
+def test_bulk_placement_fails_on_dead_nodes_without_changes(editor):
+    editor.create(8, 8)
+    x, y = editor.kill_node()
+    layout = editor.client.get("/get_layout").get_json()
+    items = [place(7, 7, "pi"), place(x, y, "pi")]
+
+    response = editor.client.post("/place_gates", json={"items": items}).get_json()
+    assert not response["success"]
+    assert response["failedIndex"] == 1
+    assert editor.client.get("/get_layout").get_json() == layout
@@ -0,0 +1,64 @@
+from mnt.designer import service
+from mnt.designer.caches import LRUCache, ResultCache, verilog_hash
+from mnt.designer.service import Designer, is_read_only
+
+VERILOG = """module top(x0, x1, x2, y0);
+  input x0, x1, x2;
+  output y0;
+  wire n4;
+  assign n4 = x0 & x1;
+  assign y0 = n4 | x2;
+endmodule
+"""
+
+
+def test_lru_cache_keeps_the_most_recently_used_entries():
+    cache = LRUCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats() == {"entries": 2, "hits": 3, "misses": 1}
+
+
+def test_verilog_hash_ignores_comments_and_formatting():
+    reformatted = "// Generated\n" + VERILOG.replace("  ", "\t").replace(
+        " = ", "   =   "
+    )
+
+    assert verilog_hash(reformatted) == verilog_hash(VERILOG)
+    assert verilog_hash(VERILOG.replace("|", "&")) != verilog_hash(VERILOG)
+
+
+def test_networks_are_parsed_once_per_content():
+    designer = Designer()
+    network = designer.parse_verilog(VERILOG)
+
+    assert network.num_pis() == 3
+    assert designer.parse_verilog("/* again */\n" + VERILOG) is network
+    assert designer.network_cache.stats()["misses"] == 1
+
+
+def test_results_survive_in_the_cache_directory(tmp_path):
+    key = ResultCache.key("gold", verilog_hash(VERILOG), {"timeout": 10})
+    assert key != ResultCache.key("gold", verilog_hash(VERILOG), {"timeout": 20})
+    ResultCache(directory=tmp_path).put(key, "<fgl/>")
+
+    cache = ResultCache(directory=tmp_path)
+    assert cache.get(key) == "<fgl/>"
+    assert cache.get(key) == "<fgl/>"
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_only_read_only_networks_are_shared(monkeypatch):
+    designer = Designer()
+    # Sessions may share networks since pyfiction cannot change them
+    assert is_read_only(designer.parse_verilog(VERILOG))
+
+    monkeypatch.setattr(service, "is_read_only", lambda _: False)
+    designer = Designer()
+    assert designer.parse_verilog(VERILOG) is not designer.parse_verilog(VERILOG)
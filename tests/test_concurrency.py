@@ -0,0 +1,94 @@
+"""Hammers a single session with concurrent requests from many threads.
+
+Every thread owns one row of the layout, in which it repeatedly places a PI
+followed by a chain of buffers, deletes it again, and reads the layout in
+between, while further threads run design rule checks and exports.
+"""
+
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from mnt.designer.app import app
+
+THREADS = 8
+CHECKERS = 3
+LENGTH = 6
+ROUNDS = 3
+
+
+def client(session_id):
+    test_client = app.test_client()
+    with test_client.session_transaction() as flask_session:
+        flask_session["session_id"] = session_id
+    return test_client
+
+
+def check(response):
+    # Exports answer with the file itself unless they fail
+    if not response.is_json:
+        return response
+    data = response.get_json()
+    if not data.get("success", True):
+        raise RuntimeError(data.get("error"))
+    return data
+
+
+def place(test_client, x, y, gate_type, params):
+    return check(
+        test_client.post(
+            "/place_gate",
+            json={"x": x, "y": y, "gate_type": gate_type, "params": params},
+        )
+    )["revision"]
+
+
+def editor(session_id, row):
+    test_client = client(session_id)
+    revisions = []
+    for _ in range(ROUNDS):
+        revisions.append(place(test_client, 0, row, "pi", {}))
+        for x in range(1, LENGTH):
+            source = {"position": {"x": x - 1, "y": row}}
+            source["gate_type"] = "pi" if x == 1 else "buf"
+            revisions.append(place(test_client, x, row, "buf", {"first": source}))
+            check(test_client.get("/get_layout"))
+        for x in reversed(range(LENGTH)):
+            response = test_client.post("/delete_gate", json={"x": x, "y": row})
+            revisions.append(check(response)["revision"])
+    # Leave the PI of every row behind to verify the final state
+    place(test_client, 0, row, "pi", {})
+    return revisions
+
+
+def checker(session_id, stop):
+    test_client = client(session_id)
+    while not stop.is_set():
+        check(test_client.post("/check_design_rules"))
+        check(test_client.get("/dead_nodes"))
+        check(test_client.get("/get_bounding_box"))
+        check(test_client.get("/export_layout"))
+
+
+def test_concurrent_requests_of_one_session():
+    session_id = f"stress-{uuid.uuid4()}"
+    check(client(session_id).post("/create_layout", json={"x": LENGTH, "y": THREADS}))
+
+    stop = threading.Event()
+    with ThreadPoolExecutor(THREADS + CHECKERS) as executor:
+        checkers = [executor.submit(checker, session_id, stop) for _ in range(CHECKERS)]
+        editors = [executor.submit(editor, session_id, row) for row in range(THREADS)]
+        try:
+            # Errors of any thread are raised again here
+            revisions = [revision for e in editors for revision in e.result()]
+        finally:
+            stop.set()
+        for future in checkers:
+            future.result()
+
+    assert len(set(revisions)) == len(revisions)
+    assert len(revisions) == THREADS * ROUNDS * 2 * LENGTH
+    gates = check(client(session_id).get("/get_layout"))["gates"]
+    assert sorted((gate["x"], gate["y"]) for gate in gates) == [
+        (0, row) for row in range(THREADS)
+    ]
@@ -0,0 +1,218 @@
+import io
+import json
+import random
+import re
+from contextlib import redirect_stdout
+
+import pytest
+from mnt.pyfiction import gate_level_drv_params, gate_level_drvs
+
+from mnt.designer import drc
+from mnt.designer.app import drc_checkers
+from mnt.designer.drc import (
+    RULES,
+    WARNING,
+    DesignRuleChecker,
+    dead_nodes,
+    design_rule_violations,
+    placed_nodes,
+)
+from mnt.designer.revisions import RevisionLog
+from mnt.designer.service import DesignError, check_optimizable
+
+
+def pyfiction_counts(layout):
+    # Warnings and errors of gate_level_drvs on the live layout, rule by rule
+    counts = {}
+    for rule in RULES:
+        params = gate_level_drv_params()
+        for other in RULES:
+            setattr(params, other, other == rule)
+        counts[rule] = tuple(gate_level_drvs(layout, params, False))
+    return counts
+
+
+def record_counts(violations):
+    counts = dict.fromkeys(RULES, (0, 0))
+    for violation in violations:
+        warnings, errors = counts[violation["rule"]]
+        if violation["severity"] == WARNING:
+            counts[violation["rule"]] = (warnings + 1, errors)
+        else:
+            counts[violation["rule"]] = (warnings, errors + 1)
+    return counts
+
+
+def pyfiction_report(layout):
+    output = io.StringIO()
+    with redirect_stdout(output):
+        gate_level_drvs(layout, print_report=True)
+    text = re.sub(r"\x1b\[[0-?]*[ -/]*[@-~]", "", output.getvalue())
+    return "".join(
+        f"[i] {line.strip()}\n" for line in text.split("[i]") if line.strip()
+    )
+
+
+def check(client):
+    return client.post("/check_design_rules").get_json()
+
+
+def checker_init(full_check_interval):
+    def init(self, _full_check_interval=None):
+        original_init(self, full_check_interval)
+
+    return init
+
+
+original_init = DesignRuleChecker.__init__
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_full_checks_match_gate_level_drvs_while_editing(
+    editor, client, monkeypatch, seed
+):
+    monkeypatch.setattr(DesignRuleChecker, "__init__", checker_init(1))
+    rng = random.Random(seed)
+    editor.create(6, 6)
+    layout = editor.layout()
+    for _ in range(60):
+        editor.random_edit(rng)
+        result = check(client)
+        assert record_counts(result["violations"]) == pyfiction_counts(layout)
+        assert result["report"] == pyfiction_report(layout)
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_index_matches_gate_level_drvs_along_the_clocking(
+    editor, client, monkeypatch, seed
+):
+    # Without full checks past the first one, the index alone is right as long
+    # as the bindings list every connection, also after several edits between
+    # two checks
+    monkeypatch.setattr(DesignRuleChecker, "__init__", checker_init(10**9))
+    rng = random.Random(seed)
+    editor.create(6, 6)
+    layout = editor.layout()
+    for _ in range(80):
+        editor.clocked_edit(rng)
+        if rng.random() < 0.4:
+            continue
+        result = check(client)
+        fresh = [violation.to_dict() for violation in design_rule_violations(layout)]
+        assert result["violations"] == json.loads(json.dumps(fresh))
+        assert record_counts(fresh) == pyfiction_counts(layout)
+
+
+# Seed 148 on 5 x 5 tiles revives a dead node and kills another in one edit
+@pytest.mark.parametrize(
+    ("seed", "size", "edits"), [*((seed, 6, 60) for seed in range(8)), (148, 5, 120)]
+)
+def test_full_checks_catch_up_with_any_edits(
+    editor, client, monkeypatch, seed, size, edits
+):
+    monkeypatch.setattr(DesignRuleChecker, "__init__", checker_init(3))
+    rng = random.Random(seed)
+    editor.create(size, size)
+    layout = editor.layout()
+    for _ in range(edits):
+        editor.random_edit(rng)
+        if rng.random() < 0.4:
+            continue
+        result = check(client)
+        if drc_checkers[editor.session_id()].checks % 3 == 0:
+            assert record_counts(result["violations"]) == pyfiction_counts(layout)
+
+
+def test_hidden_connections_are_reported_by_the_next_full_check(
+    editor, client, monkeypatch
+):
+    monkeypatch.setattr(DesignRuleChecker, "__init__", checker_init(3))
+    editor.create(6, 6)
+    editor.place(0, 0, "pi")
+    check(client)
+    # The bindings do not list connections between tiles that are not adjacent
+    editor.place(3, 3, "po", (0, 0, "pi"))
+    layout = editor.layout()
+    assert record_counts(check(client)["violations"])["non_adjacent_connections"] == (
+        0,
+        0,
+    )
+
+    editor.place(5, 5, "pi")
+    result = check(client)
+    assert drc_checkers[editor.session_id()].full_checks == 2
+    assert record_counts(result["violations"]) == pyfiction_counts(layout)
+    assert pyfiction_counts(layout)["non_adjacent_connections"] != (0, 0)
+
+
+def test_disagreement_returns_the_counts_of_gate_level_drvs(editor, monkeypatch):
+    editor.create(6, 6)
+    editor.place(2, 2, "pi")
+    layout = editor.layout()
+    checker = DesignRuleChecker(full_check_interval=1)
+
+    # An index that misses the PI away from the borders
+    tile_violations = drc.tile_violations
+
+    def without_border_io(layout, x, y):
+        check = tile_violations(layout, x, y)
+        check.violations = [v for v in check.violations if v.rule != "border_io"]
+        return check
+
+    monkeypatch.setattr(drc, "tile_violations", without_border_io)
+    violations = checker.check(layout, RevisionLog())
+    counts = record_counts([violation.to_dict() for violation in violations])
+    assert counts == pyfiction_counts(layout)
+    assert counts["border_io"] == (1, 0)
+
+
+def test_dead_nodes_are_the_nodes_pyfiction_killed(editor, client):
+    editor.create(6, 6)
+    x, y = editor.kill_node()
+    # A gate without fanout is dangling, but alive
+    editor.place(5, 0, "pi")
+    editor.place(5, 1, "buf", (5, 0, "pi"))
+    layout = editor.layout()
+
+    dead = client.get("/dead_nodes").get_json()["dead_nodes"]
+    assert dead == [{"x": x, "y": y, "z": 0}]
+    result = check(client)
+    assert [
+        violation["tile"]
+        for violation in result["violations"]
+        if violation["rule"] == "placed_dead_nodes"
+    ] == [[x, y, 0]]
+    assert record_counts(result["violations"]) == pyfiction_counts(layout)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_node_walk_matches_a_scan_of_the_tiles(editor, seed):
+    rng = random.Random(seed)
+    editor.create(6, 6)
+    layout = editor.layout()
+    for _ in range(60):
+        editor.random_edit(rng)
+        nodes = {
+            (x, y, z): layout.get_node((x, y, z))
+            for x in range(layout.x() + 1)
+            for y in range(layout.y() + 1)
+            for z in range(layout.z() + 1)
+            if not layout.is_empty_tile((x, y, z))
+        }
+        assert placed_nodes(layout) == nodes
+        assert dead_nodes(layout) == sorted(
+            tile for tile, node in nodes.items() if layout.is_dead(node)
+        )
+
+
+def test_dead_nodes_prevent_optimization(editor):
+    editor.create(6, 6)
+    editor.place(0, 5, "pi")
+    editor.place(1, 5, "po", (0, 5, "pi"))
+    layout = editor.layout()
+    check_optimizable(layout)
+
+    # Whatever the design rules say about the rest of the layout
+    editor.kill_node()
+    with pytest.raises(DesignError, match=r"dead node: \(3, 0\)"):
+        check_optimizable(layout, lambda _layout: [])
@@ -0,0 +1,51 @@
+import threading
+
+from mnt.designer import app as designer_app
+from mnt.designer.jobs import CANCELLED, DONE, JobManager
+
+
+def submit_blocked(manager, session_id):
+    release = threading.Event()
+    job = manager.submit(
+        session_id, "test", lambda _job: release.wait(5), lambda _job, value: value
+    )
+    return job, release
+
+
+def test_jobs_are_private_to_their_session():
+    manager = JobManager(max_workers=1)
+    job, release = submit_blocked(manager, "a")
+    assert manager.get(job.id, "a") is job
+    assert manager.get(job.id, "b") is None
+    assert manager.get(job.id, None) is None
+    assert not manager.cancel(job.id, "b")
+    assert not manager.cancel(job.id, None)
+
+    release.set()
+    job.future.result()
+    assert job.status == DONE
+
+    other, _ = submit_blocked(manager, "a")
+    assert manager.cancel(other.id, "a")
+    assert other.status == CANCELLED
+
+
+def test_routes_hide_jobs_of_other_sessions(editor):
+    job, release = submit_blocked(designer_app.job_manager, editor.session_id())
+    try:
+        # Neither a request without a session nor one of another session
+        anonymous = designer_app.app.test_client()
+        other = designer_app.app.test_client()
+        with other.session_transaction() as flask_session:
+            flask_session["session_id"] = "other"
+        for client in (anonymous, other):
+            assert client.get(f"/job_status/{job.id}").status_code == 404
+            assert client.get(f"/job_result/{job.id}").status_code == 404
+            assert client.get(f"/job_events/{job.id}").status_code == 404
+            assert not client.post(f"/cancel_job/{job.id}").get_json()["success"]
+        assert job.status != CANCELLED
+
+        assert editor.client.get(f"/job_status/{job.id}").get_json()["success"]
+    finally:
+        release.set()
+        job.future.result()
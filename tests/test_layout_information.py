@@ -0,0 +1,38 @@
+import random
+
+import pytest
+
+from mnt.designer.service import get_gate_information, get_layout_information
+
+
+def scan(layout):
+    # Every tile of the layout, as it used to be read
+    return [
+        get_gate_information(layout, x, y)
+        for x in range(layout.x() + 1)
+        for y in range(layout.y() + 1)
+        if layout.get_node((x, y))
+    ]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_occupied_tiles_match_a_full_scan(editor, seed):
+    rng = random.Random(seed)
+    # Sparse enough to walk the placed nodes instead of scanning
+    editor.create(16, 16)
+    layout = editor.layout()
+    for _ in range(60):
+        editor.random_edit(rng)
+        dimensions, gates = get_layout_information(layout)
+        assert dimensions == {"x": 16, "y": 16}
+        assert gates == scan(layout)
+
+
+def test_dead_nodes_are_listed(editor):
+    editor.create(16, 16)
+    x, y = editor.kill_node()
+    layout = editor.layout()
+
+    assert layout.is_dead(layout.get_node((x, y)))
+    assert get_layout_information(layout)[1] == scan(layout)
+    assert (x, y) in {(gate["x"], gate["y"]) for gate in editor.gates()}
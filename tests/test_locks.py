@@ -0,0 +1,77 @@
+import threading
+import time
+
+from mnt.designer.locks import RWLock, SessionLocks
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def read_into(lock, order):
+    with lock.read():
+        order.append("read")
+
+
+def test_readers_share_the_lock():
+    lock = RWLock()
+    lock.acquire_read()
+    lock.acquire_read()
+    assert lock.readers == 2
+    assert not lock.acquire_write(blocking=False)
+
+    lock.release_read()
+    lock.release_read()
+    assert lock.acquire_write(blocking=False)
+    lock.release_write()
+
+
+def test_writer_excludes_readers_and_writers():
+    lock = RWLock()
+    order = []
+    with lock.write():
+        reader = threading.Thread(target=read_into, args=(lock, order))
+        reader.start()
+        time.sleep(0.01)
+        assert not lock.acquire_write(blocking=False)
+        order.append("write")
+    reader.join()
+
+    assert order == ["write", "read"]
+
+
+def test_waiting_writer_precedes_new_readers():
+    lock = RWLock()
+    order = []
+    lock.acquire_read()
+
+    def write():
+        with lock.write():
+            order.append("write")
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    wait_until(lambda: lock.waiting_writers == 1)
+    reader = threading.Thread(target=read_into, args=(lock, order))
+    reader.start()
+    time.sleep(0.01)
+    # The new reader queues behind the writer instead of joining the first one
+    assert order == []
+
+    lock.release_read()
+    writer.join()
+    reader.join()
+    assert order == ["write", "read"]
+
+
+def test_session_locks_are_shared_while_referenced():
+    locks = SessionLocks()
+    lock = locks.get("a")
+    assert locks.get("a") is lock
+    assert locks.get("b") is not lock
+
+    del lock
+    assert "a" not in locks.locks
@@ -0,0 +1,148 @@
+import json
+import sqlite3
+
+from mnt.pyfiction import cartesian_gate_layout, cartesian_obstruction_layout
+
+from mnt.designer.persistence import (
+    DirectoryBackend,
+    SpillDirectory,
+    SQLiteBackend,
+    restore_session,
+    snapshot_session,
+)
+from mnt.designer.revisions import RevisionLog
+from mnt.designer.workers import layout_to_dict, layout_to_fgl
+
+
+def edited_layout():
+    # A PI feeding a wire whose outgoing connection is still missing
+    layout = cartesian_obstruction_layout(
+        cartesian_gate_layout((3, 3, 0), "2DDWave", "")
+    )
+    pi = layout.create_pi("a", (0, 0))
+    layout.create_buf(pi, (1, 0))
+    return layout
+
+
+def finished_layout():
+    layout = cartesian_obstruction_layout(
+        cartesian_gate_layout((3, 3, 0), "2DDWave", "")
+    )
+    layout.create_po(layout.create_pi("a", (0, 0)), "f", (1, 0))
+    return layout
+
+
+def legacy_snapshot():
+    # Format 1, as written before layouts were stored as JSON
+    return {
+        "fgl": layout_to_fgl(finished_layout()),
+        "verilog": "module top(); endmodule",
+        "network": False,
+        "revision": 3,
+    }
+
+
+def session_values():
+    return {
+        "layout": edited_layout(),
+        "verilog": "module top(); endmodule",
+        "network": None,
+        "revisions": RevisionLog(revision=7),
+    }
+
+
+def test_snapshots_restore_layouts_being_edited():
+    values = session_values()
+    restored = restore_session(snapshot_session(values), parse_verilog=None)
+
+    assert layout_to_dict(restored["layout"]) == layout_to_dict(values["layout"])
+    assert restored["verilog"] == values["verilog"]
+    assert restored["network"] is None
+    assert restored["revisions"].revision == 7
+
+
+def test_directory_backend_round_trip(tmp_path):
+    backend = DirectoryBackend(str(tmp_path))
+    snapshot = snapshot_session(session_values())
+    backend.save("session", snapshot)
+
+    assert backend.load("session") == snapshot
+    backend.delete("session")
+    assert backend.load("session") is None
+
+
+def test_spill_directory_forgets_loaded_sessions(tmp_path):
+    spill = SpillDirectory(str(tmp_path))
+    snapshot = snapshot_session(session_values())
+    spill.save("session", snapshot)
+
+    assert spill.load("session") == snapshot
+    assert spill.load("session") is None
+    assert not list(tmp_path.iterdir())
+
+
+def test_sqlite_backend_round_trip(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "sessions.db"))
+    snapshot = snapshot_session(session_values())
+    backend.save("session", snapshot)
+
+    assert backend.load("session") == snapshot
+    assert backend.revision("session") == 7
+    backend.delete("session")
+    assert backend.load("session") is None
+
+
+def test_sqlite_backend_saves_only_the_expected_revision(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    first, second = SQLiteBackend(path), SQLiteBackend(path)
+    snapshot = snapshot_session(session_values())
+    assert first.save("session", snapshot, None, check=True)
+    # A process that did not see this snapshot must not overwrite it
+    assert not second.save("session", snapshot, None, check=True)
+
+    newer = dict(snapshot, revision=8)
+    assert second.save("session", newer, 7, check=True)
+    assert not first.save("session", dict(snapshot, revision=8), 7, check=True)
+    assert first.load("session") == newer
+
+
+def test_legacy_snapshots_are_restored():
+    restored = restore_session(legacy_snapshot(), parse_verilog=None)
+
+    assert layout_to_dict(restored["layout"]) == layout_to_dict(finished_layout())
+    assert restored["revisions"].revision == 3
+
+
+def test_directory_backend_reads_legacy_snapshots(tmp_path):
+    legacy = legacy_snapshot()
+    (tmp_path / "session.fgl").write_text(legacy.pop("fgl"), encoding="utf-8")
+    (tmp_path / "session.json").write_text(json.dumps(legacy), encoding="utf-8")
+    backend = DirectoryBackend(str(tmp_path))
+
+    assert backend.load("session") == legacy_snapshot()
+    snapshot = snapshot_session(restore_session(backend.load("session"), None))
+    backend.save("session", snapshot)
+    assert backend.load("session") == snapshot
+    assert [path.name for path in tmp_path.iterdir()] == ["session.json"]
+
+
+def test_sqlite_backend_migrates_legacy_databases(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    legacy = legacy_snapshot()
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE sessions (session_id TEXT PRIMARY KEY, fgl TEXT, "
+            "verilog TEXT, network INTEGER NOT NULL, revision INTEGER NOT NULL)"
+        )
+        conn.execute(
+            "INSERT INTO sessions VALUES (?, ?, ?, ?, ?)",
+            ("session", legacy["fgl"], legacy["verilog"], 0, 3),
+        )
+    backend = SQLiteBackend(path)
+
+    assert backend.load("session") == dict(legacy, format=1, layout=None)
+    snapshot = snapshot_session(restore_session(backend.load("session"), None))
+    assert backend.save("session", snapshot, 3, check=True)
+    assert backend.load("session") == snapshot
+    # Opening the migrated database again leaves it as is
+    assert SQLiteBackend(path).load("session") == snapshot
@@ -0,0 +1,49 @@
+import io
+
+from mnt.designer import app as designer_app
+
+VERILOG = """module top(x0, x1, x2, y0, y1);
+  input x0, x1, x2;
+  output y0, y1;
+  wire n4;
+  assign n4 = x0 & x1;
+  assign y0 = n4 | x2;
+  assign y1 = x0 ^ x2;
+endmodule
+"""
+
+
+def test_portfolio_installs_only_the_final_best_layout(editor, monkeypatch):
+    installs = []
+    reported = []
+    session_id = editor.session_id()
+    install_layout = designer_app.install_layout
+
+    def record_install(session_id, layout):
+        # Every engine has reported by the time the layout is installed, along
+        # with the best layout so far
+        job = designer_app.job_manager.get(job_id, session_id)
+        installs.append(len(job.progress["candidates"]))
+        reported.append(job.progress)
+        return install_layout(session_id, layout)
+
+    monkeypatch.setattr(designer_app, "install_layout", record_install)
+    response = editor.client.post(
+        "/import_verilog_code",
+        data={"file": (io.BytesIO(VERILOG.encode()), "top.v")},
+        content_type="multipart/form-data",
+    )
+    assert response.get_json()["success"]
+    engines = ["orthogonal", "gold:AREA", "gold:WIRES"]
+    response = editor.request("/apply_portfolio", {"budget": 30, "engines": engines})
+    job_id = response["job_id"]
+    designer_app.job_manager.get(job_id, session_id).future.result()
+
+    result = editor.client.get(f"/job_result/{job_id}").get_json()
+    assert result["success"], result
+    assert installs == [len(engines)]
+    assert result["selected"] in engines
+    assert result["revision"] == editor.client.get("/get_layout").get_json()["revision"]
+    assert result["gates"] == editor.gates()
+    assert reported[0]["gates"] == result["gates"]
+    assert reported[0]["layoutDimensions"] == result["layoutDimensions"]
@@ -0,0 +1,50 @@
+from mnt.designer.revisions import RevisionLog
+
+
+def test_changes_accumulate_since_a_revision():
+    log = RevisionLog()
+    first = log.record([(0, 0)])
+    second = log.record([(1, 0), (0, 0)])
+    third = log.record([(2, 2)])
+
+    assert (first, second, third) == (1, 2, 3)
+    assert log.changes_since(0) == {(0, 0), (1, 0), (2, 2)}
+    assert log.changes_since(second) == {(2, 2)}
+    assert log.changes_since(third) == set()
+    # Revisions from the future are unknown
+    assert log.changes_since(4) is None
+
+
+def test_trimmed_and_reset_history_needs_a_snapshot():
+    log = RevisionLog(max_history=2)
+    for x in range(3):
+        log.record([(x, 0)])
+    assert log.base == 1
+    assert log.changes_since(0) is None
+    assert log.changes_since(1) == {(1, 0), (2, 0)}
+
+    revision = log.reset()
+    assert revision == 4
+    assert log.changes_since(3) is None
+    assert log.changes_since(4) == set()
+
+
+def test_layout_delta_lists_changed_tiles(editor):
+    editor.create(4, 4)
+    base = editor.place(0, 0, "pi")["revision"]
+    editor.place(1, 0, "buf", (0, 0, "pi"))
+    editor.place(2, 0, "pi")
+    revision = editor.delete(2, 0)["revision"]
+
+    delta = editor.client.get(f"/get_layout_delta?revision={base}").get_json()
+    assert delta["success"]
+    assert not delta["full"]
+    assert delta["revision"] == revision
+    assert [(gate["x"], gate["y"]) for gate in delta["gates"]] == [(0, 0), (1, 0)]
+    assert delta["removed"] == [{"x": 2, "y": 0}]
+
+    # Resizing the layout resets the history
+    editor.create(5, 5)
+    delta = editor.client.get(f"/get_layout_delta?revision={base}").get_json()
+    assert delta["full"]
+    assert len(delta["gates"]) == 2
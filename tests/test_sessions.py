@@ -0,0 +1,162 @@
+import threading
+
+from mnt.designer.locks import SessionLocks
+from mnt.designer.sessions import SessionStore
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def store_of(**kwargs):
+    kwargs.setdefault("estimate", lambda values: values.get("size", 0))
+    return SessionStore(**kwargs)
+
+
+def test_least_recently_used_sessions_are_evicted():
+    evicted = []
+    store = store_of(
+        max_sessions=2, on_evict=lambda session_id, _: evicted.append(session_id)
+    )
+    store.set("a", "layout", 1)
+    store.set("b", "layout", 2)
+    assert store.get("a", "layout") == 1
+    store.set("c", "layout", 3)
+
+    assert evicted == ["b"]
+    assert store.sessions_with("layout") == ["a", "c"]
+    assert store.stats()["evictions"]["lru"] == 1
+
+
+def test_idle_sessions_expire():
+    clock = Clock()
+    store = store_of(ttl=10, clock=clock)
+    store.set("a", "layout", 1)
+    clock.now = 5
+    store.set("b", "layout", 2)
+    clock.now = 12
+
+    assert store.peek("a") is not None
+    assert store.get("b", "layout") == 2
+    assert store.peek("a") is None
+    assert store.stats()["evictions"]["ttl"] == 1
+
+
+def test_size_budget_keeps_the_accessed_session():
+    store = store_of(max_bytes=100)
+    store.set("a", "size", 60)
+    store.set("b", "size", 60)
+
+    assert store.peek("a") is None
+    assert store.peek("b") == {"size": 60}
+    assert store.stats()["resident_bytes"] == 60
+
+
+def test_missing_sessions_are_loaded_again():
+    spilled = {}
+    store = store_of(
+        max_sessions=1,
+        on_evict=spilled.__setitem__,
+        on_miss=lambda session_id: spilled.pop(session_id, None),
+    )
+    store.set("a", "layout", 1)
+    store.set("b", "layout", 2)
+    assert "a" in spilled
+
+    assert store.get("a", "layout") == 1
+    assert store.stats()["hits"] == 1
+    assert "b" in spilled
+
+
+def test_eviction_hook_runs_outside_the_store_lock():
+    locks = SessionLocks()
+    seen = []
+
+    def on_evict(session_id, _):
+        # Another thread can use the store while the session is written
+        thread = threading.Thread(target=store.set, args=("c", "layout", 3))
+        thread.start()
+        thread.join(timeout=5)
+        seen.append((session_id, thread.is_alive()))
+        # The evicted session stays locked until the hook returns
+        assert not locks.get(session_id).acquire_write(blocking=False)
+
+    store = store_of(max_sessions=2, on_evict=on_evict, session_lock=locks.get)
+    store.set("a", "layout", 1)
+    store.set("b", "layout", 2)
+    store.set("c", "layout", 3)
+
+    assert seen == [("a", False)]
+    assert locks.get("a").acquire_write(blocking=False)
+
+
+def test_sessions_are_loaded_outside_the_store_lock():
+    loading = threading.Event()
+    release = threading.Event()
+    loads = []
+
+    def on_miss(session_id):
+        loads.append(session_id)
+        if session_id != "a":
+            return None
+        loading.set()
+        release.wait(timeout=5)
+        return {"layout": 1}
+
+    store = store_of(on_miss=on_miss, is_stale=lambda _session_id, _values: False)
+    readers = [
+        threading.Thread(target=store.get, args=("a", "layout")) for _ in range(2)
+    ]
+    for reader in readers:
+        reader.start()
+    assert loading.wait(timeout=5)
+
+    # Other sessions stay available while "a" is loaded
+    other = threading.Thread(target=store.set, args=("b", "layout", 2))
+    other.start()
+    other.join(timeout=5)
+    assert not other.is_alive()
+
+    release.set()
+    for reader in readers:
+        reader.join(timeout=5)
+    assert loads == ["a", "b"]
+    assert store.get("a", "layout") == 1
+
+
+def test_stale_sessions_are_loaded_again():
+    stored = {"a": {"layout": 1, "revision": 1}}
+    store = store_of(
+        on_miss=lambda session_id: dict(stored[session_id]),
+        is_stale=lambda session_id, values: (
+            values["revision"] != stored[session_id]["revision"]
+        ),
+    )
+    assert store.get("a", "layout") == 1
+    stored["a"] = {"layout": 2, "revision": 2}
+
+    assert store.get("a", "layout") == 2
+    assert store.stats()["reloads"] == 1
+
+
+def test_sessions_in_use_are_not_evicted():
+    locks = SessionLocks()
+    evicted = []
+    store = store_of(
+        max_sessions=1,
+        on_evict=lambda session_id, _: evicted.append(session_id),
+        session_lock=locks.get,
+    )
+    store.set("a", "layout", 1)
+    with locks.read("a"):
+        store.set("b", "layout", 2)
+        assert evicted == []
+        assert store.sessions_with("layout") == ["a", "b"]
+    store.set("c", "layout", 3)
+
+    assert evicted == ["a", "b"]
+    assert store.sessions_with("layout") == ["c"]